@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Compare image model latency of model.predict against the traced bucketed path
+
+Loads the Keras model from IMAGE_MODEL_PATH (or --model); when no model file is
+available the fallback network is used so the two call paths can still be compared.
+Usage:
+
+    python benchmark_image_inference.py [--batch-sizes 1 4 16] [--iterations 50] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deepfake_api.settings')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import django
+django.setup()
+
+import tensorflow as tf
+from django.conf import settings
+from detector.models.image_model import BucketedInference, build_fallback_model, PREPROCESSING_PARAMS
+
+
+def load_keras_model(model_path):
+    if model_path and os.path.exists(model_path):
+        print(f"Loading model from {model_path}")
+        return tf.keras.models.load_model(model_path), model_path
+    print("No model file found, benchmarking the fallback network")
+    return build_fallback_model(), 'fallback'
+
+
+def time_calls(fn, batch, iterations, warmup=3):
+    """Return per-call latencies in milliseconds"""
+    for _ in range(warmup):
+        fn(batch)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(batch)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def summarize(latencies):
+    latencies = np.asarray(latencies)
+    return {
+        'meanMs': float(latencies.mean()),
+        'p50Ms': float(np.percentile(latencies, 50)),
+        'p95Ms': float(np.percentile(latencies, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=settings.AI_MODELS['IMAGE_MODEL_PATH'])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 3, 4, 16])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    model, model_name = load_keras_model(args.model)
+    input_shape = PREPROCESSING_PARAMS['target_size'] + (3,)
+
+    start = time.perf_counter()
+    runner = BucketedInference(model, input_shape=input_shape, buckets=settings.IMAGE_INFERENCE['BATCH_BUCKETS'])
+    runner.warmup()
+    print(f"Traced and warmed buckets {runner.buckets} in {time.perf_counter() - start:.2f} seconds")
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"{'batch':>6}{'predict p50 (ms)':>18}{'traced p50 (ms)':>18}{'speedup':>9}{'max abs diff':>14}")
+    for batch_size in args.batch_sizes:
+        batch = rng.random((batch_size,) + input_shape, dtype=np.float32)
+        predict = summarize(time_calls(lambda x: model.predict(x, verbose=0), batch, args.iterations))
+        traced = summarize(time_calls(runner, batch, args.iterations))
+        difference = float(np.max(np.abs(model.predict(batch, verbose=0) - runner(batch))))
+        speedup = predict['p50Ms'] / traced['p50Ms'] if traced['p50Ms'] else 0.0
+        results.append({'batchSize': batch_size, 'bucket': runner.bucket_for(batch_size),
+                        'predict': predict, 'traced': traced, 'speedup': speedup, 'maxAbsDiff': difference})
+        print(f"{batch_size:>6}{predict['p50Ms']:>18.2f}{traced['p50Ms']:>18.2f}{speedup:>8.1f}x{difference:>14.2e}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'model': model_name, 'buckets': runner.buckets, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+"""Benchmark the detection pipeline on synthetic media and check for regressions
+
+Synthetic images and videos (several resolutions, lengths and codecs) are
+generated once into BENCHMARKS['MEDIA_DIR'] from fixed seeds. Each model kind
+(mock, real) runs in a fresh interpreter that times every pipeline stage
+(preprocessing, frame extraction, inference, prediction) and the end-to-end
+Django request through the detection views. The result cache, single-flight
+and perceptual hash are disabled so every request does the full work. Usage:
+
+    python benchmark_suite.py [--models mock real] [--media image video] [--repeat 5] [--output results.json]
+    python benchmark_suite.py --baseline baseline.json [--threshold 0.2]
+
+With --baseline the exit status is 1 when any stage's median is slower than
+the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deepfake_api.settings')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+MODEL_KINDS = ('mock', 'real')
+MEDIA_TYPES = ('image', 'video')
+
+IMAGE_CASES = {
+    'image-320x240-png': {'size': (320, 240), 'format': 'PNG', 'ext': '.png'},
+    'image-1280x720-jpg': {'size': (1280, 720), 'format': 'JPEG', 'ext': '.jpg'},
+    'image-1920x1080-png': {'size': (1920, 1080), 'format': 'PNG', 'ext': '.png'},
+}
+
+VIDEO_CASES = {
+    'video-320x240-2s-mp4v': {'size': (320, 240), 'seconds': 2, 'fourcc': 'mp4v', 'ext': '.mp4'},
+    'video-640x360-5s-xvid': {'size': (640, 360), 'seconds': 5, 'fourcc': 'XVID', 'ext': '.avi'},
+    'video-640x480-5s-mjpg': {'size': (640, 480), 'seconds': 5, 'fourcc': 'MJPG', 'ext': '.avi'},
+    'video-1280x720-10s-mp4v': {'size': (1280, 720), 'seconds': 10, 'fourcc': 'mp4v', 'ext': '.mp4'},
+}
+
+VIDEO_FPS = 25
+
+
+def synthetic_frame(size, index, seed):
+    """Return a deterministic BGR frame: a drifting gradient, a moving face-like ellipse and noise"""
+    import cv2
+
+    width, height = size
+    rng = np.random.default_rng(seed * 100003 + index)
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    phase = index / float(VIDEO_FPS)
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = 120 + 80 * np.sin(2 * np.pi * (x + phase * 0.1))
+    frame[..., 1] = 100 + 60 * y
+    frame[..., 2] = 90 + 50 * np.cos(2 * np.pi * (y - phase * 0.05))
+    frame += rng.normal(0, 8, frame.shape).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+    center = (int(width * (0.3 + 0.4 * (0.5 + 0.5 * np.sin(phase)))), height // 2)
+    axes = (max(4, width // 10), max(6, height // 5))
+    cv2.ellipse(frame, center, axes, 0, 0, 360, (140, 170, 210), -1)
+    eye = max(2, axes[0] // 5)
+    cv2.circle(frame, (center[0] - axes[0] // 2, center[1] - axes[1] // 4), eye, (40, 40, 40), -1)
+    cv2.circle(frame, (center[0] + axes[0] // 2, center[1] - axes[1] // 4), eye, (40, 40, 40), -1)
+    return frame
+
+
+def generate_image(path, case, seed):
+    import cv2
+    from PIL import Image
+
+    frame = synthetic_frame(case['size'], 0, seed)
+    Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).save(path, case['format'])
+
+
+def generate_video(path, case, seed):
+    import cv2
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*case['fourcc']), VIDEO_FPS, case['size'])
+    if not writer.isOpened():
+        raise RuntimeError(f"codec {case['fourcc']} is not available in this OpenCV build")
+    try:
+        for index in range(int(case['seconds'] * VIDEO_FPS)):
+            writer.write(synthetic_frame(case['size'], index, seed))
+    finally:
+        writer.release()
+
+
+def prepare_media(media_dir, media_types):
+    """Generate any missing synthetic media and return ``{case: path}`` plus ``{case: error}``"""
+    os.makedirs(media_dir, exist_ok=True)
+    paths, skipped = {}, {}
+    for media in media_types:
+        cases = IMAGE_CASES if media == 'image' else VIDEO_CASES
+        for seed, (name, case) in enumerate(sorted(cases.items())):
+            path = os.path.join(media_dir, name + case['ext'])
+            if not os.path.exists(path):
+                start = time.perf_counter()
+                tmp_path = os.path.join(media_dir, f'tmp-{name}{case["ext"]}')
+                try:
+                    if media == 'image':
+                        generate_image(tmp_path, case, seed)
+                    else:
+                        generate_video(tmp_path, case, seed)
+                except Exception as e:
+                    skipped[name] = str(e)
+                    print(f"Skipping {name}: {str(e)}")
+                    continue
+                os.replace(tmp_path, path)
+                print(f"Generated {path} in {time.perf_counter() - start:.1f} seconds")
+            paths[name] = path
+    return paths, skipped
+
+
+def time_stage(function, repeat):
+    """Run ``function`` once to warm up, then ``repeat`` times; return latency statistics in ms"""
+    function()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return {
+        'p50Ms': float(np.percentile(latencies, 50)),
+        'p95Ms': float(np.percentile(latencies, 95)),
+        'meanMs': float(np.mean(latencies)),
+        'minMs': float(np.min(latencies)),
+        'runs': repeat,
+    }
+
+
+def run_benchmarks(model_kind, media_types, paths, repeat, model_paths):
+    """Load the models of one kind in this process and time every stage on every case"""
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import Client
+    from detector.registry import get_model_module, model_registry
+
+    settings.AI_MODELS['USE_MOCK_MODELS'] = model_kind == 'mock'
+    for media, model_path in model_paths.items():
+        if model_path:
+            settings.AI_MODELS[f'{media.upper()}_MODEL_PATH'] = model_path
+    media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+    settings.MEDIA_ROOT = media_root
+    client = Client(SERVER_NAME='localhost')
+
+    results = {}
+    errors = {}
+    try:
+        for media in media_types:
+            module = get_model_module(media)
+            if model_kind == 'real':
+                module.force_real_models()
+            else:
+                module.force_mock_models()
+
+            start = time.perf_counter()
+            model = model_registry.get(media)
+            load_ms = (time.perf_counter() - start) * 1000.0
+            if model_kind == 'real' and module.USING_MOCK_MODEL:
+                errors[media] = f"no real {media} model available, check AI_MODELS"
+                continue
+            results[f'{model_kind}/{media}/model_load'] = {'p50Ms': load_ms, 'p95Ms': load_ms, 'meanMs': load_ms,
+                                                           'minMs': load_ms, 'runs': 1}
+
+            cases = IMAGE_CASES if media == 'image' else VIDEO_CASES
+            for name in sorted(cases):
+                if name not in paths:
+                    continue
+                path = paths[name]
+                prefix = f'{model_kind}/{media}/{name}'
+                print(f"Timing {prefix}", file=sys.stderr)
+
+                if media == 'image':
+                    processed = module.preprocess_image(path)
+                    stages = {
+                        'preprocess_image': lambda: module.preprocess_image(path),
+                        'inference': lambda: model(processed),
+                        'predict_image': lambda: module.predict_image(model, path),
+                    }
+                    endpoint, data = '/api/detect/image/', {}
+                else:
+                    stages = {'extract_frames': lambda: module.extract_frames(path)}
+                    if not module.USING_MOCK_MODEL:
+                        frames = module.extract_frames(path)
+                        frames = frames[None] if frames.ndim == 4 else frames
+                        stages['inference'] = lambda: module.video_probabilities(model, frames)
+                    stages['predict_video'] = lambda: module.predict_video(model, path)
+                    endpoint, data = '/api/detect/video/', {'async': 'false'}
+
+                def request():
+                    with open(path, 'rb') as f:
+                        response = client.post(endpoint, {**data, 'file': f})
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.content[:200]!r}")
+
+                stages['request'] = request
+                for stage, function in stages.items():
+                    try:
+                        results[f'{prefix}/{stage}'] = time_stage(function, repeat)
+                    except Exception as e:
+                        errors[f'{prefix}/{stage}'] = str(e)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    return {'results': results, 'errors': errors}
+
+
+def run_model_kind(model_kind, args):
+    """Run the benchmarks for one model kind in a child interpreter"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', model_kind, '--media', *args.media,
+               '--repeat', str(args.repeat), '--media-dir', args.media_dir]
+    if args.image_model:
+        command += ['--image-model', args.image_model]
+    if args.video_model:
+        command += ['--video-model', args.video_model]
+    # Settings read the environment when first loaded, so caches are disabled before the child starts
+    env = {**os.environ, 'RESULT_CACHE': 'false', 'SINGLE_FLIGHT': 'false', 'PERCEPTUAL_HASH': 'false', 'FRAME_EMBEDDING_CACHE': 'false',
+           'FORCE_REAL_MODELS': 'true' if model_kind == 'real' else 'false'}
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'results': {}, 'errors': {model_kind: (result.stderr.strip().splitlines() or ['no output'])[-1]}}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_metadata(args):
+    from django.conf import settings
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpuCount': os.cpu_count(),
+        'repeat': args.repeat,
+        'models': args.models,
+        'config': {
+            'modelBackends': dict(settings.MODEL_BACKENDS),
+            'modelQuantization': {key: settings.MODEL_QUANTIZATION.get(key) for key in ('IMAGE', 'VIDEO')},
+            'videoInference': dict(settings.VIDEO_INFERENCE),
+            'videoPreprocessing': dict(settings.VIDEO_PREPROCESSING),
+            'faceRoi': settings.FACE_ROI.get('ENABLED', False),
+            'imageBatching': settings.IMAGE_BATCHING.get('ENABLED', False),
+        },
+    }
+
+
+def compare_to_baseline(results, baseline, threshold, min_regression_ms):
+    """Return one comparison row per stage present in both runs"""
+    rows = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        current, previous = results[key]['p50Ms'], baseline[key]['p50Ms']
+        ratio = current / previous if previous else float('inf')
+        rows.append({
+            'key': key,
+            'baselineMs': previous,
+            'currentMs': current,
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold and current - previous > min_regression_ms,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', nargs='+', choices=MODEL_KINDS, default=list(MODEL_KINDS))
+    parser.add_argument('--media', nargs='+', choices=MEDIA_TYPES, default=list(MEDIA_TYPES))
+    parser.add_argument('--repeat', type=int, help='Timed runs per stage (default BENCHMARKS["REPEAT"])')
+    parser.add_argument('--media-dir', help='Where synthetic media is generated (default BENCHMARKS["MEDIA_DIR"])')
+    parser.add_argument('--image-model', help='Image model file to use instead of the one in AI_MODELS')
+    parser.add_argument('--video-model', help='Video model file to use instead of the one in AI_MODELS')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the results')
+    parser.add_argument('--baseline', help='Results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, help='Allowed median slowdown as a fraction (default BENCHMARKS["REGRESSION_THRESHOLD"])')
+    parser.add_argument('--child', choices=MODEL_KINDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    from django.conf import settings
+    config = settings.BENCHMARKS
+    args.repeat = args.repeat or config.get('REPEAT', 5)
+    args.media_dir = args.media_dir or config['MEDIA_DIR']
+
+    if args.child:
+        paths, _ = prepare_media(args.media_dir, args.media)
+        model_paths = {'image': args.image_model, 'video': args.video_model}
+        print(json.dumps(run_benchmarks(args.child, args.media, paths, args.repeat, model_paths)))
+        return
+
+    paths, skipped = prepare_media(args.media_dir, args.media)
+    results, errors = {}, dict(skipped)
+    for model_kind in args.models:
+        report = run_model_kind(model_kind, args)
+        results.update(report['results'])
+        errors.update(report['errors'])
+
+    print(f"{'stage':<64}{'p50 (ms)':>11}{'p95 (ms)':>11}{'mean (ms)':>11}")
+    for key in sorted(results):
+        stats = results[key]
+        print(f"{key:<64}{stats['p50Ms']:>11.1f}{stats['p95Ms']:>11.1f}{stats['meanMs']:>11.1f}")
+    for key, error in sorted(errors.items()):
+        print(f"{key:<64}  failed: {error}")
+
+    report = {'meta': run_metadata(args), 'results': results, 'errors': errors}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        threshold = args.threshold if args.threshold is not None else config.get('REGRESSION_THRESHOLD', 0.2)
+        rows = compare_to_baseline(results, baseline['results'], threshold, config.get('MIN_REGRESSION_MS', 2.0))
+        regressions = [row for row in rows if row['regression']]
+        report['comparison'] = {'baseline': args.baseline, 'baselineCommit': baseline.get('meta', {}).get('commit'),
+                                'threshold': threshold, 'rows': rows}
+
+        print(f"\nComparison with {args.baseline} (threshold +{threshold:.0%})")
+        print(f"{'stage':<64}{'baseline':>11}{'current':>11}{'change':>9}")
+        for row in rows:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"{row['key']:<64}{row['baselineMs']:>11.1f}{row['currentMs']:>11.1f}{row['ratio'] - 1:>+9.0%}{flag}")
+        missing = sorted(set(baseline['results']) - set(results))
+        if missing:
+            print(f"{len(missing)} baseline stages were not measured in this run")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if regressions:
+        sys.exit(f"{len(regressions)} stage(s) regressed beyond the threshold")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""Measure the CPU runtime options of the video model one at a time
+
+Each configuration adds one VIDEO_INFERENCE option on top of the previous one,
+starting from the old eager no_grad/fp32/NCHW path, and then sweeps intra-op
+thread counts. Weights are loaded from VIDEO_MODEL_PATH (or --model) when the
+file exists, otherwise the network runs with random weights. Usage:
+
+    python benchmark_video_inference.py [--frames 30] [--threads 1 4 8] [--inter-op-threads 2] [--json out.json]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deepfake_api.settings')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import django
+django.setup()
+
+import torch
+from django.conf import settings
+from detector.models.video_model import VideoModel, configure_inference_runtime, cpu_supports_bf16, run_video_model
+
+
+def load_model(model_path):
+    model = VideoModel()
+    if model_path and os.path.exists(model_path):
+        print(f"Loading weights from {model_path}")
+        state_dict = torch.load(model_path, map_location='cpu')
+        if isinstance(state_dict, dict):
+            state_dict = state_dict.get('state_dict', state_dict.get('model_state_dict', state_dict))
+        model.load_state_dict({k.replace('module.', ''): v for k, v in state_dict.items()}, strict=False)
+    else:
+        print("No model file found, benchmarking with random weights")
+    return model.eval()
+
+
+def time_model(model, frames, iterations, warmup=2):
+    """Return per-call latencies in milliseconds and the last logits"""
+    for _ in range(warmup):
+        output = run_video_model(model, frames)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        output = run_video_model(model, frames)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=settings.AI_MODELS['VIDEO_MODEL_PATH'])
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--threads', type=int, nargs='*', default=[], help='Intra-op thread counts to sweep')
+    parser.add_argument('--inter-op-threads', type=int, help='Inter-op thread count for the whole run')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    if args.inter_op_threads:
+        torch.set_num_interop_threads(args.inter_op_threads)
+
+    base_model = load_model(args.model)
+    frames = torch.randn(1, args.frames, 3, 112, 112)
+
+    baseline = {'INFERENCE_MODE': False, 'CHANNELS_LAST': False, 'INTRA_OP_THREADS': None, 'BF16_AUTOCAST': False}
+    configs = [
+        ('baseline (no_grad, fp32, NCHW)', baseline),
+        ('+ inference_mode', {**baseline, 'INFERENCE_MODE': True}),
+        ('+ channels_last', {**baseline, 'INFERENCE_MODE': True, 'CHANNELS_LAST': True}),
+    ]
+    for threads in args.threads:
+        configs.append((f'+ {threads} intra-op threads', {**configs[2][1], 'INTRA_OP_THREADS': threads}))
+    if cpu_supports_bf16():
+        configs.append(('+ bf16 autocast', {**configs[-1][1], 'BF16_AUTOCAST': True}))
+    else:
+        print("CPU has no native bf16 support, skipping bf16 autocast")
+
+    default_threads = torch.get_num_threads()
+    results = []
+    reference = None
+    print(f"{'configuration':<34}{'threads':>8}{'p50 (ms)':>11}{'p95 (ms)':>11}{'speedup':>9}{'max logit diff':>16}")
+    for name, options in configs:
+        settings.VIDEO_INFERENCE = {**settings.VIDEO_INFERENCE, **options}
+        torch.set_num_threads(options['INTRA_OP_THREADS'] or default_threads)
+        model = configure_inference_runtime(copy.deepcopy(base_model))
+
+        latencies, output = time_model(model, frames, args.iterations)
+        p50 = float(np.percentile(latencies, 50))
+        p95 = float(np.percentile(latencies, 95))
+        if reference is None:
+            reference = (p50, output)
+        speedup = reference[0] / p50 if p50 else 0.0
+        difference = float((output - reference[1]).abs().max())
+        results.append({'configuration': name, 'options': options, 'threads': torch.get_num_threads(),
+                        'p50Ms': p50, 'p95Ms': p95, 'speedup': speedup, 'maxLogitDiff': difference})
+        print(f"{name:<34}{torch.get_num_threads():>8}{p50:>11.1f}{p95:>11.1f}{speedup:>8.2f}x{difference:>16.2e}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': args.frames, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""Compare fp32 and quantized model variants on a labelled sample directory
+
+Every variant is loaded in a fresh interpreter and scores the same files. Files
+are labelled by a ``real`` or ``fake`` directory anywhere in their path. The
+report shows, per variant, agreement with fp32 verdicts, accuracy against the
+labels, inference latency and resident memory. Usage:
+
+    python compare_model_variants.py --media video --samples samples/videos [--variants none dynamic static]
+    python compare_model_variants.py --media image --samples samples/images [--variants none tflite-fp16 tflite-int8]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from startup_report import read_rss_mb
+
+VARIANTS = {
+    'image': ('none', 'tflite-fp16', 'tflite-int8'),
+    'video': ('none', 'dynamic', 'static'),
+}
+
+
+def label_for(path):
+    """Return 1 for fake, 0 for real, or None when the path carries no label"""
+    parts = [part.lower() for part in os.path.normpath(path).split(os.sep)]
+    if 'fake' in parts:
+        return 1
+    if 'real' in parts:
+        return 0
+    return None
+
+
+def score_files(media, variant, files, model_path=None):
+    """Load one variant in this process and score every file with it"""
+    os.environ['DETECTOR_ROLE'] = media
+    os.environ['IMAGE_QUANTIZATION' if media == 'image' else 'VIDEO_QUANTIZATION'] = variant
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deepfake_api.settings')
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from detector.registry import get_model_module
+
+    if model_path:
+        settings.AI_MODELS['IMAGE_MODEL_PATH' if media == 'image' else 'VIDEO_MODEL_PATH'] = model_path
+
+    module = get_model_module(media)
+    module.force_real_models()
+    rss_before, _ = read_rss_mb()
+    start = time.perf_counter()
+    model = module.build_image_model() if media == 'image' else module.build_video_model()
+    load_time = time.perf_counter() - start
+    if module.USING_MOCK_MODEL:
+        raise RuntimeError(f"No real {media} model available, check AI_MODELS")
+
+    scores = []
+    latencies = []
+    for path in files:
+        if media == 'image':
+            inputs = module.preprocess_image(path)
+            start = time.perf_counter()
+            predictions = model(inputs)
+            if hasattr(predictions, 'numpy'):
+                predictions = predictions.numpy()
+            score = float(np.asarray(predictions, dtype=np.float32).reshape(len(inputs), -1)[:, 0].max())
+        else:
+            frames = module.extract_frames(path)
+            if frames.ndim == 4:
+                frames = frames[None]
+            start = time.perf_counter()
+            score = float(module.video_probabilities(model, frames)[:, 0].max())
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        scores.append(score)
+
+    rss_after, peak_rss = read_rss_mb()
+    return {
+        'variant': variant,
+        'loadTime': load_time,
+        'modelRssMb': rss_after - rss_before,
+        'peakRssMb': peak_rss,
+        'scores': scores,
+        'latenciesMs': latencies,
+    }
+
+
+def run_variant(media, variant, samples, limit, model_path=None):
+    command = [sys.executable, os.path.abspath(__file__), '--media', media, '--samples', samples,
+               '--limit', str(limit or 0), '--child', variant]
+    if model_path:
+        command += ['--model', model_path]
+    result = subprocess.run(
+        command,
+        capture_output=True, text=True,
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'variant': variant, 'error': (result.stderr.strip().splitlines() or ['no output'])[-1]}
+
+
+def summarize(report, reference, labels):
+    scores = np.asarray(report['scores'])
+    verdicts = scores > 0.5
+    summary = {
+        'variant': report['variant'],
+        'agreement': float(np.mean(verdicts == (np.asarray(reference['scores']) > 0.5))),
+        'meanAbsScoreDiff': float(np.mean(np.abs(scores - np.asarray(reference['scores'])))),
+        'meanLatencyMs': float(np.mean(report['latenciesMs'])),
+        'p95LatencyMs': float(np.percentile(report['latenciesMs'], 95)),
+        'loadTime': report['loadTime'],
+        'modelRssMb': report['modelRssMb'],
+        'peakRssMb': report['peakRssMb'],
+    }
+    labelled = [(verdict, label) for verdict, label in zip(verdicts, labels) if label is not None]
+    summary['accuracy'] = float(np.mean([int(verdict) == label for verdict, label in labelled])) if labelled else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--media', choices=VARIANTS, required=True)
+    parser.add_argument('--samples', required=True, help='Directory of sample files, labelled by real/ and fake/ subdirectories')
+    parser.add_argument('--variants', nargs='+', help='Variants to compare; fp32 (none) is always included as the reference')
+    parser.add_argument('--model', help='Model file to use instead of the one in AI_MODELS')
+    parser.add_argument('--limit', type=int, default=0, help='Score at most this many files')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    from detector.models.quantization import list_media_files, IMAGE_FILE_EXTENSIONS, VIDEO_FILE_EXTENSIONS
+    extensions = IMAGE_FILE_EXTENSIONS if args.media == 'image' else VIDEO_FILE_EXTENSIONS
+    files = list_media_files(args.samples, extensions, args.limit or None)
+
+    if args.child:
+        print(json.dumps(score_files(args.media, args.child, files, args.model)))
+        return
+
+    if not files:
+        sys.exit(f"No {args.media} files found in {args.samples}")
+    variants = ['none'] + [variant for variant in (args.variants or VARIANTS[args.media]) if variant != 'none']
+    labels = [label_for(path) for path in files]
+    print(f"Scoring {len(files)} files ({sum(label is not None for label in labels)} labelled) with {', '.join(variants)}")
+
+    reports = [run_variant(args.media, variant, args.samples, args.limit, args.model) for variant in variants]
+    if 'error' in reports[0]:
+        sys.exit(f"fp32 reference failed: {reports[0]['error']}")
+
+    summaries = []
+    print(f"{'variant':<14}{'agreement':>10}{'accuracy':>10}{'score diff':>12}{'mean (ms)':>11}{'p95 (ms)':>10}{'model RSS (MB)':>16}{'load (s)':>10}")
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['variant']:<14}  failed: {report['error']}")
+            summaries.append(report)
+            continue
+        summary = summarize(report, reports[0], labels)
+        summaries.append(summary)
+        accuracy = f"{summary['accuracy']:.3f}" if summary['accuracy'] is not None else '-'
+        print(f"{summary['variant']:<14}{summary['agreement']:>10.3f}{accuracy:>10}{summary['meanAbsScoreDiff']:>12.4f}"
+              f"{summary['meanLatencyMs']:>11.1f}{summary['p95LatencyMs']:>10.1f}{summary['modelRssMb']:>16.1f}{summary['loadTime']:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'media': args.media, 'files': files, 'labels': labels, 'variants': summaries,
+                       'reports': reports}, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -64,6 +64,22 @@ DATABASES = {
     }
 }
 
+# Caches
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Detection results shared by all workers, stored in the project database
+    'detection_results': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'detector_result_cache',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -106,7 +122,11 @@ CORS_ALLOWED_ORIGINS = [
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+FILE_UPLOAD_HANDLERS = ['detector.upload_store.HashingUploadHandler']  # Hashes uploads while streaming them to memory or disk
+FILE_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, '.incoming')  # Next to the upload store, so stored uploads are hard-linked rather than copied
+os.makedirs(FILE_UPLOAD_TEMP_DIR, exist_ok=True)  # Django's system checks require it to exist
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+DATA_UPLOAD_MAX_NUMBER_FILES = 5000  # Batch image detection accepts many files per request
 
 # AI model paths
 AI_MODELS = {
@@ -114,3 +134,217 @@ AI_MODELS = {
     'VIDEO_MODEL_PATH': os.path.join(BASE_DIR, 'ai_models', 'video_model.pth'),
     'USE_MOCK_MODELS': True,  # Set to False in production with real models
 }
+
+# Media types served by this worker: 'image', 'video' or 'both'.
+# Each framework (TensorFlow for images, torch for videos) is only imported by workers that serve it.
+DETECTOR_ROLE = os.environ.get('DETECTOR_ROLE', 'both')
+
+# Dynamic micro-batching in front of the image model
+IMAGE_BATCHING = {
+    'ENABLED': os.environ.get('IMAGE_BATCHING', '').lower() in ('true', '1', 'yes'),
+    'MAX_BATCH_SIZE': int(os.environ.get('IMAGE_BATCH_MAX_SIZE', 16)),
+    'WINDOW_MS': float(os.environ.get('IMAGE_BATCH_WINDOW_MS', 5)),  # How long to collect requests after the first one
+    'MAX_WAIT_MS': float(os.environ.get('IMAGE_BATCH_MAX_WAIT_MS', 50)),  # Upper bound on how long a request is held for batching
+    'MAX_QUEUE_SIZE': int(os.environ.get('IMAGE_BATCH_QUEUE_SIZE', 256)),  # Requests beyond this depth are rejected with 503
+    'RESULT_TIMEOUT': float(os.environ.get('IMAGE_BATCH_RESULT_TIMEOUT', 30)),  # Seconds a request waits for its result
+}
+
+# Image model inference path
+IMAGE_INFERENCE = {
+    'USE_TF_FUNCTION': os.environ.get('IMAGE_USE_TF_FUNCTION', 'true').lower() in ('true', '1', 'yes'),  # False to call model.predict
+    # Batch sizes traced ahead of time; smaller batches are zero-padded up to the next bucket
+    'BATCH_BUCKETS': [int(size) for size in os.environ.get('IMAGE_BATCH_BUCKETS', '1,2,4,8,16,32,64').split(',') if size.strip()],
+    'WARMUP': os.environ.get('IMAGE_INFERENCE_WARMUP', 'true').lower() in ('true', '1', 'yes'),  # Run every bucket once at load time
+}
+
+# CPU runtime options for the video model
+VIDEO_INFERENCE = {
+    'INFERENCE_MODE': os.environ.get('VIDEO_INFERENCE_MODE', 'true').lower() in ('true', '1', 'yes'),  # torch.inference_mode instead of no_grad
+    'CHANNELS_LAST': os.environ.get('VIDEO_CHANNELS_LAST', 'true').lower() in ('true', '1', 'yes'),  # channels_last memory format for the backbone
+    'INTRA_OP_THREADS': int(os.environ.get('VIDEO_INTRA_OP_THREADS', 0)) or None,  # None keeps the torch default (one per core)
+    'INTER_OP_THREADS': int(os.environ.get('VIDEO_INTER_OP_THREADS', 0)) or None,
+    'BF16_AUTOCAST': os.environ.get('VIDEO_BF16_AUTOCAST', '').lower() in ('true', '1', 'yes'),  # Only applied on CPUs with AVX512-BF16 or AMX
+}
+
+# Video frame preprocessing
+VIDEO_PREPROCESSING = {
+    'VECTORIZED': os.environ.get('VIDEO_VECTORIZED_PREPROCESSING', 'true').lower() in ('true', '1', 'yes'),  # False for the per-frame torchvision path
+    'RESIZE_BACKEND': os.environ.get('VIDEO_RESIZE_BACKEND', 'pil'),  # 'pil' (bit-exact with torchvision) or 'opencv' (faster, approximate)
+    'USE_LUT': True,  # Normalize through a uint8 lookup table instead of float arithmetic
+}
+
+# Segmented scoring of long videos (request with mode=segmented)
+VIDEO_SEGMENTS = {
+    'SEGMENT_SECONDS': float(os.environ.get('VIDEO_SEGMENT_SECONDS', 10)),  # Length of each scored time window
+    'FRAMES_PER_SEGMENT': int(os.environ.get('VIDEO_FRAMES_PER_SEGMENT', 16)),  # Frames sampled uniformly within a window
+    'MIN_FRAMES': 4,  # A shorter trailing window is skipped unless it is the only one
+    'AGGREGATION': os.environ.get('VIDEO_SEGMENT_AGGREGATION', 'mean'),  # 'mean' or 'max' of the segment fake probabilities
+}
+
+# Early-exit progressive scoring (request with mode=progressive)
+VIDEO_PROGRESSIVE = {
+    'CHUNK_SIZE': int(os.environ.get('VIDEO_PROGRESSIVE_CHUNK_SIZE', 4)),  # Frames decoded and scored per step
+    'MIN_FRAMES': int(os.environ.get('VIDEO_PROGRESSIVE_MIN_FRAMES', 8)),  # Never stop before this many frames
+    'CONFIDENCE_THRESHOLD': float(os.environ.get('VIDEO_PROGRESSIVE_THRESHOLD', 0.9)),  # Softmax confidence that ends inference early
+}
+
+# Analysis mode used when a video request does not pass 'mode': 'full', 'segmented' or 'progressive'
+VIDEO_DEFAULT_MODE = os.environ.get('VIDEO_DEFAULT_MODE', 'full')
+
+# Face region-of-interest cropping before resizing
+FACE_ROI = {
+    'ENABLED': os.environ.get('FACE_ROI', '').lower() in ('true', '1', 'yes'),
+    'DETECTOR': os.environ.get('FACE_ROI_DETECTOR', 'cascade'),  # 'cascade' (Haar, bundled with OpenCV) or 'dnn' (YuNet)
+    'CASCADE_PATH': None,  # None for OpenCV's haarcascade_frontalface_default.xml
+    'DNN_MODEL_PATH': os.path.join(BASE_DIR, 'ai_models', 'face_detection_yunet.onnx'),
+    'SCORE_THRESHOLD': 0.7,  # Minimum YuNet detection score
+    'DETECTION_SIZE': 640,  # Frames are downscaled to this longest side before detection
+    'MIN_FACE_SIZE': 24,  # Smallest face in original pixels (cascade only)
+    'MARGIN': 0.3,  # Context added around each face box, as a fraction of its size
+    'MAX_FACES': int(os.environ.get('FACE_ROI_MAX_FACES', 4)),  # Faces scored per image or video
+    'KEYFRAME_INTERVAL': int(os.environ.get('FACE_ROI_KEYFRAME_INTERVAL', 5)),  # Detect on every Nth sampled video frame, track in between
+}
+
+# Opt-in quantized model variants (compare with compare_model_variants.py before enabling)
+MODEL_QUANTIZATION = {
+    'VIDEO': os.environ.get('VIDEO_QUANTIZATION', 'none'),  # 'none', 'dynamic' (int8 LSTM/Linear) or 'static' (also int8 backbone)
+    'VIDEO_CALIBRATION_DIR': os.environ.get('VIDEO_CALIBRATION_DIR', os.path.join(BASE_DIR, 'calibration', 'videos')),
+    'TORCH_ENGINE': 'x86',  # Quantized kernel backend: 'x86' or 'qnnpack' (ARM)
+    'IMAGE': os.environ.get('IMAGE_QUANTIZATION', 'none'),  # 'none', 'tflite-fp16' or 'tflite-int8'
+    'IMAGE_CALIBRATION_DIR': os.environ.get('IMAGE_CALIBRATION_DIR', os.path.join(BASE_DIR, 'calibration', 'images')),
+    'TFLITE_THREADS': int(os.environ.get('TFLITE_THREADS', 0)) or None,
+    'CACHE_DIR': os.path.join(BASE_DIR, 'cache', 'quantized'),  # Converted TFLite models, reused across restarts
+}
+
+# Inference backend per detector: 'native' (TensorFlow / PyTorch) or 'onnxruntime'.
+# The ONNX models are produced by export_onnx.py; with onnxruntime the framework is not imported.
+MODEL_BACKENDS = {
+    'IMAGE': os.environ.get('IMAGE_BACKEND', 'native'),
+    'VIDEO': os.environ.get('VIDEO_BACKEND', 'native'),
+}
+
+ONNX_RUNTIME = {
+    'IMAGE_MODEL_PATH': os.path.join(BASE_DIR, 'ai_models', 'face_detection.onnx'),
+    'VIDEO_MODEL_PATH': os.path.join(BASE_DIR, 'ai_models', 'video_model.onnx'),
+    'OPSET': 17,
+    'GRAPH_OPTIMIZATION': os.environ.get('ONNX_GRAPH_OPTIMIZATION', 'all'),  # 'disable', 'basic', 'extended' or 'all'
+    'INTRA_OP_THREADS': int(os.environ.get('ONNX_INTRA_OP_THREADS', 0)) or None,  # None lets ONNX Runtime decide
+    'INTER_OP_THREADS': int(os.environ.get('ONNX_INTER_OP_THREADS', 0)) or None,  # Only used in parallel execution mode
+    'EXECUTION_MODE': os.environ.get('ONNX_EXECUTION_MODE', 'sequential'),  # 'sequential' or 'parallel'
+}
+
+# Console and file logging (detector/custom_logger.py)
+LOG_OUTPUT = {
+    'DIR': os.path.join(BASE_DIR, 'logs'),
+    'ASYNC': os.environ.get('LOG_ASYNC', 'true').lower() in ('true', '1', 'yes'),  # Write logs from a background thread
+    'QUEUE_SIZE': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),  # Records beyond this backlog are dropped and counted
+    'FORMAT': os.environ.get('LOG_FORMAT', 'text'),  # 'text' or 'json' (one object per line)
+    'BACKUP_DAYS': int(os.environ.get('LOG_BACKUP_DAYS', 14)),  # Daily log files kept besides today's, 0 to keep all
+}
+
+# Prometheus metrics served at /api/metrics
+METRICS = {
+    'ENABLED': os.environ.get('METRICS', 'true').lower() in ('true', '1', 'yes'),
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),  # Histogram bounds in seconds
+}
+
+# Per-request profiling, requested with the header (e.g. 'X-Detector-Profile: stages,cprofile,torch') or sampled
+PROFILING = {
+    'HEADER_ENABLED': os.environ.get('PROFILING_HEADER', 'false').lower() in ('true', '1', 'yes'),  # Opt-in: lets clients turn on profilers
+    'HEADER': 'X-Detector-Profile',
+    'TOKEN_HEADER': 'X-Detector-Profile-Token',
+    'TOKEN': os.environ.get('PROFILING_TOKEN') or None,  # When set, the header is only honoured with this token
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0.0)),  # Fraction of requests profiled without the header
+    'SAMPLE_TOOLS': ('stages',),  # Tools used for sampled requests: 'stages', 'cprofile', 'torch'
+    'DIR': os.path.join(BASE_DIR, 'profiles'),  # Where profiles are written, None to only attach them to responses
+    'MAX_FILES': 500,  # Oldest profile files are deleted beyond this count
+    'TOP_FUNCTIONS': 25,  # Rows of cProfile / torch profiler output included in the summary
+}
+
+# Performance benchmark suite (benchmark_suite.py)
+BENCHMARKS = {
+    'MEDIA_DIR': os.path.join(BASE_DIR, 'cache', 'benchmark_media'),  # Generated synthetic media, reused across runs
+    'REPEAT': int(os.environ.get('BENCHMARK_REPEAT', 5)),  # Timed runs per stage, after one warmup run
+    'REGRESSION_THRESHOLD': float(os.environ.get('BENCHMARK_REGRESSION_THRESHOLD', 0.2)),  # Flag medians slower than baseline by this fraction
+    'MIN_REGRESSION_MS': 2.0,  # Slowdowns smaller than this are timer noise, never flagged
+}
+
+# Frame decoding strategy for video analysis
+VIDEO_DECODING = {
+    'MODE': os.environ.get('VIDEO_DECODE_MODE', 'auto'),  # 'auto', 'seek' or 'sequential'
+    'GOP_SIZE': int(os.environ.get('VIDEO_GOP_SIZE', 250)),  # Assumed keyframe interval (x264 default keyint)
+    'SEEK_OVERHEAD_FRAMES': int(os.environ.get('VIDEO_SEEK_OVERHEAD_FRAMES', 10)),  # Fixed cost of one seek, in decoded frames
+}
+
+# Content-addressed upload storage in MEDIA_ROOT/uploads
+UPLOAD_STORAGE = {
+    'PERSIST': os.environ.get('UPLOAD_PERSIST', 'true').lower() in ('true', '1', 'yes'),  # Used when the request has no 'persist' flag
+    'MAX_BYTES': int(os.environ.get('UPLOAD_MAX_MB', 2048)) * 1024 * 1024,  # Least recently used uploads are evicted beyond this, 0 for no limit
+    'MAX_AGE': int(os.environ.get('UPLOAD_MAX_AGE_HOURS', 168)) * 3600,  # Uploads unused for this many seconds are evicted, 0 to keep them
+    'SWEEP_INTERVAL': 60,  # Seconds between budget checks of the upload directory
+    'TEMP_MAX_AGE': 3600,  # Temporary upload files older than this were left by failed requests and are removed
+    'VIDEO_MAX_MEMORY_SIZE': int(float(os.environ.get('VIDEO_UPLOAD_MAX_MEMORY_MB', 2.5)) * 1024 * 1024),  # Larger video requests are streamed to disk
+}
+
+# Run the models in dedicated worker processes, fed preprocessed arrays through shared memory
+MODEL_WORKERS = {
+    'ENABLED': os.environ.get('MODEL_WORKERS', 'false').lower() in ('true', '1', 'yes'),
+    'MEDIA_TYPES': tuple(name.strip() for name in os.environ.get('MODEL_WORKER_MEDIA_TYPES', 'image,video').split(',') if name.strip()),
+    'SOCKET_DIR': os.environ.get('MODEL_WORKER_SOCKET_DIR') or None,  # Where worker sockets are created, None for the system temp directory
+    'START_TIMEOUT': 300,  # Seconds a worker may take to load its model
+    'REQUEST_TIMEOUT': float(os.environ.get('MODEL_WORKER_TIMEOUT', 300)),  # Seconds before an inference call is abandoned
+    'HEALTH_INTERVAL': 5,  # Seconds between health checks of each worker
+    'PING_TIMEOUT': 10,  # Seconds a worker has to answer a health check
+    'MAX_MISSED_PINGS': 3,  # A worker that misses this many health checks in a row is restarted
+    'RESTART_BACKOFF': 1.0,  # Seconds before restarting a failed worker, doubled after each failed restart
+    'MAX_RESTART_BACKOFF': 60.0,
+}
+
+# Per-frame video backbone features, reused when a video is analyzed again
+FRAME_EMBEDDING_CACHE = {
+    'ENABLED': os.environ.get('FRAME_EMBEDDING_CACHE', 'true').lower() in ('true', '1', 'yes'),
+    'DIR': os.path.join(BASE_DIR, 'cache', 'frame_embeddings'),  # One float16 record file per video and preprocessing
+    'MAX_BYTES': int(os.environ.get('FRAME_EMBEDDING_CACHE_MAX_MB', 1024)) * 1024 * 1024,  # Least recently used videos are evicted beyond this, 0 for no limit
+    'SWEEP_INTERVAL': 60,  # Seconds between budget checks of the cache directory
+}
+
+# Content-addressed detection result cache
+RESULT_CACHE = {
+    'ENABLED': os.environ.get('RESULT_CACHE', 'true').lower() in ('true', '1', 'yes'),
+    'MAX_ENTRIES': int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1024)),  # In-process LRU tier
+    'PERSISTENT_CACHE': 'detection_results',  # Cache alias for the shared tier, or None to disable it
+    'TIMEOUT': None,  # Seconds before a persistent entry expires, None to keep it
+}
+
+# Coalesce concurrent detection requests for identical content
+SINGLE_FLIGHT = {
+    'ENABLED': os.environ.get('SINGLE_FLIGHT', 'true').lower() in ('true', '1', 'yes'),
+    'TIMEOUT': float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 600)),  # Seconds a duplicate waits for the first request
+}
+
+# Perceptual-hash near-duplicate lookup for images
+PERCEPTUAL_HASH = {
+    'ENABLED': os.environ.get('PERCEPTUAL_HASH', '').lower() in ('true', '1', 'yes'),
+    'ALGORITHM': os.environ.get('PERCEPTUAL_HASH_ALGORITHM', 'phash'),  # 'phash' or 'dhash'
+    'MAX_DISTANCE': int(os.environ.get('PERCEPTUAL_HASH_MAX_DISTANCE', 4)),  # Hamming distance (out of 64 bits) counted as a match
+    'INDEX_PATH': os.path.join(BASE_DIR, 'cache', 'perceptual_index.npz'),
+    'FLUSH_EVERY': int(os.environ.get('PERCEPTUAL_HASH_FLUSH_EVERY', 16)),  # New entries buffered before the index is saved
+}
+
+# Batch image detection endpoint
+IMAGE_BATCH_DETECTION = {
+    'BATCH_SIZE': int(os.environ.get('IMAGE_BATCH_DETECTION_BATCH_SIZE', 64)),  # Images per forward pass
+    'MAX_FILES': int(os.environ.get('IMAGE_BATCH_DETECTION_MAX_FILES', 5000)),
+    'MAX_ENTRY_SIZE': 20 * 1024 * 1024,  # Archive members larger than this are reported as errors
+    'WORKERS': int(os.environ.get('IMAGE_BATCH_DETECTION_WORKERS', 0)) or None,  # Decode threads, None for one per CPU
+}
+
+# Background video analysis jobs
+VIDEO_JOBS = {
+    'DEFAULT_ASYNC': os.environ.get('VIDEO_JOBS_DEFAULT_ASYNC', '').lower() in ('true', '1', 'yes'),  # Used when the request has no 'async' flag
+    'WORKERS': int(os.environ.get('VIDEO_JOBS_WORKERS', 2)),
+    'MAX_QUEUE_SIZE': int(os.environ.get('VIDEO_JOBS_QUEUE_SIZE', 64)),  # Jobs beyond this depth are rejected with 503
+    'MAX_FINISHED_JOBS': 1000,  # Finished jobs kept in memory per process
+    'SHARED_CACHE': 'detection_results',  # Cache alias where job status is mirrored for other workers, or None
+    'JOB_TTL': 24 * 3600,  # Seconds a job status stays in the shared cache
+}
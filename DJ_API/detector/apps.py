@@ -10,12 +10,13 @@ class DetectorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'detector'
     
-    # Class variables to store the loaded models
-    image_model = None
-    video_model = None
-    
     def ready(self):
         # This code will be executed once when Django starts
+        # Model worker processes inherit the server's argv but load only their own model
+        from .model_workers import WORKER_ENV_FLAG
+        if os.environ.get(WORKER_ENV_FLAG) == '1':
+            return
+        
         # Skip model loading when running management commands or when reloading in dev
         if 'runserver' not in sys.argv and 'manage.py' not in sys.argv[0]:
             return
@@ -26,6 +27,9 @@ class DetectorConfig(AppConfig):
             
         from django.conf import settings
         from .custom_logger import detector_logger as logger
+        from .registry import model_registry
+        from .roles import get_worker_role, served_media_types
+        from .model_workers import model_workers_enabled
         
         # Set up logging
         logger.info("=" * 50)
@@ -43,47 +47,26 @@ class DetectorConfig(AppConfig):
             logger.warning("This is not suitable for production use!")
             logger.warning("=" * 50)
         
-        # Load the image model
-        try:
-            logger.info("=" * 30)
-            logger.info("Loading image model...")
-            start_time = datetime.now()
-            
-            from .models.image_model import load_image_model
-            DetectorConfig.image_model = load_image_model()
-            
-            end_time = datetime.now()
-            load_time = (end_time - start_time).total_seconds()
-            logger.info(f"Image model loaded successfully in {load_time:.2f} seconds.")
-            logger.info("=" * 30)
-        except Exception as e:
-            logger.error(f"Error loading image model: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            DetectorConfig.image_model = None
-        
-        # Load the video model
-        try:
-            logger.info("=" * 30)
-            logger.info("Loading video model...")
-            start_time = datetime.now()
-            
-            from .models.video_model import load_video_model
-            DetectorConfig.video_model = load_video_model()
-            
-            end_time = datetime.now()
-            load_time = (end_time - start_time).total_seconds()
-            logger.info(f"Video model loaded successfully in {load_time:.2f} seconds.")
-            logger.info("=" * 30)
-        except Exception as e:
-            logger.error(f"Error loading video model: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            DetectorConfig.video_model = None
+        # Load the models for the media types this worker serves
+        logger.info(f"Worker role: {get_worker_role()}")
+        autoreloader = 'runserver' in sys.argv and '--noreload' not in sys.argv
+        for media_type in served_media_types():
+            # The autoreloader's parent process never serves requests, so it starts no model workers
+            if autoreloader and model_workers_enabled(media_type):
+                logger.info(f"Not starting the {media_type} model worker in the autoreloader process")
+                continue
+            try:
+                logger.info("=" * 30)
+                model_registry.get(media_type)
+                logger.info("=" * 30)
+            except Exception as e:
+                logger.error(f"Error loading {media_type} model: {str(e)}")
+                import traceback
+                logger.error(f"Traceback: {traceback.format_exc()}")
         
         # Log model loading status
         logger.info("=" * 50)
-        logger.info(f"Image model loaded: {DetectorConfig.image_model is not None}")
-        logger.info(f"Video model loaded: {DetectorConfig.video_model is not None}")
+        logger.info(f"Image model loaded: {model_registry.is_loaded('image')}")
+        logger.info(f"Video model loaded: {model_registry.is_loaded('video')}")
         logger.info("DeepFake Detector API is ready!")
         logger.info("=" * 50)
@@ -0,0 +1,160 @@
+import io
+import os
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+from .face_roi import face_roi_enabled, crop_image_faces
+from .metrics import observe_stage
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+class BatchRequestError(Exception):
+    """Raised when a batch upload cannot be processed as a whole"""
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_uploaded_files(files):
+    """Yield ``(name, data)`` for individually uploaded images"""
+    for file_obj in files:
+        yield file_obj.name, file_obj.read()
+
+
+def iter_archive_entries(file_obj):
+    """Yield ``(name, data)`` for every image in a zip or tar upload
+
+    Members are read straight from the uploaded file object, one at a time,
+    so nothing is extracted to disk. Tar archives are read as a stream.
+    """
+    max_entry_size = settings.IMAGE_BATCH_DETECTION.get('MAX_ENTRY_SIZE', 20 * 1024 * 1024)
+    name = file_obj.name.lower()
+
+    if name.endswith('.zip'):
+        try:
+            archive = zipfile.ZipFile(file_obj)
+        except zipfile.BadZipFile as e:
+            raise BatchRequestError(f"Invalid zip archive: {str(e)}")
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                if info.file_size > max_entry_size:
+                    yield info.filename, None
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member.read()
+        return
+
+    try:
+        archive = tarfile.open(fileobj=file_obj, mode='r|*')
+    except tarfile.TarError as e:
+        raise BatchRequestError(f"Invalid tar archive: {str(e)}")
+    with archive:
+        for member in archive:
+            if not member.isfile() or not member.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if member.size > max_entry_size:
+                yield member.name, None
+                continue
+            yield member.name, archive.extractfile(member).read()
+
+
+def decode_image(data, target_size=(224, 224)):
+    """Decode image bytes into a normalized ``(N, 224, 224, 3)`` array, matching preprocess_image
+    
+    N is 1, or the number of faces found when face ROI is enabled.
+    """
+    start_time = datetime.now()
+    img = Image.open(io.BytesIO(data))
+    img = img.convert('RGB')
+    crops = crop_image_faces(img) if face_roi_enabled() else [img]
+    img_array = np.stack([np.asarray(crop.resize(target_size), dtype=np.float32) for crop in crops]) / 255.0
+    observe_stage('image', 'preprocess', (datetime.now() - start_time).total_seconds())
+    return img_array
+
+
+def _chunked(entries, size):
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def detect_image_batch(model, entries):
+    """Score an iterable of ``(name, data)`` images in large batches
+
+    Images are decoded in parallel by a thread pool while the previous chunk
+    runs through the model, so decode and inference overlap. Returns one
+    result dict per entry, in input order; entries that cannot be decoded
+    get an ``error`` instead of a ``result``.
+    """
+    from .models.image_model import predict_image_batch
+
+    config = settings.IMAGE_BATCH_DETECTION
+    batch_size = max(1, int(config.get('BATCH_SIZE', 64)))
+    max_files = int(config.get('MAX_FILES', 5000))
+    workers = config.get('WORKERS') or os.cpu_count() or 1
+
+    results = []
+    count = 0
+
+    def run_chunk(chunk, futures):
+        arrays = []
+        positions = []
+        for (name, _), future in zip(chunk, futures):
+            entry = {'file': name}
+            try:
+                arrays.append(future.result())
+                positions.append(len(results))
+            except Exception as e:
+                entry['error'] = f"Could not decode image: {str(e)}"
+            results.append(entry)
+
+        if not arrays:
+            return
+        inference_start = datetime.now()
+        for position, result in zip(positions, predict_image_batch(model, arrays)):
+            results[position]['result'] = result
+        inference_end = datetime.now()
+        logger.info(f"Scored chunk of {len(arrays)} images in {(inference_end - inference_start).total_seconds():.2f} seconds")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-decode') as pool:
+        pending = None
+        for chunk in _chunked(entries, batch_size):
+            count += len(chunk)
+            if count > max_files:
+                raise BatchRequestError(f"Too many files in batch (maximum is {max_files})")
+
+            futures = []
+            for name, data in chunk:
+                if data is None:
+                    futures.append(pool.submit(_raise, ValueError('file exceeds the maximum entry size')))
+                else:
+                    futures.append(pool.submit(decode_image, data))
+
+            # Run the previous chunk through the model while this one decodes
+            if pending is not None:
+                run_chunk(*pending)
+            pending = (chunk, futures)
+
+        if pending is not None:
+            run_chunk(*pending)
+
+    return results
+
+
+def _raise(error):
+    raise error
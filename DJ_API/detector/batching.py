@@ -0,0 +1,196 @@
+import threading
+import queue
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+
+class BatchQueueFullError(Exception):
+    """Raised when the batching queue is at its configured depth"""
+
+
+class BatchTimeoutError(Exception):
+    """Raised when a queued item is not scored within the result timeout"""
+
+
+class MicroBatcher:
+    """Collect concurrent requests into batches and run them through one forward pass
+
+    The first item taken from the queue opens a collection window. Items arriving
+    within that window are added to the batch until it reaches ``max_batch_size``,
+    the window closes, or the oldest item has waited ``max_wait_ms``.
+    ``batch_fn`` receives the list of items and must return one result per item.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, window_ms=5, max_wait_ms=50, max_queue_size=256, name='batcher'):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0, window_ms) / 1000.0
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._total_items = 0
+        self._total_batches = 0
+        self._rejected = 0
+        self._running = True
+
+        self._thread = threading.Thread(target=self._run, name=f'{name}-worker', daemon=True)
+        self._thread.start()
+        logger.info(f"Started {name} (max batch size: {self.max_batch_size}, window: {window_ms} ms, "
+                    f"max wait: {max_wait_ms} ms, queue depth: {max_queue_size})")
+
+    def submit(self, item):
+        """Queue an item for batched processing and return a Future for its result"""
+        future = Future()
+        try:
+            self._queue.put_nowait((time.monotonic(), item, future))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise BatchQueueFullError(f"{self.name} queue is full ({self._queue.maxsize} pending requests)")
+        return future
+
+    def stop(self):
+        """Stop the worker thread once the items already queued have been processed"""
+        self._running = False
+        self._queue.put((time.monotonic(), None, None))
+
+    def stats(self):
+        """Return the batch sizes achieved so far and the current queue depth"""
+        with self._stats_lock:
+            return {
+                'maxBatchSize': self.max_batch_size,
+                'queueDepth': self._queue.qsize(),
+                'totalBatches': self._total_batches,
+                'totalItems': self._total_items,
+                'rejected': self._rejected,
+                'meanBatchSize': (self._total_items / self._total_batches) if self._total_batches else 0.0,
+                'batchSizes': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            }
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the window closes"""
+        enqueued_at, item, future = self._queue.get()
+        if future is None:
+            return []
+
+        batch = [(item, future)]
+        deadline = min(time.monotonic() + self.window, enqueued_at + self.max_wait)
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    _, item, future = self._queue.get(timeout=remaining)
+                else:
+                    # Window closed: still take whatever is already waiting
+                    _, item, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future is None:
+                self._running = False
+                break
+            batch.append((item, future))
+
+        return batch
+
+    def _run(self):
+        while self._running or not self._queue.empty():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Skip requests whose caller has already given up
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._total_items += len(batch)
+                self._total_batches += 1
+
+            start_time = datetime.now()
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error(f"Error running batch of {len(batch)} in {self.name}: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+            end_time = datetime.now()
+            logger.info(f"{self.name} processed batch of {len(batch)} in {(end_time - start_time).total_seconds():.4f} seconds")
+
+
+# Shared image batcher, recreated whenever the loaded image model changes
+_image_batcher = None
+_image_batcher_lock = threading.Lock()
+
+
+def image_batching_enabled():
+    return settings.IMAGE_BATCHING.get('ENABLED', False)
+
+
+def get_image_batcher(model):
+    """Return the process-wide batcher in front of the given image model"""
+    global _image_batcher
+
+    from .models.image_model import predict_image_batch
+
+    with _image_batcher_lock:
+        if _image_batcher is not None and _image_batcher.model is model:
+            return _image_batcher
+
+        if _image_batcher is not None:
+            _image_batcher.stop()
+
+        config = settings.IMAGE_BATCHING
+        batcher = MicroBatcher(
+            lambda arrays: predict_image_batch(model, arrays),
+            max_batch_size=config.get('MAX_BATCH_SIZE', 16),
+            window_ms=config.get('WINDOW_MS', 5),
+            max_wait_ms=config.get('MAX_WAIT_MS', 50),
+            max_queue_size=config.get('MAX_QUEUE_SIZE', 256),
+            name='image-batcher',
+        )
+        batcher.model = model
+        _image_batcher = batcher
+        return batcher
+
+
+def predict_image_batched(model, image_path):
+    """Preprocess an image on the calling thread and score it through the shared batcher"""
+    from .models.image_model import preprocess_and_match, remember_prediction
+
+    processed_img, perceptual_hash, result = preprocess_and_match(image_path)
+    if result is not None:
+        return result
+
+    future = get_image_batcher(model).submit(processed_img)
+    timeout = settings.IMAGE_BATCHING.get('RESULT_TIMEOUT', 30)
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # Drop the item from its batch if it has not started yet, so it is not scored for nobody
+        future.cancel()
+        raise BatchTimeoutError(f"Image was not scored within {timeout} seconds")
+    remember_prediction(perceptual_hash, result)
+    return result
+
+
+def get_image_batching_stats():
+    """Return stats for the image batcher, or None if it has not been started"""
+    batcher = _image_batcher
+    return batcher.stats() if batcher is not None else None
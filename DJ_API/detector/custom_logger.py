@@ -1,15 +1,34 @@
 import logging
+import logging.handlers
 import sys
 import os
-from datetime import datetime
-import io
-import codecs
+import atexit
+import json
+import queue
 import re
+import threading
+from datetime import datetime
+
+def get_logging_config():
+    """Return the LOG_OUTPUT settings, or defaults when Django settings are not configured"""
+    try:
+        from django.conf import settings
+        from django.core.exceptions import ImproperlyConfigured
+    except ImportError:
+        return {}
+    try:
+        return getattr(settings, 'LOG_OUTPUT', {})
+    except ImproperlyConfigured:
+        return {}
+
+log_config = get_logging_config()
 
 # Create logs directory if it doesn't exist
-logs_dir = 'logs'
+logs_dir = log_config.get('DIR', 'logs')
 os.makedirs(logs_dir, exist_ok=True)
 
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
 # Configure custom formatter
 class CustomFormatter(logging.Formatter):
     """Custom formatter with colors for console output"""
@@ -21,7 +40,7 @@ class CustomFormatter(logging.Formatter):
     bold_red = "\x1b[31;1m"
     reset = "\x1b[0m"
     
-    format_str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    format_str = LOG_FORMAT
     
     FORMATS = {
         logging.DEBUG: grey + format_str + reset,
@@ -31,53 +50,79 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: bold_red + format_str + reset
     }
     
+    def __init__(self):
+        super().__init__(LOG_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
+        self.formatters = {level: logging.Formatter(fmt, datefmt='%Y-%m-%d %H:%M:%S') for level, fmt in self.FORMATS.items()}
+    
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt, datefmt='%Y-%m-%d %H:%M:%S')
+        formatter = self.formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
+# Structured formatter, one JSON object per line
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects for log collectors"""
+    
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+# Messages to filter out. Literal substrings, except where noted
+UNWANTED_MESSAGES = [
+    # TensorFlow warnings
+    'oneDNN custom operations are on',
+    'TF_ENABLE_ONEDNN_OPTS',
+    'tensorflow/core/util/port.cc',
+    'XLA service',
+    'StreamExecutor device',
+    'Compiled cluster using XLA',
+    'All log messages before absl::InitializeLog()',
+    'service.cc:148',
+    'service.cc:156',
+    'device_compiler.h:188',
+    'The name tf.placeholder is deprecated',
+    
+    # PyTorch warnings
+    'The parameter \'pretrained\' is deprecated',
+    'Arguments other than a weight enum or `None` for \'weights\' are deprecated',
+    'Skipping variable loading for optimizer',
+    
+    # Keras warnings
+    'keras\\src\\',
+    
+    # Other common warnings to filter
+    'UserWarning:',
+    'DeprecationWarning:',
+    'FutureWarning:',
+]
+
+UNWANTED_REGEXES = [
+    # Keras warnings from a Windows user site-packages path
+    r'From C:\\Users\\.*\\keras\\',
+]
+
+# One alternation compiled at import, so each record is scanned once
+UNWANTED_PATTERN = re.compile('|'.join([re.escape(message) for message in UNWANTED_MESSAGES] + UNWANTED_REGEXES))
+
 # Filter for unwanted warnings
 class UnwantedWarningsFilter(logging.Filter):
     """Filter out unwanted warnings from TensorFlow, PyTorch, etc."""
     
     def filter(self, record):
-        message = record.getMessage()
-        
-        # List of patterns to filter out
-        unwanted_patterns = [
-            # TensorFlow warnings
-            'oneDNN custom operations are on',
-            'TF_ENABLE_ONEDNN_OPTS',
-            'tensorflow/core/util/port.cc',
-            'XLA service',
-            'StreamExecutor device',
-            'Compiled cluster using XLA',
-            'All log messages before absl::InitializeLog()',
-            'service.cc:148',
-            'service.cc:156',
-            'device_compiler.h:188',
-            'The name tf.placeholder is deprecated',
-            
-            # PyTorch warnings
-            'The parameter \'pretrained\' is deprecated',
-            'Arguments other than a weight enum or `None` for \'weights\' are deprecated',
-            'Skipping variable loading for optimizer',
-            
-            # Keras warnings
-            'From C:\\Users\\.*\\keras\\',
-            'keras\\src\\',
-            
-            # Other common warnings to filter
-            'UserWarning:',
-            'DeprecationWarning:',
-            'FutureWarning:',
-        ]
-        
         # Return False to filter out the message if it matches any pattern
-        for pattern in unwanted_patterns:
-            if re.search(pattern, message):
-                return False
-        return True
+        return UNWANTED_PATTERN.search(record.getMessage()) is None
 
 # Windows-safe console handler
 class WindowsSafeStreamHandler(logging.StreamHandler):
@@ -96,6 +141,159 @@ class WindowsSafeStreamHandler(logging.StreamHandler):
         except Exception:
             self.handleError(record)
 
+# Daily log file handler
+class DailyFileHandler(logging.FileHandler):
+    """Write to ``<prefix>-YYYYMMDD.log`` and switch to a new file when the date changes
+    
+    Rolling over by opening the next dated file, rather than renaming the current
+    one like TimedRotatingFileHandler, is safe when several worker processes log
+    to the same directory.
+    """
+    
+    def __init__(self, directory, prefix, backup_count=0, encoding='utf-8'):
+        self.directory = directory
+        self.prefix = prefix
+        self.backup_count = backup_count
+        self.day = datetime.now().strftime('%Y%m%d')
+        self.file_pattern = re.compile(re.escape(prefix) + r'-\d{8}\.log$')
+        super().__init__(self.path_for(self.day), encoding=encoding, delay=True)
+        self.remove_old_files()
+    
+    def path_for(self, day):
+        return os.path.join(self.directory, f'{self.prefix}-{day}.log')
+    
+    def emit(self, record):
+        day = datetime.fromtimestamp(record.created).strftime('%Y%m%d')
+        if day != self.day:
+            self.rollover(day)
+        super().emit(record)
+    
+    def rollover(self, day):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.day = day
+        self.baseFilename = os.path.abspath(self.path_for(day))
+        self.remove_old_files()
+    
+    def remove_old_files(self):
+        """Delete the oldest dated files beyond ``backup_count`` (0 keeps them all)"""
+        if self.backup_count <= 0:
+            return
+        try:
+            names = sorted(name for name in os.listdir(self.directory)
+                           if self.file_pattern.match(name) and name != os.path.basename(self.baseFilename))
+        except OSError:
+            return
+        for name in names[:max(0, len(names) - self.backup_count)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+# Queue handler used on the logging threads
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the background writer without ever blocking the caller
+    
+    When the writer falls behind and the queue is full, records are dropped and
+    counted; the count is logged once the queue is back to half full.
+    """
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # Merge the arguments now, as they may change before the writer thread formats them
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record):
+        # Report drops once the writer has caught up, not on every free slot
+        if self.dropped and self.queue.qsize() <= self.queue.maxsize // 2:
+            warning = logging.makeLogRecord({
+                'name': record.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Dropped {self.dropped} log records because the log writer fell behind",
+            })
+            try:
+                self.queue.put_nowait(warning)
+                self.dropped = 0
+            except queue.Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Handlers shared by every logger, created on first use
+_output_handlers = None
+_queue_handler = None
+_listener = None
+_handlers_lock = threading.Lock()
+
+def build_output_handlers():
+    """Create the console, daily file and daily error file handlers"""
+    if log_config.get('FORMAT', 'text') == 'json':
+        console_formatter = JsonFormatter()
+        file_formatter = JsonFormatter()
+    else:
+        console_formatter = CustomFormatter()
+        file_formatter = logging.Formatter(LOG_FORMAT)
+    backup_count = log_config.get('BACKUP_DAYS', 0)
+    
+    # Console handler with colors - use Windows-safe handler
+    console_handler = WindowsSafeStreamHandler(sys.stdout)
+    console_handler.setFormatter(console_formatter)
+    
+    # File handler for all logs
+    file_handler = DailyFileHandler(logs_dir, 'django', backup_count)
+    file_handler.setFormatter(file_formatter)
+    
+    # Error file handler
+    error_handler = DailyFileHandler(logs_dir, 'django-error', backup_count)
+    error_handler.setLevel(logging.ERROR)
+    error_handler.setFormatter(file_formatter)
+    
+    return [console_handler, file_handler, error_handler]
+
+def stop_log_listener():
+    """Write out the queued records and stop the background writer"""
+    global _listener
+    with _handlers_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+def get_logger_handlers():
+    """Return the handlers to attach to a logger
+    
+    With ASYNC enabled this is a single queue handler; a QueueListener thread
+    writes the records to the console and files, so requests never wait on
+    stdout or disk. The unwanted warnings filter runs once, on that handler.
+    """
+    global _output_handlers, _queue_handler, _listener
+    with _handlers_lock:
+        if _output_handlers is None:
+            _output_handlers = build_output_handlers()
+            unwanted_filter = UnwantedWarningsFilter()
+            if log_config.get('ASYNC', True):
+                log_queue = queue.Queue(maxsize=log_config.get('QUEUE_SIZE', 10000))
+                _queue_handler = NonBlockingQueueHandler(log_queue)
+                _queue_handler.addFilter(unwanted_filter)
+                _listener = logging.handlers.QueueListener(log_queue, *_output_handlers, respect_handler_level=True)
+                _listener.start()
+                atexit.register(stop_log_listener)
+            else:
+                for handler in _output_handlers:
+                    handler.addFilter(unwanted_filter)
+        return [_queue_handler] if _queue_handler is not None else list(_output_handlers)
+
 # Dictionary to track logger instances
 _loggers = {}
 
@@ -122,29 +320,9 @@ def setup_logger(name):
     logger.setLevel(logging.INFO)
     logger.propagate = False  # Prevent propagation to avoid duplicate logs
     
-    # Add filter to all handlers
-    unwanted_filter = UnwantedWarningsFilter()
-    
-    # Console handler with colors - use Windows-safe handler
-    console_handler = WindowsSafeStreamHandler(sys.stdout)
-    console_handler.setFormatter(CustomFormatter())
-    console_handler.addFilter(unwanted_filter)
-    
-    # File handler for all logs
-    file_handler = logging.FileHandler(os.path.join(logs_dir, f'django-{datetime.now().strftime("%Y%m%d")}.log'), encoding='utf-8')
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    file_handler.addFilter(unwanted_filter)
-    
-    # Error file handler
-    error_handler = logging.FileHandler(os.path.join(logs_dir, f'django-error-{datetime.now().strftime("%Y%m%d")}.log'), encoding='utf-8')
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    error_handler.addFilter(unwanted_filter)
-    
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
+    # Add the shared handlers to the logger
+    for handler in get_logger_handlers():
+        logger.addHandler(handler)
     
     # Store logger in dictionary
     _loggers[name] = logger
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+FEATURE_SIZE = 2048
+
+# One record per frame: its index in the video and the pooled backbone features
+RECORD_DTYPE = np.dtype([('frame', '<i8'), ('features', '<f2', (FEATURE_SIZE,))])
+
+
+class FrameEmbeddingCache:
+    """Per-frame video backbone features, stored as float16 and read through memory maps
+
+    Each (video content hash, fingerprint) pair has one append-only file of
+    fixed-size records. Appends are single ``O_APPEND`` writes, so several
+    processes can share the directory; a reader only maps whole records. Reads
+    refresh the file's mtime and the oldest files are evicted beyond
+    ``max_bytes``, as in the upload store.
+    """
+
+    def __init__(self, directory, max_bytes=None, sweep_interval=60):
+        self.directory = directory
+        self.max_bytes = max_bytes or None
+        self.sweep_interval = sweep_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evicted': 0}
+
+    def path_for(self, content_hash, fingerprint):
+        return os.path.join(self.directory, f'{content_hash}-{fingerprint}.f16')
+
+    def _open(self, path):
+        """Memory-map the complete records of a file, or return None if there are none"""
+        try:
+            count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        except FileNotFoundError:
+            return None
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(count,))
+
+    def cached_frames(self, content_hash, fingerprint):
+        """Return the set of frame indices stored for a video"""
+        records = self._open(self.path_for(content_hash, fingerprint))
+        if records is None:
+            return set()
+        return set(np.asarray(records['frame']).tolist())
+
+    def get(self, content_hash, fingerprint, frame_indices):
+        """Return ``{frame_index: float16 features}`` for the requested frames that are stored"""
+        frame_indices = [int(idx) for idx in frame_indices]
+        path = self.path_for(content_hash, fingerprint)
+        records = self._open(path)
+        found = {}
+        if records is not None:
+            rows = {frame: row for row, frame in enumerate(np.asarray(records['frame']).tolist())}
+            for idx in frame_indices:
+                row = rows.get(idx)
+                if row is not None:
+                    found[idx] = np.array(records['features'][row])
+            del records
+            if found:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(set(frame_indices)) - len(found)
+        return found
+
+    def put(self, content_hash, fingerprint, frame_indices, features):
+        """Append the features of newly computed frames"""
+        if len(frame_indices) == 0:
+            return
+        records = np.empty(len(frame_indices), dtype=RECORD_DTYPE)
+        records['frame'] = frame_indices
+        records['features'] = np.asarray(features, dtype=np.float16)
+
+        path = self.path_for(content_hash, fingerprint)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.write(fd, records.tobytes())
+        finally:
+            os.close(fd)
+
+        with self._lock:
+            self._stats['stores'] += len(frame_indices)
+        self.maybe_sweep()
+
+    def maybe_sweep(self):
+        if self.max_bytes is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        try:
+            self.sweep()
+        except Exception as e:
+            logger.error(f"Error sweeping frame embedding cache: {str(e)}")
+
+    def sweep(self):
+        """Delete the least recently used files beyond max_bytes and return the bytes kept"""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+                except FileNotFoundError:
+                    continue
+
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        if self.max_bytes is not None:
+            for mtime, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    evicted += 1
+                except OSError:
+                    pass
+                total -= size
+
+        if evicted:
+            logger.info(f"Frame embedding cache evicted {evicted} videos, {total / (1024 * 1024):.1f} MB stored")
+            with self._lock:
+                self._stats['evicted'] += evicted
+        return total
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_frame_embedding_cache = None
+_frame_embedding_cache_lock = threading.Lock()
+
+
+def frame_embedding_cache_enabled():
+    return settings.FRAME_EMBEDDING_CACHE.get('ENABLED', False)
+
+
+def get_frame_embedding_cache():
+    """Return the process-wide frame embedding cache"""
+    global _frame_embedding_cache
+
+    with _frame_embedding_cache_lock:
+        if _frame_embedding_cache is None:
+            config = settings.FRAME_EMBEDDING_CACHE
+            _frame_embedding_cache = FrameEmbeddingCache(
+                directory=config['DIR'],
+                max_bytes=config.get('MAX_BYTES'),
+                sweep_interval=config.get('SWEEP_INTERVAL', 60),
+            )
+        return _frame_embedding_cache
+
+
+def get_frame_embedding_cache_stats():
+    """Return stats for the frame embedding cache, or None if it has not been used"""
+    cache = _frame_embedding_cache
+    return cache.stats() if cache is not None else None
@@ -0,0 +1,220 @@
+import os
+import threading
+import cv2
+import numpy as np
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+
+class FaceDetector:
+    """CPU face detector returning ``(x, y, w, h)`` boxes in original frame pixels
+
+    ``cascade`` uses an OpenCV Haar cascade (bundled with opencv-python);
+    ``dnn`` uses OpenCV's YuNet detector (cv2.FaceDetectorYN) with a model file.
+    Frames are downscaled to ``detection_size`` on their longest side before
+    detection. Instances keep per-call state, so use one per thread.
+    """
+
+    def __init__(self, backend='cascade', detection_size=640, min_face_size=24, score_threshold=0.7,
+                 cascade_path=None, dnn_model_path=None):
+        self.backend = backend
+        self.detection_size = detection_size
+        self.min_face_size = min_face_size
+
+        if backend == 'dnn':
+            if not dnn_model_path or not os.path.exists(dnn_model_path):
+                raise ValueError(f"Face detection model not found at {dnn_model_path}")
+            self._detector = cv2.FaceDetectorYN.create(dnn_model_path, '', (320, 320), score_threshold)
+        elif backend == 'cascade':
+            if cascade_path is None:
+                cascade_path = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+            self._detector = cv2.CascadeClassifier(cascade_path)
+            if self._detector.empty():
+                raise ValueError(f"Could not load face cascade from {cascade_path}")
+        else:
+            raise ValueError(f"Unknown face detector backend: {backend}")
+
+    def detect(self, frame):
+        """Return face boxes in a BGR (or grayscale) uint8 frame, largest first"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.detection_size / float(max(height, width)))
+        small = frame if scale == 1.0 else cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+        if self.backend == 'dnn':
+            if small.ndim == 2:
+                small = cv2.cvtColor(small, cv2.COLOR_GRAY2BGR)
+            self._detector.setInputSize((small.shape[1], small.shape[0]))
+            _, faces = self._detector.detect(small)
+            boxes = [] if faces is None else [face[:4] for face in faces]
+        else:
+            gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            min_size = max(1, int(self.min_face_size * scale))
+            boxes = self._detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size))
+
+        boxes = [tuple(float(value) / scale for value in box) for box in boxes]
+        return sorted(boxes, key=lambda box: box[2] * box[3], reverse=True)
+
+
+def expand_box(box, frame_shape, margin=0.3):
+    """Grow a box by ``margin`` on each side into a square, clipped to the frame
+
+    Returns integer ``(x0, y0, x1, y1)`` corners.
+    """
+    x, y, w, h = box
+    height, width = frame_shape[:2]
+    size = max(w, h) * (1 + 2 * margin)
+    cx, cy = x + w / 2, y + h / 2
+    x0 = int(max(0, round(cx - size / 2)))
+    y0 = int(max(0, round(cy - size / 2)))
+    x1 = int(min(width, round(cx + size / 2)))
+    y1 = int(min(height, round(cy + size / 2)))
+    return x0, y0, max(x1, x0 + 1), max(y1, y0 + 1)
+
+
+def box_iou(a, b):
+    """Intersection over union of two ``(x, y, w, h)`` boxes"""
+    ix = max(0.0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def track_faces(frames, detector, keyframe_interval=5, max_faces=4, min_iou=0.2):
+    """Return one box per frame for each face track across a sequence of sampled frames
+
+    Faces are detected only on every ``keyframe_interval``-th frame (and the last
+    one). Detections on consecutive keyframes are linked into tracks by greedy IoU
+    matching, and boxes on the frames in between are linearly interpolated between
+    the two keyframes; before a track's first and after its last keyframe its
+    nearest box is held. Returns a list of tracks, each a list of ``len(frames)``
+    boxes, longest-lived and largest faces first.
+    """
+    if not frames:
+        return []
+
+    keyframes = list(range(0, len(frames), max(1, keyframe_interval)))
+    if keyframes[-1] != len(frames) - 1:
+        keyframes.append(len(frames) - 1)
+
+    # Each track maps keyframe index -> box
+    tracks = []
+    previous = []
+    for index in keyframes:
+        boxes = detector.detect(frames[index])[:max_faces]
+        assigned = []
+        candidates = sorted(((box_iou(track[max(track)], box), t, b)
+                             for t, track in previous for b, box in enumerate(boxes)), reverse=True)
+        used_tracks, used_boxes = set(), set()
+        for iou, t, b in candidates:
+            if iou < min_iou or t in used_tracks or b in used_boxes:
+                continue
+            tracks[t][index] = boxes[b]
+            used_tracks.add(t)
+            used_boxes.add(b)
+            assigned.append((t, tracks[t]))
+        for b, box in enumerate(boxes):
+            if b not in used_boxes:
+                tracks.append({index: box})
+                assigned.append((len(tracks) - 1, tracks[-1]))
+        previous = assigned
+
+    tracks.sort(key=lambda track: (len(track), max(box[2] * box[3] for box in track.values())), reverse=True)
+
+    results = []
+    for track in tracks[:max_faces]:
+        known = sorted(track)
+        boxes = []
+        for i in range(len(frames)):
+            before = max((k for k in known if k <= i), default=known[0])
+            after = min((k for k in known if k >= i), default=known[-1])
+            if before == after:
+                boxes.append(track[before])
+                continue
+            weight = (i - before) / float(after - before)
+            boxes.append(tuple((1 - weight) * p + weight * q for p, q in zip(track[before], track[after])))
+        results.append(boxes)
+    return results
+
+
+def crop_box(frame, box, margin=0.3):
+    """Crop a face box, expanded by ``margin``, out of a numpy frame"""
+    x0, y0, x1, y1 = expand_box(box, frame.shape, margin)
+    return frame[y0:y1, x0:x1]
+
+
+_detectors = threading.local()
+
+
+def face_roi_enabled():
+    return settings.FACE_ROI.get('ENABLED', False)
+
+
+def get_face_detector():
+    """Return this thread's face detector, or None if it cannot be created"""
+    detector = getattr(_detectors, 'detector', None)
+    if detector is None and not getattr(_detectors, 'failed', False):
+        config = settings.FACE_ROI
+        try:
+            detector = FaceDetector(
+                backend=config.get('DETECTOR', 'cascade'),
+                detection_size=config.get('DETECTION_SIZE', 640),
+                min_face_size=config.get('MIN_FACE_SIZE', 24),
+                score_threshold=config.get('SCORE_THRESHOLD', 0.7),
+                cascade_path=config.get('CASCADE_PATH'),
+                dnn_model_path=config.get('DNN_MODEL_PATH'),
+            )
+        except Exception as e:
+            logger.error(f"Face ROI disabled, could not create face detector: {str(e)}")
+            _detectors.failed = True
+            return None
+        _detectors.detector = detector
+    return detector
+
+
+def get_face_roi_params():
+    """Return the ROI settings that change model inputs, for result cache keys"""
+    if not face_roi_enabled():
+        return None
+    config = settings.FACE_ROI
+    return {key: config.get(key) for key in ('DETECTOR', 'DETECTION_SIZE', 'MIN_FACE_SIZE', 'SCORE_THRESHOLD',
+                                             'MARGIN', 'MAX_FACES', 'KEYFRAME_INTERVAL')}
+
+
+def crop_image_faces(img):
+    """Return face crops of a PIL image (up to MAX_FACES), or ``[img]`` when no face is found"""
+    detector = get_face_detector()
+    if detector is None:
+        return [img]
+
+    config = settings.FACE_ROI
+    gray = np.asarray(img.convert('L'))
+    boxes = detector.detect(gray)[:config.get('MAX_FACES', 4)]
+    if not boxes:
+        logger.info("No face found, using the whole image")
+        return [img]
+
+    logger.info(f"Found {len(boxes)} face(s) in image")
+    crops = []
+    for box in boxes:
+        x0, y0, x1, y1 = expand_box(box, gray.shape, config.get('MARGIN', 0.3))
+        crops.append(img.crop((x0, y0, x1, y1)))
+    return crops
+
+
+def crop_frame_tracks(frames):
+    """Return one list of face crops per tracked face, or ``[frames]`` when no face is found"""
+    detector = get_face_detector()
+    if detector is None:
+        return [frames]
+
+    config = settings.FACE_ROI
+    tracks = track_faces(frames, detector, keyframe_interval=config.get('KEYFRAME_INTERVAL', 5),
+                         max_faces=config.get('MAX_FACES', 4))
+    if not tracks:
+        logger.info("No face found in sampled frames, using whole frames")
+        return [frames]
+
+    logger.info(f"Tracking {len(tracks)} face(s) across {len(frames)} frames")
+    margin = config.get('MARGIN', 0.3)
+    return [[crop_box(frame, box, margin) for frame, box in zip(frames, boxes)] for boxes in tracks]
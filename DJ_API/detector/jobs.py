@@ -0,0 +1,229 @@
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+from .result_cache import get_shared_cache
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue is at its configured depth"""
+
+
+class Job:
+    """A unit of background work and its lifecycle timestamps"""
+
+    def __init__(self, kind, fn, description=''):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.description = description
+        self.key = None
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def wait_time(self):
+        if self.started_at is None:
+            return time.time() - self.queued_at
+        return self.started_at - self.queued_at
+
+    @property
+    def run_time(self):
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self):
+        def timestamp(value):
+            return datetime.fromtimestamp(value, tz=timezone.utc).isoformat() if value else None
+
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'queued_at': timestamp(self.queued_at),
+            'started_at': timestamp(self.started_at),
+            'finished_at': timestamp(self.finished_at),
+            'wait_time': self.wait_time,
+            'run_time': self.run_time,
+        }
+        if self.status == 'completed':
+            data.update(self.result)
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded queue drained by a fixed pool of background worker threads
+
+    Job state is kept in memory and, when ``shared_cache_alias`` is set, mirrored
+    to that Django cache so any web worker can answer status polls.
+    """
+
+    def __init__(self, name, workers=2, max_queue_size=64, max_finished_jobs=1000, shared_cache_alias=None, job_ttl=3600):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_finished_jobs = max(1, int(max_finished_jobs))
+        self.shared_cache_alias = shared_cache_alias
+        self.job_ttl = job_ttl
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._jobs = OrderedDict()
+        self._active_keys = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+                       'totalWaitTime': 0.0, 'totalRunTime': 0.0, 'maxWaitTime': 0.0, 'maxRunTime': 0.0}
+
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'{name}-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {name} with {self.workers} workers (queue depth: {self._queue.maxsize})")
+
+    def submit(self, job, key=None):
+        """Queue a job, raising JobQueueFullError when the queue is at capacity
+        
+        When ``key`` matches a job that is still queued or running, that job is
+        returned instead and the new one is dropped.
+        """
+        with self._lock:
+            active = self._active_keys.get(key) if key is not None else None
+            if active is not None:
+                logger.info(f"Reusing active {active.kind} job {active.id} for {job.description}")
+                return active
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._stats['rejected'] += 1
+                raise JobQueueFullError(f"{self.name} queue is full ({self._queue.maxsize} pending jobs)")
+            self._jobs[job.id] = job
+            if key is not None:
+                job.key = key
+                self._active_keys[key] = job
+            self._stats['submitted'] += 1
+        self._publish(job)
+        logger.info(f"Queued {job.kind} job {job.id} {job.description} (queue depth: {self._queue.qsize()})")
+        return job
+
+    def get(self, job_id):
+        """Return the status dict of a job from this process or the shared cache"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        cache = self._get_shared_cache()
+        if cache is not None:
+            try:
+                return cache.get(f'detector:job:{job_id}')
+            except Exception as e:
+                logger.error(f"Error reading job {job_id} from shared cache: {str(e)}")
+        return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['running'] = self._running
+        finished = stats['completed'] + stats['failed']
+        started = finished + stats['running']
+        stats.update({
+            'workers': self.workers,
+            'queueDepth': self._queue.qsize(),
+            'maxQueueSize': self._queue.maxsize,
+            'meanWaitTime': (stats['totalWaitTime'] / started) if started else 0.0,
+            'meanRunTime': (stats['totalRunTime'] / finished) if finished else 0.0,
+        })
+        return stats
+
+    def _get_shared_cache(self):
+        if not self.shared_cache_alias:
+            return None
+        return get_shared_cache(self.shared_cache_alias)
+
+    def _publish(self, job):
+        cache = self._get_shared_cache()
+        if cache is None:
+            return
+        try:
+            cache.set(f'detector:job:{job.id}', job.to_dict(), timeout=self.job_ttl)
+        except Exception as e:
+            logger.error(f"Error publishing job {job.id} to shared cache: {str(e)}")
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.status = 'running'
+            with self._lock:
+                self._running += 1
+                self._stats['totalWaitTime'] += job.wait_time
+                self._stats['maxWaitTime'] = max(self._stats['maxWaitTime'], job.wait_time)
+            self._publish(job)
+            logger.info(f"Running {job.kind} job {job.id} after waiting {job.wait_time:.2f} seconds")
+
+            try:
+                job.result = job.fn()
+                job.status = 'completed'
+            except Exception as e:
+                logger.error(f"Error in {job.kind} job {job.id}: {str(e)}")
+                logger.error(traceback.format_exc())
+                job.error = str(e)
+                job.status = 'failed'
+            job.finished_at = time.time()
+            job.fn = None
+
+            with self._lock:
+                if job.key is not None and self._active_keys.get(job.key) is job:
+                    del self._active_keys[job.key]
+                self._running -= 1
+                self._stats[job.status] += 1
+                self._stats['totalRunTime'] += job.run_time
+                self._stats['maxRunTime'] = max(self._stats['maxRunTime'], job.run_time)
+                self._prune()
+            self._publish(job)
+            logger.info(f"{job.kind.capitalize()} job {job.id} {job.status} in {job.run_time:.2f} seconds")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+
+_video_job_queue = None
+_video_job_queue_lock = threading.Lock()
+
+
+def get_video_job_queue():
+    """Return the process-wide video job queue, starting its workers on first use"""
+    global _video_job_queue
+
+    with _video_job_queue_lock:
+        if _video_job_queue is None:
+            config = settings.VIDEO_JOBS
+            _video_job_queue = JobQueue(
+                'video-jobs',
+                workers=config.get('WORKERS', 2),
+                max_queue_size=config.get('MAX_QUEUE_SIZE', 64),
+                max_finished_jobs=config.get('MAX_FINISHED_JOBS', 1000),
+                shared_cache_alias=config.get('SHARED_CACHE'),
+                job_ttl=config.get('JOB_TTL', 3600),
+            )
+        return _video_job_queue
+
+
+def get_video_job_stats():
+    job_queue = _video_job_queue
+    return job_queue.stats() if job_queue is not None else None
@@ -0,0 +1,259 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from django.conf import settings
+from .profiling import record_stage
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class for metrics with a fixed set of label names
+
+    Every update takes one short lock and touches a dict entry, so instrumenting
+    the request path costs a few microseconds per call.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        """Return ``(suffix, labelnames, labelvalues, value)`` tuples for the exposition format"""
+        with self._lock:
+            values = dict(self._values)
+        return [('', self.labelnames, key, value) for key, value in sorted(values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, names, values, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(names, values)} {format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge set directly, or read from ``collect`` (returning ``{labelvalues: value}``) at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.collect is None:
+            return super().samples()
+        return [('', self.labelnames, tuple(str(v) for v in key), value) for key, value in sorted(self.collect().items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (made cumulative when rendered), sum, count
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(series[0]), series[1], series[2]) for key, series in self._values.items()}
+        samples = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', self.labelnames + ('le',), key + (format_value(bound),), cumulative))
+            samples.append(('_sum', self.labelnames, key, total))
+            samples.append(('_count', self.labelnames, key, count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def metrics_enabled():
+    return settings.METRICS.get('ENABLED', False)
+
+
+def collect_model_load_times():
+    from .registry import model_registry
+    return {(name,): seconds for name, seconds in model_registry.load_times().items()}
+
+
+def collect_mock_models():
+    import sys
+    from .registry import model_registry
+    values = {}
+    for name in ('image', 'video'):
+        module = sys.modules.get(f'detector.models.{name}_model')
+        if module is not None and model_registry.is_loaded(name):
+            values[(name,)] = int(module.USING_MOCK_MODEL)
+    return values
+
+
+def collect_queue_depths():
+    from .batching import get_image_batching_stats
+    from .jobs import get_video_job_stats
+    values = {}
+    batching = get_image_batching_stats()
+    if batching is not None:
+        values[('image_batching',)] = batching['queueDepth']
+    jobs = get_video_job_stats()
+    if jobs is not None:
+        values[('video_jobs',)] = jobs['queueDepth']
+    return values
+
+
+def collect_running_jobs():
+    from .jobs import get_video_job_stats
+    jobs = get_video_job_stats()
+    return {('video_jobs',): jobs['running']} if jobs is not None else {}
+
+
+registry = MetricsRegistry()
+
+_buckets = settings.METRICS.get('LATENCY_BUCKETS', DEFAULT_LATENCY_BUCKETS)
+
+REQUEST_DURATION = registry.register(Histogram(
+    'detector_request_duration_seconds', 'Total time spent handling a detection request.',
+    ('media_type', 'endpoint'), _buckets))
+STAGE_DURATION = registry.register(Histogram(
+    'detector_stage_duration_seconds', 'Time spent in one stage of the detection pipeline (upload_save, preprocess, inference).',
+    ('media_type', 'stage'), _buckets))
+REQUESTS = registry.register(Counter(
+    'detector_requests_total', 'Detection requests by response status.', ('media_type', 'endpoint', 'status')))
+ERRORS = registry.register(Counter(
+    'detector_request_errors_total', 'Detection requests that failed with a server error.', ('media_type', 'endpoint')))
+MOCK_RESULTS = registry.register(Counter(
+    'detector_mock_results_total', 'Verdicts produced by a mock model, including fallbacks after errors.', ('media_type',)))
+IN_FLIGHT = registry.register(Gauge(
+    'detector_requests_in_flight', 'Detection requests currently being handled.', ('media_type', 'endpoint')))
+QUEUE_DEPTH = registry.register(Gauge(
+    'detector_queue_depth', 'Items waiting in a background queue.', ('queue',), collect=collect_queue_depths))
+RUNNING_JOBS = registry.register(Gauge(
+    'detector_jobs_running', 'Background jobs currently running.', ('queue',), collect=collect_running_jobs))
+MODEL_LOAD_TIME = registry.register(Gauge(
+    'detector_model_load_seconds', 'Time it took to load each model.', ('model',), collect=collect_model_load_times))
+MOCK_MODELS = registry.register(Gauge(
+    'detector_model_is_mock', 'Whether a loaded model is a mock (1) or the real model (0).', ('model',), collect=collect_mock_models))
+
+
+def observe_stage(media_type, stage, seconds):
+    """Record the duration of one pipeline stage, in the metrics and the request profile"""
+    record_stage(stage, seconds)
+    if metrics_enabled():
+        STAGE_DURATION.observe(seconds, media_type=media_type, stage=stage)
+
+
+def count_results(media_type, results):
+    """Count verdicts that came from a mock model"""
+    if metrics_enabled():
+        mock = sum(1 for result in results if isinstance(result, dict) and result.get('usingMockModel'))
+        if mock:
+            MOCK_RESULTS.inc(mock, media_type=media_type)
+
+
+def track_request(media_type, endpoint):
+    """Decorate a view method to record its latency, response status and in-flight count"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            if not metrics_enabled():
+                return handler(view, request, *args, **kwargs)
+
+            IN_FLIGHT.inc(media_type=media_type, endpoint=endpoint)
+            start = time.perf_counter()
+            status_code = 500
+            try:
+                response = handler(view, request, *args, **kwargs)
+                status_code = response.status_code
+                data = getattr(response, 'data', None)
+                if isinstance(data, dict):
+                    entries = [entry.get('result') for entry in data.get('results') or () if isinstance(entry, dict)]
+                    count_results(media_type, [data.get('result')] + entries)
+                return response
+            finally:
+                REQUEST_DURATION.observe(time.perf_counter() - start, media_type=media_type, endpoint=endpoint)
+                REQUESTS.inc(media_type=media_type, endpoint=endpoint, status=status_code)
+                if status_code >= 500:
+                    ERRORS.inc(media_type=media_type, endpoint=endpoint)
+                IN_FLIGHT.dec(media_type=media_type, endpoint=endpoint)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    return registry.render()
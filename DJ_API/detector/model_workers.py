@@ -0,0 +1,466 @@
+import atexit
+import multiprocessing
+import os
+import secrets
+import signal
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import connection, shared_memory
+import numpy as np
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+# Set in worker processes, which load the models themselves
+IS_MODEL_WORKER = False
+
+# Environment flag marking a worker process, so app startup does not load every served model there
+WORKER_ENV_FLAG = 'DETECTOR_MODEL_WORKER'
+
+# Smallest shared memory segment a connection allocates; segments grow to fit larger inputs
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+# Idle connections kept per worker beyond this are closed
+MAX_IDLE_CONNECTIONS = 8
+
+
+class ModelWorkerError(Exception):
+    """Raised when a model worker process cannot serve a request"""
+
+
+def model_workers_enabled(media_type):
+    """Whether this process hands inference for a media type to a worker process"""
+    config = settings.MODEL_WORKERS
+    return config.get('ENABLED', False) and media_type in config.get('MEDIA_TYPES', ('image', 'video')) and not IS_MODEL_WORKER
+
+
+def worker_address(media_type, generation):
+    """Return the local socket (or named pipe on Windows) a worker listens on"""
+    name = f'detector-{media_type}-{os.getpid()}-{generation}'
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\{name}'
+    return os.path.join(settings.MODEL_WORKERS.get('SOCKET_DIR') or tempfile.gettempdir(), f'{name}.sock')
+
+
+def remove_socket(address):
+    if address and not address.startswith('\\\\'):
+        try:
+            os.remove(address)
+        except OSError:
+            pass
+
+
+def attach_shared_memory(name):
+    """Open a segment created by the server process without taking ownership of it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Workers are spawned with the server's resource tracker, so registering the segment again is harmless
+    return shared_memory.SharedMemory(name=name)
+
+
+def exit_with_parent(parent):
+    """Stop the worker once the server process that started it has gone"""
+    parent.join()
+    os._exit(0)
+
+
+def serve_connection(conn, module, model, info):
+    """Answer ``ping`` and ``predict`` requests from one server thread until it disconnects
+
+    ``predict`` carries the name, shape and dtype of a shared memory segment
+    holding the input array. The array is used in place and only the model
+    output is sent back.
+    """
+    segment = None
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+
+            command = message[0]
+            if command == 'ping':
+                conn.send(('ok', info))
+            elif command == 'predict':
+                _, name, shape, dtype = message
+                if segment is None or segment.name != name:
+                    if segment is not None:
+                        segment.close()
+                    segment = attach_shared_memory(name)
+                inputs = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+                try:
+                    reply = ('ok', np.asarray(module.predict_array(model, inputs)))
+                except Exception as e:
+                    logger.error(f"Error in {info['mediaType']} model worker: {str(e)}")
+                    reply = ('error', f"{type(e).__name__}: {str(e)}")
+                finally:
+                    del inputs
+                conn.send(reply)
+            else:
+                conn.send(('error', f"Unknown command '{command}'"))
+    finally:
+        conn.close()
+        if segment is not None:
+            try:
+                segment.close()
+            except BufferError:
+                pass
+
+
+def run_worker(media_type, address, authkey):
+    """Entry point of a model worker process: load the model and serve requests on ``address``"""
+    global IS_MODEL_WORKER
+    IS_MODEL_WORKER = True
+    os.environ[WORKER_ENV_FLAG] = '1'
+
+    # Ctrl-C reaches the whole process group; the server process stops its workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import django
+    django.setup()
+    from .registry import model_registry, get_model_module
+
+    # The server only starts a worker when it wants the real model
+    module = get_model_module(media_type)
+    module.force_real_models()
+    model = model_registry.get(media_type)
+
+    listener = connection.Listener(address, authkey=authkey)
+    threading.Thread(target=exit_with_parent, args=(multiprocessing.parent_process(),), daemon=True).start()
+    info = {
+        'mediaType': media_type,
+        'pid': os.getpid(),
+        'usingMockModel': bool(module.USING_MOCK_MODEL),
+        'loadSeconds': model_registry.load_times().get(media_type),
+    }
+    logger.info(f"{media_type.capitalize()} model worker {os.getpid()} listening on {address}")
+
+    while True:
+        try:
+            conn = listener.accept()
+        except (OSError, multiprocessing.AuthenticationError) as e:
+            logger.warning(f"Rejected connection to {media_type} model worker: {str(e)}")
+            continue
+        threading.Thread(target=serve_connection, args=(conn, module, model, info),
+                         name=f'{media_type}-worker-connection', daemon=True).start()
+
+
+class WorkerChannel:
+    """One connection to a worker, with the shared memory segment its inputs are written to"""
+
+    def __init__(self, address, authkey, generation):
+        self.connection = connection.Client(address, authkey=authkey)
+        self.generation = generation
+        self.segment = None
+
+    def predict(self, inputs, timeout):
+        """Copy the inputs into shared memory and return the worker's ``(status, payload)`` reply"""
+        if self.segment is None or self.segment.size < inputs.nbytes:
+            size = max(inputs.nbytes, MIN_SEGMENT_SIZE, 2 * self.segment.size if self.segment is not None else 0)
+            self.release_segment()
+            self.segment = shared_memory.SharedMemory(create=True, size=size)
+        np.ndarray(inputs.shape, dtype=inputs.dtype, buffer=self.segment.buf)[...] = inputs
+
+        self.connection.send(('predict', self.segment.name, inputs.shape, inputs.dtype.str))
+        if not self.connection.poll(timeout):
+            raise ModelWorkerError(f"No answer from the model worker within {timeout} seconds")
+        return self.connection.recv()
+
+    def release_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
+            self.segment = None
+
+    def close(self):
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+        self.release_segment()
+
+
+class ModelWorkerClient:
+    """Run a model in a dedicated worker process and call it like the model itself
+
+    Each call writes the input array into a shared memory segment owned by the
+    calling connection and gets the (small) output back over a local socket, so
+    inputs are never pickled. Concurrent callers use separate connections. A
+    supervisor thread pings the worker and restarts it, with exponential
+    backoff, when it exits or stops answering.
+    """
+
+    backend = 'worker'
+
+    def __init__(self, media_type):
+        self.media_type = media_type
+        self.config = settings.MODEL_WORKERS
+        self.process = None
+        self.address = None
+        self.info = {}
+
+        self._authkey = secrets.token_bytes(32)
+        self._context = multiprocessing.get_context('spawn')
+        self._generation = 0
+        self._control = None
+        self._idle = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_exit_code = None
+        self._stats = {'requests': 0, 'errors': 0, 'restarts': 0}
+
+    @property
+    def using_mock_model(self):
+        return bool(self.info.get('usingMockModel'))
+
+    def start(self):
+        """Start the worker, wait until its model is loaded and start supervising it"""
+        self._spawn()
+        threading.Thread(target=self._supervise, name=f'{self.media_type}-worker-supervisor', daemon=True).start()
+        return self
+
+    def _spawn(self):
+        start_time = time.monotonic()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            previous_address = self.address
+            idle, self._idle = self._idle, []
+        for channel in idle:
+            channel.close()
+        remove_socket(previous_address)
+
+        address = worker_address(self.media_type, generation)
+        remove_socket(address)
+        process = self._context.Process(target=run_worker, args=(self.media_type, address, self._authkey),
+                                        name=f'detector-{self.media_type}-worker', daemon=True)
+        process.start()
+
+        # The worker listens once its model is loaded
+        deadline = start_time + self.config.get('START_TIMEOUT', 300)
+        while True:
+            if not process.is_alive():
+                self._last_exit_code = process.exitcode
+                raise ModelWorkerError(f"{self.media_type.capitalize()} model worker exited with code {process.exitcode} while loading")
+            try:
+                control = connection.Client(address, authkey=self._authkey)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    self._terminate(process)
+                    raise ModelWorkerError(f"{self.media_type.capitalize()} model worker did not start within {self.config.get('START_TIMEOUT', 300)} seconds")
+                time.sleep(0.1)
+
+        control.send(('ping',))
+        _, info = control.recv()
+        with self._lock:
+            self.process = process
+            self.address = address
+            self._control = control
+            self.info = info
+        self._ready.set()
+        logger.info(f"{self.media_type.capitalize()} model worker {process.pid} ready in {time.monotonic() - start_time:.2f} seconds"
+                    f"{' (mock model)' if info.get('usingMockModel') else ''}")
+
+    def _terminate(self, process):
+        if process is None:
+            return
+        if process.is_alive():
+            process.terminate()
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join(5)
+        self._last_exit_code = process.exitcode
+
+    def _ping(self):
+        """Return True if the worker answers a health check in time"""
+        control = self._control
+        if control is None:
+            return False
+        try:
+            # Drop replies to checks that timed out earlier
+            while control.poll(0):
+                control.recv()
+            control.send(('ping',))
+            if not control.poll(self.config.get('PING_TIMEOUT', 10)):
+                return False
+            status, info = control.recv()
+        except (EOFError, OSError):
+            return False
+        self.info = info
+        return status == 'ok'
+
+    def _supervise(self):
+        interval = self.config.get('HEALTH_INTERVAL', 5)
+        backoff = self.config.get('RESTART_BACKOFF', 1.0)
+        max_backoff = self.config.get('MAX_RESTART_BACKOFF', 60.0)
+        max_missed = self.config.get('MAX_MISSED_PINGS', 3)
+        missed = 0
+        failures = 0
+
+        while not self._stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            process = self.process
+            if process is not None and process.is_alive() and self._ping():
+                missed = failures = 0
+                continue
+            # The worker may have died during the health check
+            if process is not None and process.is_alive():
+                missed += 1
+                if missed < max_missed:
+                    logger.warning(f"{self.media_type.capitalize()} model worker {process.pid} missed a health check ({missed}/{max_missed})")
+                    continue
+                logger.error(f"{self.media_type.capitalize()} model worker {process.pid} stopped answering, restarting it")
+            else:
+                logger.error(f"{self.media_type.capitalize()} model worker exited with code "
+                             f"{process.exitcode if process is not None else None}, restarting it")
+
+            missed = 0
+            self._ready.clear()
+            if self._control is not None:
+                self._control.close()
+                self._control = None
+            self._terminate(process)
+
+            while not self._stop.is_set():
+                failures += 1
+                if self._stop.wait(min(max_backoff, backoff * 2 ** (failures - 1))):
+                    break
+                try:
+                    self._spawn()
+                except Exception as e:
+                    logger.error(f"Could not restart {self.media_type} model worker: {str(e)}")
+                    continue
+                with self._lock:
+                    self._stats['restarts'] += 1
+                break
+
+    def _checkout(self, timeout):
+        if not self._ready.wait(timeout):
+            raise ModelWorkerError(f"{self.media_type.capitalize()} model worker is not available")
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            address, generation = self.address, self._generation
+        try:
+            return WorkerChannel(address, self._authkey, generation)
+        except OSError as e:
+            self._wake.set()
+            raise ModelWorkerError(f"Could not connect to {self.media_type} model worker: {str(e)}")
+
+    def _checkin(self, channel):
+        with self._lock:
+            if channel.generation == self._generation and len(self._idle) < MAX_IDLE_CONNECTIONS:
+                self._idle.append(channel)
+                return
+        channel.close()
+
+    def __call__(self, inputs):
+        """Run the model in the worker on a numpy array and return its output"""
+        inputs = np.ascontiguousarray(inputs)
+        timeout = self.config.get('REQUEST_TIMEOUT', 300)
+        channel = self._checkout(timeout)
+        try:
+            status, payload = channel.predict(inputs, timeout)
+        except (EOFError, OSError, ModelWorkerError) as e:
+            # The connection is in an unknown state; the supervisor checks on the worker
+            channel.close()
+            self._wake.set()
+            with self._lock:
+                self._stats['errors'] += 1
+            if isinstance(e, ModelWorkerError):
+                raise
+            raise ModelWorkerError(f"Lost connection to {self.media_type} model worker: {str(e)}") from e
+
+        self._checkin(channel)
+        with self._lock:
+            self._stats['requests'] += 1
+            if status != 'ok':
+                self._stats['errors'] += 1
+        if status != 'ok':
+            raise ModelWorkerError(payload)
+        return payload
+
+    def eval(self):
+        return self
+
+    def stop(self):
+        """Stop supervising the worker and shut it down"""
+        self._stop.set()
+        self._wake.set()
+        self._ready.clear()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for channel in idle:
+            channel.close()
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+        self._terminate(self.process)
+        remove_socket(self.address)
+
+    def stats(self):
+        process = self.process
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idleConnections'] = len(self._idle)
+        stats.update({
+            'pid': process.pid if process is not None else None,
+            'alive': bool(process is not None and process.is_alive()),
+            'ready': self._ready.is_set(),
+            'usingMockModel': self.using_mock_model,
+            'lastExitCode': self._last_exit_code,
+        })
+        return stats
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+_atexit_registered = False
+
+
+def start_model_worker(media_type):
+    """Start the worker process for a media type and return the client that calls it
+
+    Called by the model modules in place of loading the model, so the model
+    registry holds the client like any other model.
+    """
+    global _atexit_registered
+
+    client = ModelWorkerClient(media_type).start()
+    with _workers_lock:
+        previous = _workers.get(media_type)
+        _workers[media_type] = client
+        if not _atexit_registered:
+            atexit.register(stop_model_workers)
+            _atexit_registered = True
+    if previous is not None:
+        previous.stop()
+    return client
+
+
+def stop_model_workers():
+    with _workers_lock:
+        clients = list(_workers.values())
+        _workers.clear()
+    for client in clients:
+        client.stop()
+
+
+def get_model_worker_stats():
+    """Return stats per model worker, or None if no worker has been started"""
+    with _workers_lock:
+        clients = dict(_workers)
+    return {media_type: client.stats() for media_type, client in clients.items()} or None
@@ -1,39 +1,135 @@
 import os
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.applications.xception import preprocess_input
 from PIL import Image
 import logging
 from django.conf import settings
 from datetime import datetime
-import time
+from ..registry import model_registry
+from ..model_workers import model_workers_enabled
+from ..face_roi import face_roi_enabled, get_face_roi_params, crop_image_faces
+from ..metrics import observe_stage
+from ..profiling import profile_stage
+from .onnx_backend import get_backend, get_onnx_path, load_onnx_model
 
 logger = logging.getLogger(__name__)
 
-# Global variables for persistence
+# The model runs in a worker process and this process only preprocesses images
+USE_MODEL_WORKER = model_workers_enabled('image')
+
+# TensorFlow is not imported when the image model is served by ONNX Runtime or a worker process
+tf = None
+if get_backend('image') == 'native' and not USE_MODEL_WORKER:
+    import tensorflow as tf
+
+# Whether the loaded model is a mock
 USING_MOCK_MODEL = False
-_LOADED_MODEL = None
-_MODEL_LOADING_LOCK = False
 
-def load_image_model():
-    """Load the TensorFlow image model for deepfake detection"""
-    global USING_MOCK_MODEL, _LOADED_MODEL, _MODEL_LOADING_LOCK
+# Parameters that change the model input, used to key cached results
+PREPROCESSING_PARAMS = {'target_size': (224, 224), 'color': 'RGB', 'scale': 1 / 255.0, 'face_roi': get_face_roi_params()}
+
+def build_fallback_model(input_shape=(224, 224, 3)):
+    """Build the small untrained network used when the saved model cannot be loaded"""
+    inputs = tf.keras.Input(shape=input_shape)
+    x = tf.keras.layers.Conv2D(32, 3, activation="relu")(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(1, activation="sigmoid")(x)
+    return tf.keras.Model(inputs, outputs)
+
+class BucketedInference:
+    """Run a Keras model through traced concrete functions instead of ``model.predict``
+    
+    ``predict`` sets up a data adapter and step function on every call, which
+    dominates latency for small batches. Here the forward pass is traced once per
+    batch-size bucket with a fixed input signature; inputs are zero-padded up to the
+    nearest bucket (and split at the largest one), so no call ever retraces.
+    """
+    
+    def __init__(self, model, input_shape=(224, 224, 3), buckets=(1, 2, 4, 8, 16, 32, 64)):
+        self.input_shape = tuple(input_shape)
+        self.buckets = sorted({int(bucket) for bucket in buckets if int(bucket) > 0}) or [1]
+        forward = tf.function(lambda x: model(x, training=False))
+        self._functions = {
+            bucket: forward.get_concrete_function(tf.TensorSpec((bucket,) + self.input_shape, tf.float32))
+            for bucket in self.buckets
+        }
+    
+    def bucket_for(self, batch_size):
+        """Return the smallest bucket that fits the batch, or the largest bucket"""
+        for bucket in self.buckets:
+            if bucket >= batch_size:
+                return bucket
+        return self.buckets[-1]
     
-    # If model is already loaded and persistence is enabled, return it
-    if os.environ.get('FORCE_MODEL_PERSISTENCE') == 'true' and _LOADED_MODEL is not None:
-        logger.info("Using previously loaded image model (persistence enabled)")
-        return _LOADED_MODEL
+    def warmup(self):
+        """Run every bucket once so the first requests do not pay for graph setup"""
+        start_time = datetime.now()
+        for bucket in self.buckets:
+            self._run(np.zeros((bucket,) + self.input_shape, dtype=np.float32))
+        end_time = datetime.now()
+        logger.info(f"Inference warmup for buckets {self.buckets} completed in {(end_time - start_time).total_seconds():.2f} seconds")
+    
+    def _run(self, batch):
+        outputs = self._functions[len(batch)](tf.constant(batch))
+        if isinstance(outputs, (list, tuple)):
+            outputs = outputs[0]
+        elif isinstance(outputs, dict):
+            outputs = next(iter(outputs.values()))
+        return outputs.numpy()
+    
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        largest = self.buckets[-1]
+        outputs = []
+        for start in range(0, len(x), largest):
+            chunk = x[start:start + largest]
+            bucket = self.bucket_for(len(chunk))
+            if len(chunk) < bucket:
+                padding = np.zeros((bucket - len(chunk),) + chunk.shape[1:], dtype=np.float32)
+                chunk = np.concatenate([chunk, padding], axis=0)
+            outputs.append(self._run(chunk)[:min(largest, len(x) - start)])
+        return np.concatenate(outputs, axis=0)
+
+def build_inference_runner(model):
+    """Return the fast inference path for the model, or None to use ``model.predict``
     
-    # Prevent concurrent loading
-    if _MODEL_LOADING_LOCK:
-        logger.warning("Model loading already in progress, waiting...")
-        # Wait for the other thread to complete loading
-        while _MODEL_LOADING_LOCK:
-            time.sleep(0.1)
-        if _LOADED_MODEL is not None:
-            return _LOADED_MODEL
+    This is a quantized TFLite model when MODEL_QUANTIZATION['IMAGE'] asks for one,
+    otherwise a warmed BucketedInference.
+    """
+    from .quantization import get_image_quantization, build_tflite_model
     
-    _MODEL_LOADING_LOCK = True
+    if get_image_quantization() != 'none':
+        try:
+            return build_tflite_model(model, get_model_identity())
+        except Exception as e:
+            logger.error(f"Could not build quantized image model, using fp32: {str(e)}")
+    
+    config = settings.IMAGE_INFERENCE
+    if not config.get('USE_TF_FUNCTION', True):
+        return None
+    
+    try:
+        start_time = datetime.now()
+        runner = BucketedInference(model, input_shape=PREPROCESSING_PARAMS['target_size'] + (3,),
+                                   buckets=config.get('BATCH_BUCKETS', (1, 2, 4, 8, 16, 32, 64)))
+        end_time = datetime.now()
+        logger.info(f"Traced inference functions for buckets {runner.buckets} in {(end_time - start_time).total_seconds():.2f} seconds")
+        if config.get('WARMUP', True):
+            runner.warmup()
+        return runner
+    except Exception as e:
+        logger.error(f"Could not build traced inference path, falling back to model.predict: {str(e)}")
+        return None
+
+def load_image_model():
+    """Return the shared image model, loading it once per process on first use"""
+    return model_registry.get('image')
+
+def build_image_model():
+    """Load the TensorFlow image model for deepfake detection
+    
+    Called once per process by the model registry; use load_image_model() to get the model.
+    """
+    global USING_MOCK_MODEL, tf
     
     try:
         model_path = settings.AI_MODELS['IMAGE_MODEL_PATH']
@@ -48,8 +144,24 @@ def load_image_model():
             from .mock_models import get_mock_image_model
             logger.warning("Using mock image model as specified in settings")
             USING_MOCK_MODEL = True
-            _LOADED_MODEL = get_mock_image_model()
-            return _LOADED_MODEL
+            return get_mock_image_model()
+        
+        if USE_MODEL_WORKER:
+            from ..model_workers import start_model_worker
+            model = start_model_worker('image')
+            USING_MOCK_MODEL = model.using_mock_model
+            return model
+        
+        if get_backend('image') == 'onnxruntime':
+            try:
+                model = load_onnx_model('image')
+                USING_MOCK_MODEL = False
+                return model
+            except Exception as e:
+                logger.error(f"Could not load ONNX image model, using the TensorFlow model: {str(e)}")
+        
+        if tf is None:
+            import tensorflow as tf
         
         # Check if the model file exists
         if not os.path.exists(model_path):
@@ -67,8 +179,7 @@ def load_image_model():
                 from .mock_models import get_mock_image_model
                 logger.warning("Falling back to mock image model because real model file not found")
                 USING_MOCK_MODEL = True
-                _LOADED_MODEL = get_mock_image_model()
-                return _LOADED_MODEL
+                return get_mock_image_model()
         
         logger.info(f"Loading real image model from {model_path}")
         logger.info(f"Model file size: {os.path.getsize(model_path) / (1024 * 1024):.2f} MB")
@@ -106,23 +217,23 @@ def load_image_model():
                             
                             # Create a simple model as fallback
                             logger.warning("Creating a simple model as fallback")
-                            inputs = tf.keras.Input(shape=(224, 224, 3))
-                            x = tf.keras.layers.Conv2D(32, 3, activation="relu")(inputs)
-                            x = tf.keras.layers.GlobalAveragePooling2D()(x)
-                            outputs = tf.keras.layers.Dense(1, activation="sigmoid")(x)
-                            self.model = tf.keras.Model(inputs, outputs)
+                            self.model = build_fallback_model()
                             logger.info("Simple fallback model created")
                 except Exception as e:
                     logger.error(f"All model loading approaches failed: {str(e)}")
                     raise
+                
+                self.inference = build_inference_runner(self.model)
             
             def __call__(self, x):
                 try:
+                    if self.inference is not None:
+                        return self.inference(x)
                     return self.model.predict(x, verbose=0)
                 except Exception as e:
                     logger.error(f"Error during prediction: {str(e)}")
-                    # Return a fallback prediction
-                    return np.array([[0.5]])
+                    # Return a fallback prediction for every item in the batch
+                    return np.full((len(x), 1), 0.5)
         
         # Create the wrapper
         model_wrapper = SimpleModelWrapper(model_path)
@@ -134,8 +245,7 @@ def load_image_model():
         logger.info(f"Test prediction value: {test_prediction}")
         
         USING_MOCK_MODEL = False
-        _LOADED_MODEL = model_wrapper
-        return _LOADED_MODEL
+        return model_wrapper
     except Exception as e:
         logger.error(f"Failed to load image model: {str(e)}")
         import traceback
@@ -145,10 +255,7 @@ def load_image_model():
         from .mock_models import get_mock_image_model
         logger.warning("Falling back to mock image model due to error")
         USING_MOCK_MODEL = True
-        _LOADED_MODEL = get_mock_image_model()
-        return _LOADED_MODEL
-    finally:
-        _MODEL_LOADING_LOCK = False
+        return get_mock_image_model()
 
 # Method to force use of real models
 def force_real_models():
@@ -160,45 +267,148 @@ def force_mock_models():
     load_image_model.use_mock_override = True
     logger.info("Forced use of mock image models")
 
-def preprocess_image(image_path, target_size=(224, 224)):
-    """Preprocess an image for the model"""
+def get_model_identity():
+    """Describe the image model that serves predictions, for result cache keys"""
+    if model_registry.is_loaded('image'):
+        use_mock = USING_MOCK_MODEL
+    else:
+        use_mock = settings.AI_MODELS.get('USE_MOCK_MODELS', False)
+        if hasattr(load_image_model, 'use_mock_override'):
+            use_mock = load_image_model.use_mock_override
+    if use_mock:
+        return 'mock'
+    
+    onnx_path = get_onnx_path('image')
+    if get_backend('image') == 'onnxruntime' and os.path.exists(onnx_path):
+        stat = os.stat(onnx_path)
+        return f"{os.path.basename(onnx_path)}:{stat.st_size}:{int(stat.st_mtime)}:onnxruntime"
+    
+    model_path = settings.AI_MODELS['IMAGE_MODEL_PATH']
+    if not os.path.exists(model_path) and os.path.exists(model_path + ".simple"):
+        model_path = model_path + ".simple"
+    if not os.path.exists(model_path):
+        return 'mock'
+    stat = os.stat(model_path)
+    from .quantization import get_image_quantization
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}:{get_image_quantization()}"
+
+def preprocess_image(image_path, target_size=(224, 224), with_perceptual_hash=False):
+    """Preprocess an image for the model
+    
+    ``image_path`` may also be a file object, such as an in-memory upload. With ``with_perceptual_hash`` the perceptual hash of the decoded image is
+    computed as well and ``(img_array, perceptual_hash)`` is returned. With face
+    ROI enabled the array holds one row per detected face.
+    """
     try:
         start_time = datetime.now()
-        logger.info(f"Preprocessing image: {image_path}")
+        logger.info(f"Preprocessing image: {getattr(image_path, 'name', image_path)}")
         
         img = Image.open(image_path)
         img = img.convert('RGB')  # Ensure image is RGB
         
         logger.info(f"Original image size: {img.size}")
         
-        img = img.resize(target_size)
-        img_array = np.array(img)
+        perceptual_hash = None
+        if with_perceptual_hash:
+            from ..perceptual_index import compute_perceptual_hash
+            perceptual_hash = compute_perceptual_hash(img)
         
-        # Normalize to [0, 1]
-        img_array = img_array / 255.0
-        
-        # Add batch dimension
-        img_array = np.expand_dims(img_array, axis=0)
+        if face_roi_enabled():
+            # Crop the faces before resizing so they keep their resolution
+            with profile_stage('preprocess.face_roi'):
+                crops = crop_image_faces(img)
+            img_array = np.stack([np.array(crop.resize(target_size)) for crop in crops])
+            img_array = img_array / 255.0
+        else:
+            img = img.resize(target_size)
+            img_array = np.array(img)
+            
+            # Normalize to [0, 1]
+            img_array = img_array / 255.0
+            
+            # Add batch dimension
+            img_array = np.expand_dims(img_array, axis=0)
         
         end_time = datetime.now()
         logger.info(f"Image preprocessing completed in {(end_time - start_time).total_seconds():.2f} seconds")
+        observe_stage('image', 'preprocess', (end_time - start_time).total_seconds())
         
+        if with_perceptual_hash:
+            return img_array, perceptual_hash
         return img_array
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         raise
 
+def get_perceptual_index_for_model():
+    """Return the perceptual index for the current model and hash algorithm"""
+    from ..perceptual_index import get_perceptual_index
+    algorithm = settings.PERCEPTUAL_HASH.get('ALGORITHM', 'phash')
+    # Verdicts scored on face crops are kept apart from whole-image verdicts
+    roi = '|face-roi' if face_roi_enabled() else ''
+    return get_perceptual_index(f"{get_model_identity()}|{algorithm}{roi}")
+
+def preprocess_and_match(image_path):
+    """Preprocess an image and look it up among previously scored near-duplicates
+    
+    Returns ``(processed_img, perceptual_hash, result)``. ``result`` is the stored
+    verdict when a near-duplicate is found, otherwise None. ``perceptual_hash`` is
+    None when the perceptual hash stage is disabled.
+    """
+    from ..perceptual_index import perceptual_hash_enabled
+    
+    if not perceptual_hash_enabled():
+        return preprocess_image(image_path), None, None
+    
+    processed_img, perceptual_hash = preprocess_image(image_path, with_perceptual_hash=True)
+    match = get_perceptual_index_for_model().lookup(perceptual_hash)
+    if match is None:
+        return processed_img, perceptual_hash, None
+    
+    score, distance = match
+    logger.info(f"Near-duplicate found (Hamming distance {distance}), skipping inference")
+    result = build_prediction_result(score)
+    result['nearDuplicate'] = {'distance': distance}
+    return processed_img, perceptual_hash, result
+
+def remember_prediction(perceptual_hash, result):
+    """Add a freshly scored image to the perceptual index"""
+    if perceptual_hash is not None:
+        get_perceptual_index_for_model().add(perceptual_hash, result['fakePercentage'] / 100)
+
+def build_prediction_result(prediction):
+    """Turn a raw fake probability into the API result dict"""
+    # Calculate percentages
+    fake_percentage = float(prediction) * 100
+    real_percentage = 100 - fake_percentage
+    
+    # Determine if it's a deepfake based on threshold
+    is_deepfake = fake_percentage > 50
+    
+    # Calculate confidence
+    confidence = max(fake_percentage, real_percentage)
+    
+    return {
+        'isDeepfake': bool(is_deepfake),
+        'realPercentage': float(real_percentage),
+        'fakePercentage': float(fake_percentage),
+        'confidence': float(confidence),
+        'usingMockModel': USING_MOCK_MODEL
+    }
+
 def predict_image(model, image_path):
     """Make a prediction on an image"""
     global USING_MOCK_MODEL
     
     try:
         start_time = datetime.now()
-        logger.info(f"Starting prediction for image: {image_path}")
+        logger.info(f"Starting prediction for image: {getattr(image_path, 'name', image_path)}")
         logger.info(f"Using mock model: {USING_MOCK_MODEL}")
         
-        # Preprocess the image
-        processed_img = preprocess_image(image_path)
+        # Preprocess the image, reusing the verdict of a near-duplicate if there is one
+        processed_img, perceptual_hash, result = preprocess_and_match(image_path)
+        if result is not None:
+            return result
         
         # Make prediction
         logger.info("Running model inference...")
@@ -207,42 +417,62 @@ def predict_image(model, image_path):
         
         # Handle different return types (numpy array or tensor)
         if hasattr(prediction, 'numpy'):
-            prediction = prediction.numpy()[0][0]
-        elif isinstance(prediction, np.ndarray):
-            prediction = prediction[0][0]
-        else:
-            # For mock models or other return types
-            prediction = float(prediction[0][0])
+            prediction = prediction.numpy()
+        predictions = np.asarray(prediction, dtype=np.float32).reshape(len(processed_img), -1)[:, 0]
+        
+        # With face ROI every face is scored; the most suspicious face decides
+        prediction = predictions.max()
             
         prediction_end = datetime.now()
         
         logger.info(f"Raw prediction value: {prediction}")
         logger.info(f"Inference time: {(prediction_end - prediction_start).total_seconds():.4f} seconds")
+        observe_stage('image', 'inference', (prediction_end - prediction_start).total_seconds())
         
-        # Calculate percentages
-        fake_percentage = float(prediction) * 100
-        real_percentage = 100 - fake_percentage
-        
-        # Determine if it's a deepfake based on threshold
-        is_deepfake = fake_percentage > 50
-        
-        # Calculate confidence
-        confidence = max(fake_percentage, real_percentage)
-        
-        result = {
-            'isDeepfake': bool(is_deepfake),
-            'realPercentage': float(real_percentage),
-            'fakePercentage': float(fake_percentage),
-            'confidence': float(confidence),
-            'usingMockModel': USING_MOCK_MODEL
-        }
+        result = build_prediction_result(prediction)
+        remember_prediction(perceptual_hash, result)
         
         end_time = datetime.now()
         logger.info(f"Prediction completed in {(end_time - start_time).total_seconds():.2f} seconds")
-        logger.info(f"Result: {'FAKE' if is_deepfake else 'REAL'} with {confidence:.2f}% confidence")
+        logger.info(f"Result: {'FAKE' if result['isDeepfake'] else 'REAL'} with {result['confidence']:.2f}% confidence")
         
         return result
     except Exception as e:
         logger.error(f"Error during image prediction: {str(e)}")
         logger.exception("Exception details:")
         raise
+
+def predict_array(model, images):
+    """Run the model on a preprocessed batch and return its raw output as numpy, for model workers"""
+    prediction = model(images)
+    if hasattr(prediction, 'numpy'):
+        prediction = prediction.numpy()
+    return np.asarray(prediction, dtype=np.float32)
+
+def predict_image_batch(model, image_arrays):
+    """Run one forward pass over several preprocessed images and return a result dict per image
+    
+    An image array may hold several rows (one per face); its verdict is that of the most suspicious row.
+    """
+    try:
+        batch = np.concatenate(image_arrays, axis=0).astype(np.float32)
+        offsets = np.cumsum([0] + [len(image_array) for image_array in image_arrays])
+        
+        logger.info(f"Running model inference on batch of {batch.shape[0]} images...")
+        prediction_start = datetime.now()
+        predictions = model(batch)
+        
+        # Handle different return types (numpy array or tensor)
+        if hasattr(predictions, 'numpy'):
+            predictions = predictions.numpy()
+        predictions = np.asarray(predictions, dtype=np.float32).reshape(batch.shape[0], -1)[:, 0]
+        
+        prediction_end = datetime.now()
+        logger.info(f"Batch inference time: {(prediction_end - prediction_start).total_seconds():.4f} seconds")
+        observe_stage('image', 'inference', (prediction_end - prediction_start).total_seconds())
+        
+        return [build_prediction_result(predictions[start:end].max()) for start, end in zip(offsets[:-1], offsets[1:])]
+    except Exception as e:
+        logger.error(f"Error during batched image prediction: {str(e)}")
+        logger.exception("Exception details:")
+        raise
@@ -19,9 +19,10 @@ class MockImageModel:
         import time
         time.sleep(0.5)
         
-        # Return a random prediction (between 0 and 1)
+        # Return a random prediction (between 0 and 1) for each image in the batch
         # Using numpy to match the expected output format
-        return np.array([[random.random()]])
+        batch_size = input_tensor.shape[0] if hasattr(input_tensor, 'shape') and len(input_tensor.shape) > 0 else 1
+        return np.array([[random.random()] for _ in range(batch_size)])
 
 class MockVideoModel:
     """A mock video model that returns random predictions for testing"""
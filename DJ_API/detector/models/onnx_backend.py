@@ -0,0 +1,123 @@
+import os
+import logging
+import numpy as np
+from django.conf import settings
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('native', 'onnxruntime')
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+
+def get_backend(media_type):
+    """Return the configured inference backend for 'image' or 'video'"""
+    backend = settings.MODEL_BACKENDS.get(media_type.upper(), 'native')
+    return backend if backend in BACKENDS else 'native'
+
+
+def get_onnx_path(media_type):
+    return settings.ONNX_RUNTIME[f'{media_type.upper()}_MODEL_PATH']
+
+
+def build_session_options():
+    """Build ONNX Runtime session options from the ONNX_RUNTIME settings"""
+    import onnxruntime as ort
+
+    config = settings.ONNX_RUNTIME
+    options = ort.SessionOptions()
+    level = GRAPH_OPTIMIZATION_LEVELS.get(config.get('GRAPH_OPTIMIZATION', 'all'), 'ORT_ENABLE_ALL')
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level)
+    if config.get('INTRA_OP_THREADS'):
+        options.intra_op_num_threads = config['INTRA_OP_THREADS']
+    if config.get('INTER_OP_THREADS'):
+        options.inter_op_num_threads = config['INTER_OP_THREADS']
+    if config.get('EXECUTION_MODE', 'sequential') == 'parallel':
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    else:
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    return options
+
+
+class OnnxModel:
+    """Callable ONNX Runtime session returning the first output as a numpy array
+
+    ``InferenceSession.run`` is thread-safe, so concurrent requests share one session.
+    """
+
+    backend = 'onnxruntime'
+
+    def __init__(self, model_path, options=None):
+        import onnxruntime as ort
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options or build_session_options(),
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        return self.session.run(None, {self.input_name: np.asarray(x, dtype=np.float32)})[0]
+
+    def eval(self):
+        return self
+
+
+def load_onnx_model(media_type):
+    """Open an ONNX Runtime session for the exported image or video model"""
+    model_path = get_onnx_path(media_type)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"ONNX {media_type} model not found at {model_path}, run export_onnx.py first")
+
+    start_time = datetime.now()
+    model = OnnxModel(model_path)
+    end_time = datetime.now()
+    logger.info(f"Loaded ONNX {media_type} model from {model_path} in {(end_time - start_time).total_seconds():.2f} seconds")
+    return model
+
+
+def export_video_model(model, output_path, opset=None, frames=30):
+    """Export a VideoModel to ONNX with dynamic batch and frame-count dimensions
+
+    Only the logits are exported. The feature map output is not used for serving.
+    """
+    import torch
+
+    class VideoLogits(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, x):
+            return self.model(x)[1]
+
+    opset = opset or settings.ONNX_RUNTIME.get('OPSET', 17)
+    # The exporter restores the wrapper's training flag afterwards, so it must be in eval mode too
+    wrapper = VideoLogits(model).eval()
+    example = torch.zeros(1, frames, 3, 112, 112)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    torch.onnx.export(
+        wrapper, (example,), output_path,
+        input_names=['frames'], output_names=['logits'],
+        dynamic_axes={'frames': {0: 'batch', 1: 'frames'}, 'logits': {0: 'batch'}},
+        opset_version=opset, dynamo=False,
+    )
+    return output_path
+
+
+def export_image_model(keras_model, output_path, opset=None, input_shape=(224, 224, 3)):
+    """Export a Keras image model to ONNX with a dynamic batch dimension"""
+    import tensorflow as tf
+    import tf2onnx
+
+    opset = opset or settings.ONNX_RUNTIME.get('OPSET', 17)
+    signature = (tf.TensorSpec((None,) + tuple(input_shape), tf.float32, name='input'),)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=opset, output_path=output_path)
+    return output_path
+
@@ -0,0 +1,218 @@
+import copy
+import glob
+import hashlib
+import os
+import threading
+import logging
+import numpy as np
+from django.conf import settings
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+VIDEO_MODES = ('none', 'dynamic', 'static')
+IMAGE_MODES = ('none', 'tflite-fp16', 'tflite-int8')
+
+IMAGE_FILE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+VIDEO_FILE_EXTENSIONS = ('.mp4', '.mov', '.avi')
+
+
+def list_media_files(directory, extensions, limit=None):
+    """Return media files under a directory (recursively), sorted for reproducibility"""
+    if not directory or not os.path.isdir(directory):
+        return []
+    files = sorted(path for path in glob.glob(os.path.join(directory, '**', '*'), recursive=True)
+                   if path.lower().endswith(extensions))
+    return files[:limit] if limit else files
+
+
+def get_video_quantization():
+    mode = settings.MODEL_QUANTIZATION.get('VIDEO', 'none')
+    return mode if mode in VIDEO_MODES else 'none'
+
+
+def get_image_quantization():
+    mode = settings.MODEL_QUANTIZATION.get('IMAGE', 'none')
+    return mode if mode in IMAGE_MODES else 'none'
+
+
+def quantize_video_dynamic(model):
+    """Quantize the LSTM and Linear layers of a VideoModel to int8 with dynamic activation ranges"""
+    import torch
+    import torch.nn as nn
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def calibration_frames(video_paths, max_videos=16):
+    """Yield preprocessed ``(N, 3, H, W)`` frame tensors from sample videos for calibration"""
+    from .video_model import extract_frames
+
+    for path in video_paths[:max_videos]:
+        try:
+            frames = extract_frames(path)
+        except Exception as e:
+            logger.warning(f"Skipping calibration video {path}: {str(e)}")
+            continue
+        # Face ROI returns one sequence per face; calibrate on all of them
+        yield frames.reshape(-1, *frames.shape[-3:])
+
+
+def quantize_video_static(model, calibration_paths, engine=None):
+    """Quantize the ResNeXt backbone to int8 with ranges calibrated on sample videos
+
+    The backbone is traced with FX graph mode quantization and calibrated on the
+    frames of ``calibration_paths``; the LSTM and Linear layers are then quantized
+    dynamically. Returns a new model.
+    """
+    import torch
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = engine or settings.MODEL_QUANTIZATION.get('TORCH_ENGINE', 'x86')
+    torch.backends.quantized.engine = engine
+
+    model = copy.deepcopy(model).eval()
+    example = torch.zeros(1, 3, *settings_frame_size())
+    prepared = prepare_fx(model.model, get_default_qconfig_mapping(engine), (example,))
+
+    start_time = datetime.now()
+    batches = 0
+    with torch.inference_mode():
+        for frames in calibration_frames(calibration_paths):
+            prepared(frames)
+            batches += 1
+    if not batches:
+        raise ValueError("No calibration videos could be read")
+    end_time = datetime.now()
+    logger.info(f"Calibrated video backbone on {batches} videos in {(end_time - start_time).total_seconds():.2f} seconds")
+
+    model.model = convert_fx(prepared)
+    return quantize_video_dynamic(model)
+
+
+def settings_frame_size():
+    from .video_model import PREPROCESSING_PARAMS
+    return PREPROCESSING_PARAMS['frame_size']
+
+
+def apply_video_quantization(model, mode=None):
+    """Return the video model in the configured quantized form, or unchanged for 'none'
+
+    Static quantization falls back to dynamic when no calibration videos are found.
+    """
+    mode = mode or get_video_quantization()
+    if mode == 'none':
+        return model
+
+    start_time = datetime.now()
+    if mode == 'static':
+        calibration_paths = list_media_files(settings.MODEL_QUANTIZATION.get('VIDEO_CALIBRATION_DIR'), VIDEO_FILE_EXTENSIONS)
+        try:
+            quantized = quantize_video_static(model, calibration_paths)
+        except Exception as e:
+            logger.error(f"Static quantization failed, using dynamic quantization: {str(e)}")
+            mode = 'dynamic'
+    if mode == 'dynamic':
+        quantized = quantize_video_dynamic(model)
+
+    # bf16 autocast does not apply to int8 kernels
+    quantized.use_bf16 = False
+    quantized.quantization = mode
+    end_time = datetime.now()
+    logger.info(f"Video model quantized ({mode} int8) in {(end_time - start_time).total_seconds():.2f} seconds")
+    return quantized
+
+
+class TFLiteModel:
+    """Callable wrapper around a TFLite interpreter (XNNPACK on CPU) with a dynamic batch size
+
+    The interpreter is not thread-safe, so calls are serialized.
+    """
+
+    def __init__(self, model_content, num_threads=None):
+        import tensorflow as tf
+
+        self._interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            if self._batch_size != len(x):
+                self._interpreter.resize_tensor_input(self._input['index'], x.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(x)
+            self._interpreter.set_tensor(self._input['index'], x)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output['index']).copy()
+
+
+def representative_images(image_paths, max_images=100):
+    """Yield preprocessed single-image batches for int8 calibration"""
+    from .image_model import preprocess_image
+
+    for path in image_paths[:max_images]:
+        try:
+            img_array = preprocess_image(path)
+        except Exception as e:
+            logger.warning(f"Skipping calibration image {path}: {str(e)}")
+            continue
+        for row in img_array:
+            yield [row[None, ...].astype(np.float32)]
+
+
+def convert_keras_to_tflite(keras_model, mode, calibration_paths=()):
+    """Convert a Keras model to a TFLite flatbuffer with fp16 or int8 weights
+
+    int8 also quantizes activations, with ranges taken from ``calibration_paths``;
+    inputs and outputs stay float32.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'tflite-fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'tflite-int8':
+        if not calibration_paths:
+            raise ValueError("int8 conversion needs calibration images")
+        converter.representative_dataset = lambda: representative_images(list(calibration_paths))
+    else:
+        raise ValueError(f"Unknown image quantization mode: {mode}")
+    return converter.convert()
+
+
+def build_tflite_model(keras_model, model_identity, mode=None):
+    """Return a TFLiteModel for the Keras model, converting it once and caching the result on disk"""
+    config = settings.MODEL_QUANTIZATION
+    mode = mode or get_image_quantization()
+    cache_dir = config.get('CACHE_DIR')
+    digest = hashlib.sha256(f"{model_identity}|{mode}".encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f'image_{mode}_{digest}.tflite') if cache_dir else None
+
+    if cache_path and os.path.exists(cache_path):
+        logger.info(f"Loading {mode} image model from {cache_path}")
+        with open(cache_path, 'rb') as f:
+            model_content = f.read()
+    else:
+        start_time = datetime.now()
+        calibration_paths = list_media_files(config.get('IMAGE_CALIBRATION_DIR'), IMAGE_FILE_EXTENSIONS)
+        model_content = convert_keras_to_tflite(keras_model, mode, calibration_paths)
+        end_time = datetime.now()
+        logger.info(f"Converted image model to {mode} ({len(model_content) / (1024 * 1024):.2f} MB) "
+                    f"in {(end_time - start_time).total_seconds():.2f} seconds")
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f'{cache_path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(model_content)
+            os.replace(tmp_path, cache_path)
+
+    model = TFLiteModel(model_content, num_threads=config.get('TFLITE_THREADS'))
+    model.quantization = mode
+    return model
@@ -1,23 +1,52 @@
 import os
+import contextlib
+import hashlib
+import heapq
+import json
+import time
 import cv2
 import numpy as np
-import time
 import logging
+from PIL import Image
 from django.conf import settings
 from datetime import datetime
+from ..registry import model_registry
+from ..embedding_cache import frame_embedding_cache_enabled, get_frame_embedding_cache
+from ..model_workers import ModelWorkerError, model_workers_enabled
+from ..face_roi import face_roi_enabled, get_face_roi_params, crop_frame_tracks
+from ..metrics import observe_stage
+from ..profiling import annotate, profile_stage, record_stage
+from .onnx_backend import get_backend, get_onnx_path, load_onnx_model
 
 logger = logging.getLogger(__name__)
 
-# Global variables for persistence
+# PyTorch is not imported when the video model is served by ONNX Runtime
+USE_ONNX_RUNTIME = get_backend('video') == 'onnxruntime'
+
+# The model runs in a worker process and this process only decodes and preprocesses frames
+USE_MODEL_WORKER = model_workers_enabled('video')
+
+# Whether the loaded model is a mock
 USING_MOCK_MODEL = False
-_LOADED_MODEL = None
-_MODEL_LOADING_LOCK = False
+
+# Parameters that change the model input, used to key cached results
+PREPROCESSING_PARAMS = {
+    'max_frames': 30,
+    'uniform_sampling': True,
+    'frame_size': (112, 112),
+    'mean': (0.485, 0.456, 0.406),
+    'std': (0.229, 0.224, 0.225),
+    'resize_backend': settings.VIDEO_PREPROCESSING.get('RESIZE_BACKEND', 'pil'),
+    'face_roi': get_face_roi_params(),
+}
 
 # Check if torch and torchvision are available
 TORCH_AVAILABLE = False
 TORCHVISION_AVAILABLE = False
 
 try:
+    if USE_ONNX_RUNTIME or USE_MODEL_WORKER:
+        raise ImportError("the video model is served by ONNX Runtime or a worker process")
     import torch
     import torch.nn as nn
     TORCH_AVAILABLE = True
@@ -38,52 +67,187 @@ try:
                 self.dp = nn.Dropout(0.4)
                 self.linear1 = nn.Linear(2048, num_classes)
                 self.avgpool = nn.AdaptiveAvgPool2d(1)
+                # Set by configure_inference_runtime when the backbone uses channels_last
+                self.channels_last = False
             
             def forward(self, x):
                 batch_size, seq_length, c, h, w = x.shape
                 x = x.view(batch_size * seq_length, c, h, w)
-                fmap = self.model(x)
-                x = self.avgpool(fmap)
+                if self.channels_last:
+                    x = x.contiguous(memory_format=torch.channels_last)
+                with profile_stage('inference.backbone'):
+                    fmap = self.model(x)
+                    x = self.avgpool(fmap)
                 x = x.view(batch_size, seq_length, 2048)
-                x_lstm, _ = self.lstm(x)
-                return fmap, self.dp(self.linear1(torch.mean(x_lstm, dim=1)))
+                with profile_stage('inference.lstm'):
+                    x_lstm, _ = self.lstm(x)
+                    return fmap, self.dp(self.linear1(torch.mean(x_lstm, dim=1)))
+            
+            def forward_chunk(self, x, state=None):
+                """Score a chunk of frames on top of the frames already seen
+                
+                ``state`` is the running sum and count of LSTM outputs returned by the
+                previous call; the logits are those of ``forward`` over every frame
+                seen so far.
+                """
+                batch_size, seq_length, c, h, w = x.shape
+                features = self.embed(x.view(batch_size * seq_length, c, h, w))
+                return self.classify(features.view(batch_size, seq_length, 2048), state)
+            
+            def embed(self, x):
+                """Return the pooled ``(N, 2048)`` backbone features of ``(N, 3, H, W)`` frames"""
+                if self.channels_last:
+                    x = x.contiguous(memory_format=torch.channels_last)
+                with profile_stage('inference.backbone'):
+                    return self.avgpool(self.model(x)).flatten(1)
+            
+            def classify(self, features, state=None):
+                """Score ``(batch, frames, 2048)`` backbone features with the LSTM head
+                
+                Returns the logits and the running state, as ``forward_chunk`` does.
+                """
+                with profile_stage('inference.lstm'):
+                    x_lstm, _ = self.lstm(features)
+                total = x_lstm.sum(dim=1)
+                count = features.shape[1]
+                if state is not None:
+                    total = total + state[0]
+                    count += state[1]
+                return self.dp(self.linear1(total / count)), (total, count)
                 
     except ImportError:
         logger.warning("torchvision is not available. Using mock model instead.")
         TORCHVISION_AVAILABLE = False
         
 except ImportError:
-    logger.warning("PyTorch is not available. Using mock model instead.")
+    if USE_MODEL_WORKER:
+        logger.info("Video model runs in a worker process, PyTorch is not loaded")
+    elif USE_ONNX_RUNTIME:
+        logger.info("Video model backend is onnxruntime, PyTorch is not loaded")
+    else:
+        logger.warning("PyTorch is not available. Using mock model instead.")
     TORCH_AVAILABLE = False
 
-def load_video_model():
-    """Load the PyTorch video model for deepfake detection"""
-    global USING_MOCK_MODEL, _LOADED_MODEL, _MODEL_LOADING_LOCK
+# Whether a runtime that can serve the real video model is available
+MODEL_RUNTIME_AVAILABLE = USE_ONNX_RUNTIME or USE_MODEL_WORKER or (TORCH_AVAILABLE and TORCHVISION_AVAILABLE)
+
+def cpu_supports_bf16():
+    """Return True if the CPU has native bf16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = set()
+            for line in f:
+                if line.startswith('flags'):
+                    flags.update(line.split(':', 1)[1].split())
+                    break
+    except OSError:
+        return False
+    return bool(flags & {'avx512_bf16', 'amx_bf16'})
+
+_threads_configured = False
+
+def configure_torch_threads():
+    """Apply the configured intra-op and inter-op thread counts once per process"""
+    global _threads_configured
+    
+    if _threads_configured:
+        return
+    _threads_configured = True
+    
+    config = settings.VIDEO_INFERENCE
+    intra_op_threads = config.get('INTRA_OP_THREADS')
+    inter_op_threads = config.get('INTER_OP_THREADS')
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            # Only allowed before any inter-op parallel work has started
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads: {str(e)}")
+    logger.info(f"Torch threads: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
+
+def configure_inference_runtime(model):
+    """Prepare a loaded VideoModel for CPU inference according to VIDEO_INFERENCE"""
+    config = settings.VIDEO_INFERENCE
+    configure_torch_threads()
+    model.eval()
+    
+    if config.get('CHANNELS_LAST', True):
+        model.model.to(memory_format=torch.channels_last)
+        model.channels_last = True
     
-    # If model is already loaded and persistence is enabled, return it
-    if os.environ.get('FORCE_MODEL_PERSISTENCE') == 'true' and _LOADED_MODEL is not None:
-        logger.info("Using previously loaded video model (persistence enabled)")
-        return _LOADED_MODEL
+    model.use_bf16 = False
+    if config.get('BF16_AUTOCAST', False):
+        if cpu_supports_bf16():
+            model.use_bf16 = True
+        else:
+            logger.warning("bf16 autocast requested but the CPU has no native bf16 support, using fp32")
     
-    # Prevent concurrent loading
-    if _MODEL_LOADING_LOCK:
-        logger.warning("Model loading already in progress, waiting...")
-        # Wait for the other thread to complete loading
-        while _MODEL_LOADING_LOCK:
-            time.sleep(0.1)
-        if _LOADED_MODEL is not None:
-            return _LOADED_MODEL
+    logger.info(f"Video inference runtime: inference_mode={config.get('INFERENCE_MODE', True)}, "
+                f"channels_last={model.channels_last}, bf16={model.use_bf16}")
+    return model
+
+def inference_context(model):
+    """Return the grad-mode and autocast context to run the model under"""
+    stack = contextlib.ExitStack()
+    if settings.VIDEO_INFERENCE.get('INFERENCE_MODE', True):
+        stack.enter_context(torch.inference_mode())
+    else:
+        stack.enter_context(torch.no_grad())
+    if getattr(model, 'use_bf16', False):
+        stack.enter_context(torch.autocast('cpu', dtype=torch.bfloat16))
+    return stack
+
+def run_video_model(model, frames):
+    """Run a ``[batch, frames, 3, H, W]`` tensor through the model and return fp32 logits"""
+    with inference_context(model):
+        _, output = model(frames)
+    return output.float()
+
+def uses_array_input(model):
+    """Whether the model takes numpy arrays: ONNX Runtime, or a model worker process"""
+    return getattr(model, 'backend', None) in ('onnxruntime', 'worker')
+
+def video_probabilities(model, frames):
+    """Return the ``(batch, 2)`` class probabilities for a batch of frame sequences as numpy
     
-    _MODEL_LOADING_LOCK = True
+    ``frames`` is a tensor for the PyTorch model and a numpy array for ONNX Runtime
+    and model workers. Each sequence gets its own forward pass: the LSTM is not
+    batch_first, so sequences stacked together would be read as time steps.
+    """
+    if not uses_array_input(model):
+        logits = torch.cat([run_video_model(model, frames[i:i + 1]) for i in range(len(frames))])
+        return torch.softmax(logits, dim=1).numpy()
+    
+    logits = np.concatenate([np.asarray(model(frames[i:i + 1])) for i in range(len(frames))])
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def predict_array(model, frames):
+    """Return the fp32 logits for a ``(batch, frames, 3, H, W)`` numpy array, for model workers"""
+    if uses_array_input(model):
+        return np.asarray(model(frames), dtype=np.float32)
+    return run_video_model(model, torch.from_numpy(frames)).numpy()
+
+def load_video_model():
+    """Return the shared video model, loading it once per process on first use"""
+    return model_registry.get('video')
+
+def build_video_model():
+    """Load the PyTorch video model for deepfake detection
+    
+    Called once per process by the model registry; use load_video_model() to get the model.
+    """
+    global USING_MOCK_MODEL
     
     try:
         # Check if torch and torchvision are available
-        if not TORCH_AVAILABLE or not TORCHVISION_AVAILABLE:
+        if not MODEL_RUNTIME_AVAILABLE:
             logger.warning("PyTorch or torchvision not available. Using mock model.")
             from .mock_models import get_mock_video_model
             USING_MOCK_MODEL = True
-            _LOADED_MODEL = get_mock_video_model()
-            return _LOADED_MODEL
+            return get_mock_video_model()
             
         model_path = settings.AI_MODELS['VIDEO_MODEL_PATH']
         use_mock = settings.AI_MODELS.get('USE_MOCK_MODELS', False)
@@ -97,8 +261,25 @@ def load_video_model():
             from .mock_models import get_mock_video_model
             logger.warning("Using mock video model as specified in settings")
             USING_MOCK_MODEL = True
-            _LOADED_MODEL = get_mock_video_model()
-            return _LOADED_MODEL
+            return get_mock_video_model()
+        
+        if USE_MODEL_WORKER:
+            from ..model_workers import start_model_worker
+            model = start_model_worker('video')
+            USING_MOCK_MODEL = model.using_mock_model
+            return model
+        
+        if USE_ONNX_RUNTIME:
+            # PyTorch is not loaded with this backend, so the only fallback is the mock model
+            try:
+                model = load_onnx_model('video')
+            except Exception as e:
+                from .mock_models import get_mock_video_model
+                logger.error(f"Could not load ONNX video model, falling back to mock model: {str(e)}")
+                USING_MOCK_MODEL = True
+                return get_mock_video_model()
+            USING_MOCK_MODEL = False
+            return model
         
         # Check if the model file exists
         if not os.path.exists(model_path):
@@ -116,8 +297,7 @@ def load_video_model():
                 from .mock_models import get_mock_video_model
                 logger.warning("Falling back to mock video model because real model file not found")
                 USING_MOCK_MODEL = True
-                _LOADED_MODEL = get_mock_video_model()
-                return _LOADED_MODEL
+                return get_mock_video_model()
         
         logger.info(f"Loading real video model from {model_path}")
         logger.info(f"Model file size: {os.path.getsize(model_path) / (1024 * 1024):.2f} MB")
@@ -151,13 +331,16 @@ def load_video_model():
             model.load_state_dict(new_state_dict, strict=False)
             logger.info("Successfully loaded model weights")
             
-            # Set model to evaluation mode
-            model.eval()
+            # Set model to evaluation mode and apply the CPU runtime options
+            configure_inference_runtime(model)
             logger.info("Model set to evaluation mode")
             
+            # Optionally swap in the int8 variant
+            from .quantization import apply_video_quantization
+            model = apply_video_quantization(model)
+            
             USING_MOCK_MODEL = False
-            _LOADED_MODEL = model
-            return _LOADED_MODEL
+            return model
             
         except Exception as e:
             logger.error(f"Error loading model weights: {str(e)}")
@@ -168,8 +351,7 @@ def load_video_model():
             from .mock_models import get_mock_video_model
             logger.warning("Falling back to mock video model due to error loading weights")
             USING_MOCK_MODEL = True
-            _LOADED_MODEL = get_mock_video_model()
-            return _LOADED_MODEL
+            return get_mock_video_model()
             
     except Exception as e:
         logger.error(f"Failed to load video model: {str(e)}")
@@ -180,10 +362,7 @@ def load_video_model():
         from .mock_models import get_mock_video_model
         logger.warning("Falling back to mock video model due to error")
         USING_MOCK_MODEL = True
-        _LOADED_MODEL = get_mock_video_model()
-        return _LOADED_MODEL
-    finally:
-        _MODEL_LOADING_LOCK = False
+        return get_mock_video_model()
 
 # Method to force use of real models
 def force_real_models():
@@ -195,8 +374,232 @@ def force_mock_models():
     load_video_model.use_mock_override = True
     logger.info("Forced use of mock video models")
 
-def extract_frames(video_path, max_frames=30, uniform_sampling=True):
-    """Extract frames from a video file with uniform sampling"""
+def get_model_identity():
+    """Describe the video model that serves predictions, for result cache keys"""
+    if model_registry.is_loaded('video'):
+        use_mock = USING_MOCK_MODEL
+    else:
+        use_mock = settings.AI_MODELS.get('USE_MOCK_MODELS', False)
+        if hasattr(load_video_model, 'use_mock_override'):
+            use_mock = load_video_model.use_mock_override
+    if use_mock:
+        return 'mock'
+    
+    if USE_ONNX_RUNTIME:
+        onnx_path = get_onnx_path('video')
+        if not os.path.exists(onnx_path):
+            return 'mock'
+        stat = os.stat(onnx_path)
+        return f"{os.path.basename(onnx_path)}:{stat.st_size}:{int(stat.st_mtime)}:onnxruntime"
+    
+    model_path = settings.AI_MODELS['VIDEO_MODEL_PATH']
+    if not os.path.exists(model_path) and os.path.exists(model_path + ".simple"):
+        model_path = model_path + ".simple"
+    if not os.path.exists(model_path):
+        return 'mock'
+    stat = os.stat(model_path)
+    from .quantization import get_video_quantization
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}:{get_video_quantization()}"
+
+def choose_decode_mode(total_frames, indices, gop_size=None):
+    """Pick per-frame seeking or a single linear scan for the requested frame indices
+    
+    Every seek makes the decoder restart from the previous keyframe, so seeking
+    costs roughly half a GOP of decoded frames per sample. A linear scan decodes
+    every frame up to the last requested index once. Sequential decoding is used
+    whenever it is expected to touch fewer frames, or when the frame count is unknown.
+    """
+    indices = list(indices)
+    if not indices or total_frames <= 0:
+        return 'sequential'
+    
+    if gop_size is None:
+        gop_size = settings.VIDEO_DECODING.get('GOP_SIZE', 250)
+    
+    # Frames decoded by each strategy, plus a fixed penalty for flushing the decoder on every seek
+    seek_cost = len(indices) * (gop_size / 2 + settings.VIDEO_DECODING.get('SEEK_OVERHEAD_FRAMES', 10))
+    scan_cost = max(indices) + 1
+    
+    mode = 'sequential' if scan_cost <= seek_cost else 'seek'
+    logger.info(f"Decode mode: {mode} (estimated frames decoded: seek={seek_cost:.0f}, sequential={scan_cost}, GOP size: {gop_size})")
+    return mode
+
+def iter_decoded_frames(cap, indices, mode='sequential'):
+    """Yield ``(index, frame)`` for the requested indices, decoding one frame at a time
+    
+    Frames come out in ascending index order (once per index); frames that
+    cannot be read are skipped.
+    """
+    targets = sorted(set(int(idx) for idx in indices))
+    
+    if mode == 'seek':
+        for target in targets:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ret, frame = cap.read()
+            if ret:
+                yield target, frame
+        return
+    
+    position = 0
+    for target in targets:
+        # Skip ahead without converting the intermediate frames
+        while position < target and cap.grab():
+            position += 1
+        if position < target or not cap.grab():
+            break
+        position += 1
+        ret, frame = cap.retrieve()
+        if ret:
+            yield target, frame
+
+def decode_frames(cap, indices, mode='sequential'):
+    """Decode the BGR frames at the given indices from an opened capture
+    
+    ``seek`` positions the capture before every frame. ``sequential`` walks the
+    stream once, using ``grab()`` to skip frames and ``retrieve()`` only on the
+    requested indices. Frames that cannot be read are skipped.
+    """
+    frames = []
+    
+    if mode == 'seek':
+        for idx in indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        return frames
+    
+    decoded = dict(iter_decoded_frames(cap, indices, mode))
+    for idx in indices:
+        frame = decoded.get(int(idx))
+        if frame is not None:
+            frames.append(frame)
+    return frames
+
+_torchvision_transform = None
+
+def preprocess_frames_torchvision(raw_frames):
+    """Preprocess BGR frames one by one with torchvision transforms (reference path)"""
+    global _torchvision_transform
+    
+    if _torchvision_transform is None:
+        _torchvision_transform = transforms.Compose([
+            transforms.ToPILImage(),
+            transforms.Resize(PREPROCESSING_PARAMS['frame_size']),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=list(PREPROCESSING_PARAMS['mean']), std=list(PREPROCESSING_PARAMS['std']))
+        ])
+    
+    return torch.stack([_torchvision_transform(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in raw_frames])
+
+_normalization_lut = None
+
+def get_normalization_lut():
+    """Return a ``(3, 256)`` float32 table mapping uint8 RGB values to normalized model inputs
+    
+    Built with the same float32 operations as ToTensor + Normalize, so lookups
+    are bit-identical to computing the values.
+    """
+    global _normalization_lut
+    
+    if _normalization_lut is None:
+        mean = np.asarray(PREPROCESSING_PARAMS['mean'], dtype=np.float32)[:, None]
+        std = np.asarray(PREPROCESSING_PARAMS['std'], dtype=np.float32)[:, None]
+        values = np.arange(256, dtype=np.float32)[None, :] / np.float32(255)
+        _normalization_lut = (values - mean) / std
+    return _normalization_lut
+
+def resize_frames(raw_frames, size, backend='pil'):
+    """Resize BGR uint8 frames into one preallocated ``(N, H, W, 3)`` RGB uint8 array
+    
+    ``pil`` uses the same antialiased bilinear filter as transforms.Resize and is
+    bit-exact with it. ``opencv`` uses cv2.resize (INTER_AREA when shrinking,
+    INTER_LINEAR when enlarging); it is faster but differs from the antialiased
+    filter by a few intensity levels on detailed frames.
+    """
+    width, height = size[1], size[0]
+    batch = np.empty((len(raw_frames), height, width, 3), dtype=np.uint8)
+    
+    for i, frame in enumerate(raw_frames):
+        if backend == 'opencv':
+            interpolation = cv2.INTER_AREA if frame.shape[0] > height or frame.shape[1] > width else cv2.INTER_LINEAR
+            cv2.resize(frame, (width, height), dst=batch[i], interpolation=interpolation)
+            # Colour conversion in place on the already-resized frame
+            cv2.cvtColor(batch[i], cv2.COLOR_BGR2RGB, dst=batch[i])
+        else:
+            # The filter works per channel, so resize the BGR frame and swap channels on the small result
+            resized = Image.fromarray(frame).resize((width, height), Image.BILINEAR)
+            batch[i] = np.asarray(resized)[..., ::-1]
+    return batch
+
+def normalize_frames(raw_frames, backend=None, use_lut=None):
+    """Preprocess BGR frames into a normalized ``(N, 3, H, W)`` float32 numpy array in one pass
+    
+    Frames are resized into a single uint8 batch, then scaled and normalized by one
+    vectorized operation (a per-channel lookup table or float arithmetic).
+    """
+    config = settings.VIDEO_PREPROCESSING
+    if backend is None:
+        backend = config.get('RESIZE_BACKEND', 'pil')
+    if use_lut is None:
+        use_lut = config.get('USE_LUT', True)
+    
+    batch = resize_frames(raw_frames, PREPROCESSING_PARAMS['frame_size'], backend)
+    normalized = np.empty((batch.shape[0], 3) + batch.shape[1:3], dtype=np.float32)
+    
+    if use_lut:
+        # Look up each channel's values in its own table, writing straight into (N, 3, H, W)
+        lut = get_normalization_lut()
+        for channel in range(3):
+            np.take(lut[channel], batch[..., channel], out=normalized[:, channel])
+    else:
+        mean = np.asarray(PREPROCESSING_PARAMS['mean'], dtype=np.float32)
+        std = np.asarray(PREPROCESSING_PARAMS['std'], dtype=np.float32)
+        normalized[...] = ((batch.astype(np.float32) / np.float32(255) - mean) / std).transpose(0, 3, 1, 2)
+    
+    return normalized
+
+def preprocess_frames(raw_frames, backend=None, use_lut=None):
+    """Preprocess BGR frames into a normalized ``(N, 3, H, W)`` float32 tensor, converted once"""
+    return torch.from_numpy(normalize_frames(raw_frames, backend, use_lut))
+
+def sample_frame_indices(total_frames, max_frames=30, uniform_sampling=True):
+    """Return the indices of the frames to analyze"""
+    if uniform_sampling and total_frames > max_frames:
+        return np.linspace(0, total_frames-1, max_frames, dtype=int)
+    return range(min(total_frames, max_frames))
+
+def frames_to_tensor(raw_frames):
+    """Preprocess BGR frames with the configured preprocessing path"""
+    if settings.VIDEO_PREPROCESSING.get('VECTORIZED', True):
+        return preprocess_frames(raw_frames)
+    return preprocess_frames_torchvision(raw_frames)
+
+def sequences_to_tensor(raw_frames):
+    """Preprocess sampled frames into ``(N, 3, H, W)``, or ``(faces, N, 3, H, W)`` with face ROI
+    
+    With face ROI enabled each tracked face becomes its own cropped frame sequence.
+    """
+    if not face_roi_enabled():
+        return frames_to_tensor(raw_frames)
+    with profile_stage('preprocess.face_roi'):
+        sequences = crop_frame_tracks(raw_frames)
+    return torch.stack([frames_to_tensor(sequence) for sequence in sequences])
+
+def sequences_to_array(raw_frames):
+    """Numpy counterpart of sequences_to_tensor, for ONNX Runtime and model workers"""
+    if not face_roi_enabled():
+        return normalize_frames(raw_frames)
+    with profile_stage('preprocess.face_roi'):
+        sequences = crop_frame_tracks(raw_frames)
+    return np.stack([normalize_frames(sequence) for sequence in sequences])
+
+def extract_frames(video_path, max_frames=30, uniform_sampling=True, decode_mode=None):
+    """Extract frames from a video file with uniform sampling
+    
+    ``decode_mode`` is ``seek``, ``sequential`` or ``auto``; defaults to ``VIDEO_DECODING['MODE']``.
+    With face ROI enabled the tensor has a leading dimension with one sequence per tracked face.
+    """
     try:
         start_time = datetime.now()
         logger.info(f"Extracting frames from video: {video_path}")
@@ -217,51 +620,56 @@ def extract_frames(video_path, max_frames=30, uniform_sampling=True):
         logger.info(f"Video properties: {total_frames} frames, {fps:.2f} FPS, {duration:.2f} seconds, {width}x{height} resolution")
         
         # Define frame indices to extract
-        if uniform_sampling and total_frames > max_frames:
-            indices = np.linspace(0, total_frames-1, max_frames, dtype=int)
-        else:
-            indices = range(min(total_frames, max_frames))
+        indices = sample_frame_indices(total_frames, max_frames, uniform_sampling)
         
         logger.info(f"Extracting {len(indices)} frames with {'uniform' if uniform_sampling else 'sequential'} sampling")
         
+        # Decode the sampled frames in a single pass or with per-frame seeks
+        if decode_mode is None:
+            decode_mode = settings.VIDEO_DECODING.get('MODE', 'auto')
+        if decode_mode == 'auto':
+            decode_mode = choose_decode_mode(total_frames, indices)
+        
+        decode_start = datetime.now()
+        raw_frames = decode_frames(cap, indices, decode_mode)
+        cap.release()
+        decode_end = datetime.now()
+        logger.info(f"Decoded {len(raw_frames)} frames in {(decode_end - decode_start).total_seconds():.2f} seconds using {decode_mode} decoding")
+        record_stage('preprocess.decode', (decode_end - decode_start).total_seconds())
+        annotate('decodeMode', decode_mode)
+        annotate('framesDecoded', len(raw_frames))
+        annotate('totalFrames', total_frames)
+        
         # Extract frames
         if TORCH_AVAILABLE and TORCHVISION_AVAILABLE:
-            transform = transforms.Compose([
-                transforms.ToPILImage(),
-                transforms.Resize((112, 112)),
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-            ])
-            
-            for idx in indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                if ret:
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frame_tensor = transform(frame)
-                    frames.append(frame_tensor)
-            
-            cap.release()
+            if not raw_frames:
+                raise ValueError("No frames could be extracted from the video")
             
-            if frames:
-                frames = torch.stack(frames)
-                logger.info(f"Frames tensor shape: {frames.shape}")
-            else:
+            preprocess_start = datetime.now()
+            frames = sequences_to_tensor(raw_frames)
+            preprocess_end = datetime.now()
+            logger.info(f"Frames tensor shape: {frames.shape}")
+            logger.info(f"Frame preprocessing completed in {(preprocess_end - preprocess_start).total_seconds():.4f} seconds")
+            record_stage('preprocess.frames', (preprocess_end - preprocess_start).total_seconds())
+        elif USE_ONNX_RUNTIME or USE_MODEL_WORKER:
+            if not raw_frames:
                 raise ValueError("No frames could be extracted from the video")
+            
+            preprocess_start = datetime.now()
+            frames = sequences_to_array(raw_frames)
+            preprocess_end = datetime.now()
+            logger.info(f"Frames array shape: {frames.shape}")
+            logger.info(f"Frame preprocessing completed in {(preprocess_end - preprocess_start).total_seconds():.4f} seconds")
+            record_stage('preprocess.frames', (preprocess_end - preprocess_start).total_seconds())
         else:
             # If torch/torchvision not available, just extract raw frames
-            for idx in indices:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                ret, frame = cap.read()
-                if ret:
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    # Resize to 112x112
-                    frame = cv2.resize(frame, (112, 112))
-                    # Normalize (approximate)
-                    frame = frame / 255.0
-                    frames.append(frame)
-            
-            cap.release()
+            for frame in raw_frames:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # Resize to 112x112
+                frame = cv2.resize(frame, (112, 112))
+                # Normalize (approximate)
+                frame = frame / 255.0
+                frames.append(frame)
             
             if frames:
                 frames = np.array(frames)
@@ -271,14 +679,117 @@ def extract_frames(video_path, max_frames=30, uniform_sampling=True):
         
         end_time = datetime.now()
         logger.info(f"Extracted {len(frames)} frames in {(end_time - start_time).total_seconds():.2f} seconds")
+        observe_stage('video', 'preprocess', (end_time - start_time).total_seconds())
             
         return frames
     except Exception as e:
         logger.error(f"Error extracting frames from video: {str(e)}")
         raise
 
-def predict_video(model, video_path):
-    """Make a prediction on a video"""
+def embedding_cache_usable(model, content_hash):
+    """Return True if backbone features of this video's frames can be reused from the frame embedding cache
+    
+    Only the PyTorch model exposes its backbone features. With face ROI the
+    backbone sees face crops that depend on every sampled frame, so those are
+    always computed.
+    """
+    return (content_hash is not None and frame_embedding_cache_enabled() and TORCH_AVAILABLE and TORCHVISION_AVAILABLE
+            and not USING_MOCK_MODEL and hasattr(model, 'embed') and not face_roi_enabled())
+
+def get_embedding_fingerprint(model):
+    """Describe everything that changes a frame's backbone features, for frame embedding cache keys"""
+    params = {key: PREPROCESSING_PARAMS[key] for key in ('frame_size', 'mean', 'std', 'resize_backend')}
+    params.update({
+        'model': get_model_identity(),
+        'vectorized': settings.VIDEO_PREPROCESSING.get('VECTORIZED', True),
+        'bf16': getattr(model, 'use_bf16', False),
+    })
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def embed_frames(model, raw_frames):
+    """Return the backbone features of BGR frames as a float16 ``(N, 2048)`` numpy array"""
+    preprocess_start = datetime.now()
+    frames = frames_to_tensor(raw_frames)
+    record_stage('preprocess.frames', (datetime.now() - preprocess_start).total_seconds())
+    with inference_context(model):
+        features = model.embed(frames)
+    return features.float().numpy().astype(np.float16)
+
+def gather_features(model, content_hash, fingerprint, frames, cached):
+    """Return float16 features for ``(index, frame)`` pairs, embedding and caching the decoded frames
+    
+    Pairs without a frame are taken from ``cached``; indices found in neither are dropped.
+    """
+    decoded = [(idx, frame) for idx, frame in frames if frame is not None]
+    computed = {}
+    if decoded:
+        indices = [idx for idx, _ in decoded]
+        features = embed_frames(model, [frame for _, frame in decoded])
+        get_frame_embedding_cache().put(content_hash, fingerprint, indices, features)
+        computed = dict(zip(indices, features))
+    
+    rows = [computed[idx] if idx in computed else cached.get(idx) for idx, _ in frames]
+    rows = [row for row in rows if row is not None]
+    return np.stack(rows) if rows else np.empty((0, 2048), dtype=np.float16)
+
+def classify_features(model, features, state=None):
+    """Run ``(frames, 2048)`` backbone features through the LSTM head
+    
+    Returns the class probabilities and the running state for ``classify``.
+    """
+    with inference_context(model):
+        output, state = model.classify(torch.from_numpy(features.astype(np.float32))[None], state)
+    return torch.softmax(output.float(), dim=1)[0], state
+
+def decode_uncached_frames(video_path, content_hash, fingerprint):
+    """Decode the frames full mode samples, skipping those in the frame embedding cache
+    
+    Returns ``(frames, cached)``: ``(index, frame)`` pairs in sampling order, with
+    None for cached frames, and the cached features by frame index.
+    """
+    start_time = datetime.now()
+    logger.info(f"Extracting frames from video: {video_path}")
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = [int(idx) for idx in sample_frame_indices(total_frames, PREPROCESSING_PARAMS['max_frames'], PREPROCESSING_PARAMS['uniform_sampling'])]
+        cached = get_frame_embedding_cache().get(content_hash, fingerprint, indices)
+        missing = [idx for idx in indices if idx not in cached]
+        
+        decoded = {}
+        if missing:
+            decode_mode = settings.VIDEO_DECODING.get('MODE', 'auto')
+            if decode_mode == 'auto':
+                decode_mode = choose_decode_mode(total_frames, missing)
+            decode_start = datetime.now()
+            decoded = dict(iter_decoded_frames(cap, missing, decode_mode))
+            record_stage('preprocess.decode', (datetime.now() - decode_start).total_seconds())
+            annotate('decodeMode', decode_mode)
+    finally:
+        cap.release()
+    
+    if not cached and not decoded:
+        raise ValueError("No frames could be extracted from the video")
+    
+    end_time = datetime.now()
+    logger.info(f"Reused {len(cached)} cached frame embeddings and decoded {len(decoded)} of {len(indices)} frames "
+                f"in {(end_time - start_time).total_seconds():.2f} seconds")
+    annotate('embeddingCacheHits', len(cached))
+    annotate('framesDecoded', len(decoded))
+    annotate('totalFrames', total_frames)
+    observe_stage('video', 'preprocess', (end_time - start_time).total_seconds())
+    return [(idx, decoded.get(idx)) for idx in indices], cached
+
+def predict_video(model, video_path, content_hash=None):
+    """Make a prediction on a video
+    
+    With the content hash of the video, backbone features of frames analyzed
+    before are reused from the frame embedding cache.
+    """
     global USING_MOCK_MODEL
     
     try:
@@ -286,31 +797,44 @@ def predict_video(model, video_path):
         logger.info(f"Starting prediction for video: {video_path}")
         logger.info(f"Using mock model: {USING_MOCK_MODEL}")
         
-        # Extract frames from the video
-        frames = extract_frames(video_path)
+        # Extract frames from the video, or only those whose embeddings are not cached
+        use_embeddings = embedding_cache_usable(model, content_hash)
+        if use_embeddings:
+            fingerprint = get_embedding_fingerprint(model)
+            frames, cached = decode_uncached_frames(video_path, content_hash, fingerprint)
+        else:
+            frames = extract_frames(video_path)
         
-        if TORCH_AVAILABLE and TORCHVISION_AVAILABLE and not USING_MOCK_MODEL:
-            # Add batch dimension
-            frames = frames.unsqueeze(0)  # Shape: [1, num_frames, 3, 112, 112]
-            
-            logger.info(f"Prepared tensor of shape {frames.shape} for prediction")
-            
+        if MODEL_RUNTIME_AVAILABLE and not USING_MOCK_MODEL:
             # Make prediction
             logger.info("Running model inference...")
             prediction_start = datetime.now()
             
-            with torch.no_grad():
-                _, output = model(frames)
-                proba = torch.softmax(output, dim=1)
+            if use_embeddings:
+                # Backbone features of the decoded frames, then the LSTM head over every sampled frame
+                features = gather_features(model, content_hash, fingerprint, frames, cached)
+                proba = classify_features(model, features)[0].numpy()
+            else:
+                # Add batch dimension (face ROI already stacks one sequence per face)
+                if frames.ndim == 4:
+                    frames = frames[None]  # Shape: [1, num_frames, 3, 112, 112]
+                
+                logger.info(f"Prepared tensor of shape {frames.shape} for prediction")
+                
+                proba = video_probabilities(model, frames)
                 
-                # Get prediction and confidence
-                pred_idx = proba.argmax(dim=1).item()
-                confidence = proba[0][pred_idx].item()
+                # Each face is scored on its own; the most suspicious face decides (class 0 is fake)
+                proba = proba[proba[:, 0].argmax()]
+            
+            # Get prediction and confidence
+            pred_idx = int(proba.argmax())
+            confidence = float(proba[pred_idx])
             
             prediction_end = datetime.now()
             logger.info(f"Raw prediction value: {pred_idx}")
             logger.info(f"Confidence: {confidence:.4f}")
             logger.info(f"Inference time: {(prediction_end - prediction_start).total_seconds():.4f} seconds")
+            observe_stage('video', 'inference', (prediction_end - prediction_start).total_seconds())
             
             # Calculate percentages
             fake_percentage = (1 - confidence) * 100 if pred_idx == 1 else confidence * 100
@@ -338,7 +862,7 @@ def predict_video(model, video_path):
             'realPercentage': float(real_percentage),
             'fakePercentage': float(fake_percentage),
             'confidence': float(confidence_percentage),
-            'usingMockModel': USING_MOCK_MODEL or not TORCH_AVAILABLE or not TORCHVISION_AVAILABLE
+            'usingMockModel': USING_MOCK_MODEL or not MODEL_RUNTIME_AVAILABLE
         }
         
         end_time = datetime.now()
@@ -346,6 +870,9 @@ def predict_video(model, video_path):
         logger.info(f"Result: {'FAKE' if is_deepfake else 'REAL'} with {confidence_percentage:.2f}% confidence")
         
         return result
+    except ModelWorkerError:
+        # The worker is being restarted; answer with an error rather than a made-up verdict
+        raise
     except Exception as e:
         logger.error(f"Error during video prediction: {str(e)}")
         logger.exception("Exception details:")
@@ -363,3 +890,271 @@ def predict_video(model, video_path):
             'usingMockModel': True,
             'error': str(e)
         }
+
+def build_prediction_result(fake_probability):
+    """Turn the fake-class probability into the API result dict"""
+    fake_percentage = float(fake_probability) * 100
+    real_percentage = 100 - fake_percentage
+    return {
+        'isDeepfake': bool(fake_percentage > real_percentage),
+        'realPercentage': float(real_percentage),
+        'fakePercentage': float(fake_percentage),
+        'confidence': float(max(fake_percentage, real_percentage)),
+        'usingMockModel': USING_MOCK_MODEL or not MODEL_RUNTIME_AVAILABLE
+    }
+
+def score_frames(model, raw_frames):
+    """Return the fake-class probability for one sequence of BGR frames"""
+    if not MODEL_RUNTIME_AVAILABLE or USING_MOCK_MODEL:
+        import random
+        return random.random()
+    
+    frames = sequences_to_array(raw_frames) if uses_array_input(model) else sequences_to_tensor(raw_frames)
+    if frames.ndim == 4:
+        frames = frames[None]
+    proba = video_probabilities(model, frames)
+    # Class 0 is the fake class; with face ROI the most suspicious face decides
+    return float(proba[:, 0].max())
+
+def iter_segments(video_path, segment_seconds=10, frames_per_segment=16, skip_frames=None):
+    """Yield ``(index, start_time, end_time, frames)`` for consecutive time windows
+    
+    ``frames`` holds ``(frame_index, frame)`` pairs. The video is decoded in a
+    single sequential pass. Only the frames sampled uniformly within the current
+    window are retrieved and kept, and they are released once the window has
+    been yielded, so memory does not grow with the length of the video. Sampled
+    frames in ``skip_frames`` are not retrieved and come with a frame of None.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        logger.warning(f"Unknown frame rate for {video_path}, assuming 25 FPS")
+        fps = 25.0
+    window = max(1, int(round(segment_seconds * fps)))
+    
+    try:
+        position = 0
+        index = 0
+        ended = False
+        while not ended:
+            start = index * window
+            targets = set(np.linspace(start, start + window - 1, min(frames_per_segment, window), dtype=int).tolist())
+            frames = []
+            while position < start + window:
+                if not cap.grab():
+                    ended = True
+                    break
+                if position in targets:
+                    if skip_frames and position in skip_frames:
+                        frames.append((position, None))
+                    else:
+                        ret, frame = cap.retrieve()
+                        if ret:
+                            frames.append((position, frame))
+                position += 1
+            
+            if frames:
+                yield index, start / fps, position / fps, frames
+            index += 1
+    finally:
+        cap.release()
+
+def predict_video_segments(model, video_path, content_hash=None):
+    """Score a video window by window and aggregate the per-segment verdicts
+    
+    Each ``VIDEO_SEGMENTS['SEGMENT_SECONDS']`` window is scored as its own
+    sequence by the LSTM head. The result holds the aggregated verdict plus a
+    ``segments`` timeline. Frames whose embeddings are cached are not retrieved.
+    """
+    config = settings.VIDEO_SEGMENTS
+    segment_seconds = config.get('SEGMENT_SECONDS', 10)
+    frames_per_segment = config.get('FRAMES_PER_SEGMENT', 16)
+    min_frames = config.get('MIN_FRAMES', 4)
+    aggregation = config.get('AGGREGATION', 'mean')
+    
+    start_time = datetime.now()
+    logger.info(f"Starting segmented prediction for video: {video_path} "
+                f"({segment_seconds} s windows, {frames_per_segment} frames per window)")
+    
+    use_embeddings = embedding_cache_usable(model, content_hash)
+    skip_frames = None
+    if use_embeddings:
+        cache = get_frame_embedding_cache()
+        fingerprint = get_embedding_fingerprint(model)
+        skip_frames = cache.cached_frames(content_hash, fingerprint)
+        annotate('embeddingsCached', len(skip_frames))
+    
+    segments = []
+    for index, segment_start, segment_end, frames in iter_segments(video_path, segment_seconds, frames_per_segment, skip_frames):
+        # A short trailing window is only scored when it is all there is
+        if len(frames) < min_frames and segments:
+            logger.info(f"Skipping segment {index} with only {len(frames)} frames")
+            continue
+        
+        segment_start_time = datetime.now()
+        if use_embeddings:
+            cached = cache.get(content_hash, fingerprint, [idx for idx, frame in frames if frame is None])
+            features = gather_features(model, content_hash, fingerprint, frames, cached)
+            if not len(features):
+                continue
+            fake_probability = classify_features(model, features)[0][0].item()
+            frames_used = len(features)
+        else:
+            fake_probability = score_frames(model, [frame for _, frame in frames])
+            frames_used = len(frames)
+        segment_end_time = datetime.now()
+        record_stage('score_segment', (segment_end_time - segment_start_time).total_seconds())
+        logger.info(f"Segment {index} ({segment_start:.1f}-{segment_end:.1f} s) scored in "
+                    f"{(segment_end_time - segment_start_time).total_seconds():.2f} seconds: {fake_probability:.4f}")
+        
+        segments.append({
+            'index': index,
+            'start': float(segment_start),
+            'end': float(segment_end),
+            'framesUsed': frames_used,
+            'fakePercentage': float(fake_probability) * 100,
+            'isDeepfake': bool(fake_probability > 0.5),
+        })
+    
+    if not segments:
+        raise ValueError("No frames could be extracted from the video")
+    
+    probabilities = [segment['fakePercentage'] / 100 for segment in segments]
+    if aggregation == 'max':
+        fake_probability = max(probabilities)
+    else:
+        fake_probability = sum(probabilities) / len(probabilities)
+    
+    result = build_prediction_result(fake_probability)
+    result.update({
+        'mode': 'segmented',
+        'aggregation': aggregation,
+        'fakeSegments': sum(1 for segment in segments if segment['isDeepfake']),
+        'segments': segments,
+    })
+    
+    end_time = datetime.now()
+    logger.info(f"Segmented prediction of {len(segments)} segments completed in {(end_time - start_time).total_seconds():.2f} seconds")
+    logger.info(f"Result: {'FAKE' if result['isDeepfake'] else 'REAL'} with {result['confidence']:.2f}% confidence")
+    return result
+
+def predict_video_progressive(model, video_path, content_hash=None):
+    """Score a video chunk by chunk and stop as soon as the verdict is confident
+    
+    Frames are sampled as in full mode but decoded and scored
+    ``VIDEO_PROGRESSIVE['CHUNK_SIZE']`` at a time. After every chunk the verdict
+    over all frames seen so far is checked; once at least ``MIN_FRAMES`` have been
+    used and the softmax confidence reaches ``CONFIDENCE_THRESHOLD``, the rest of
+    the video is neither decoded nor scored. Whole frames are used even when face
+    ROI is enabled, since face tracks need the full set of sampled frames. Frames
+    whose embeddings are cached are not decoded.
+    """
+    config = settings.VIDEO_PROGRESSIVE
+    chunk_size = max(1, config.get('CHUNK_SIZE', 4))
+    min_frames = config.get('MIN_FRAMES', 8)
+    threshold = config.get('CONFIDENCE_THRESHOLD', 0.9)
+    
+    if not TORCH_AVAILABLE or not TORCHVISION_AVAILABLE or USING_MOCK_MODEL or not hasattr(model, 'forward_chunk'):
+        logger.info("Progressive inference needs the real video model, running a full prediction")
+        return {**predict_video(model, video_path, content_hash), 'mode': 'progressive', 'earlyExit': False}
+    
+    start_time = datetime.now()
+    cpu_start = time.process_time()
+    logger.info(f"Starting progressive prediction for video: {video_path} "
+                f"(chunks of {chunk_size}, threshold {threshold}, minimum {min_frames} frames)")
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = [int(idx) for idx in sample_frame_indices(total_frames, PREPROCESSING_PARAMS['max_frames'], PREPROCESSING_PARAMS['uniform_sampling'])]
+        
+        use_embeddings = embedding_cache_usable(model, content_hash)
+        cached = {}
+        if use_embeddings:
+            fingerprint = get_embedding_fingerprint(model)
+            cached = get_frame_embedding_cache().get(content_hash, fingerprint, indices)
+            annotate('embeddingCacheHits', len(cached))
+        missing = [idx for idx in indices if idx not in cached]
+        
+        decode_mode = settings.VIDEO_DECODING.get('MODE', 'auto')
+        if decode_mode == 'auto':
+            decode_mode = choose_decode_mode(total_frames, missing)
+        
+        state = None
+        proba = None
+        frames_used = 0
+        early_exit = False
+        chunk = []
+        # Decoded frames merged in index order with the cached ones, which come without a frame
+        frame_iter = iter_decoded_frames(cap, missing, decode_mode)
+        if cached:
+            frame_iter = heapq.merge(frame_iter, ((idx, None) for idx in sorted(cached)), key=lambda item: item[0])
+        while True:
+            frame = next(frame_iter, None)
+            if frame is not None:
+                chunk.append(frame)
+                if len(chunk) < chunk_size:
+                    continue
+            if not chunk:
+                break
+            
+            with profile_stage('score_chunk'):
+                if use_embeddings:
+                    features = gather_features(model, content_hash, fingerprint, chunk, cached)
+                    proba, state = classify_features(model, features, state)
+                else:
+                    frames = frames_to_tensor([pair[1] for pair in chunk]).unsqueeze(0)
+                    with inference_context(model):
+                        output, state = model.forward_chunk(frames, state)
+                    proba = torch.softmax(output.float(), dim=1)[0]
+            frames_used += len(chunk)
+            chunk = []
+            
+            confidence = proba.max().item()
+            logger.info(f"Progressive inference after {frames_used} frames: confidence {confidence:.4f}")
+            if frames_used >= min_frames and confidence >= threshold:
+                early_exit = frame is not None
+                break
+            if frame is None:
+                break
+    finally:
+        cap.release()
+    
+    if proba is None:
+        raise ValueError("No frames could be extracted from the video")
+    
+    # Class 0 is the fake class
+    result = build_prediction_result(proba[0].item())
+    result.update({
+        'mode': 'progressive',
+        'framesUsed': frames_used,
+        'framesSampled': len(indices),
+        'earlyExit': early_exit,
+    })
+    
+    end_time = datetime.now()
+    logger.info(f"Progressive prediction used {frames_used} of {len(indices)} frames, completed in "
+                f"{(end_time - start_time).total_seconds():.2f} seconds ({time.process_time() - cpu_start:.2f} seconds CPU)")
+    logger.info(f"Result: {'FAKE' if result['isDeepfake'] else 'REAL'} with {result['confidence']:.2f}% confidence")
+    return result
+
+# Analysis modes selectable per request
+ANALYSIS_MODES = {
+    'full': predict_video,
+    'segmented': predict_video_segments,
+    'progressive': predict_video_progressive,
+}
+
+def get_analysis_params(mode='full'):
+    """Return everything that changes the result of an analysis mode, for result cache keys"""
+    if mode == 'segmented':
+        return {**PREPROCESSING_PARAMS, 'mode': mode, 'segments': dict(settings.VIDEO_SEGMENTS)}
+    if mode == 'progressive':
+        return {**PREPROCESSING_PARAMS, 'mode': mode, 'progressive': dict(settings.VIDEO_PROGRESSIVE)}
+    return PREPROCESSING_PARAMS
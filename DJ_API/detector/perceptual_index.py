@@ -0,0 +1,250 @@
+import os
+import atexit
+import threading
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+# Number of set bits for every byte value, used to popcount packed hashes
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def _dct_matrix(size):
+    """Orthonormal DCT-II basis, so the 2-D transform is ``D @ X @ D.T``"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def compute_dhash(img, hash_size=8):
+    """64-bit difference hash: compares horizontally adjacent pixels of a 9x8 thumbnail"""
+    pixels = np.asarray(img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.float32)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def compute_phash(img, hash_size=8, highfreq_factor=4):
+    """64-bit perceptual hash: low-frequency DCT coefficients compared to their median"""
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(img.convert('L').resize((size, size), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(size)
+    low_freq = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    return _bits_to_int(low_freq > np.median(low_freq))
+
+
+def compute_perceptual_hash(img, algorithm=None):
+    """Hash a PIL image with the configured algorithm (``phash`` or ``dhash``)"""
+    algorithm = algorithm or settings.PERCEPTUAL_HASH.get('ALGORITHM', 'phash')
+    if algorithm == 'dhash':
+        return compute_dhash(img)
+    return compute_phash(img)
+
+
+def hamming_distances(hashes, value):
+    """Hamming distance between every uint64 in ``hashes`` and ``value``"""
+    diff = np.bitwise_xor(hashes, np.uint64(value))
+    return _POPCOUNT_TABLE[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class PerceptualIndex:
+    """Near-duplicate lookup over 64-bit perceptual hashes using multi-index hashing
+
+    Each hash is split into ``max_distance + 1`` disjoint bit ranges. By the pigeonhole
+    principle, any hash within ``max_distance`` bits of a query matches it exactly on at
+    least one range, so candidates come from a binary search per range and are then
+    verified with a vectorized popcount. Entries live in flat numpy arrays, which makes
+    saving and reloading the index a single ``np.load``.
+    """
+
+    def __init__(self, path=None, identity='', max_distance=4, flush_every=16):
+        self.path = path
+        self.identity = identity
+        self.max_distance = max(0, int(max_distance))
+        self.flush_every = max(1, int(flush_every))
+
+        # Bit ranges for multi-index hashing; fall back to a full scan for large radii
+        num_ranges = self.max_distance + 1
+        self._ranges = None
+        if num_ranges <= 16:
+            bounds = np.linspace(0, 64, num_ranges + 1).astype(int)
+            self._ranges = list(zip(bounds[:-1], bounds[1:]))
+
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._scores = np.empty(0, dtype=np.float32)
+        self._tables = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0}
+
+        self._load()
+
+    def __len__(self):
+        return len(self._hashes) + len(self._pending)
+
+    def _build_tables(self):
+        self._tables = []
+        if self._ranges is None:
+            return
+        for low, high in self._ranges:
+            mask = np.uint64((1 << int(high - low)) - 1)
+            values = (self._hashes >> np.uint64(low)) & mask
+            order = np.argsort(values, kind='stable')
+            self._tables.append((values[order], order))
+
+    def _candidates(self, value):
+        if self._ranges is None:
+            return np.arange(len(self._hashes))
+        found = []
+        for (low, high), (sorted_values, order) in zip(self._ranges, self._tables):
+            key = np.uint64((value >> int(low)) & ((1 << int(high - low)) - 1))
+            start = np.searchsorted(sorted_values, key, side='left')
+            end = np.searchsorted(sorted_values, key, side='right')
+            if end > start:
+                found.append(order[start:end])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def lookup(self, value):
+        """Return ``(score, distance)`` for the closest stored hash within range, or None"""
+        with self._lock:
+            self._stats['lookups'] += 1
+            best = None
+
+            candidates = self._candidates(value)
+            if len(candidates):
+                distances = hamming_distances(self._hashes[candidates], value)
+                nearest = int(np.argmin(distances))
+                if distances[nearest] <= self.max_distance:
+                    best = (float(self._scores[candidates[nearest]]), int(distances[nearest]))
+
+            for pending_hash, score in self._pending.items():
+                distance = bin(pending_hash ^ value).count('1')
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (score, distance)
+
+            if best is not None:
+                self._stats['hits'] += 1
+            return best
+
+    def add(self, value, score):
+        """Remember the fake probability scored for an image hash"""
+        with self._lock:
+            self._pending[int(value)] = float(score)
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def flush(self):
+        """Write entries added since the last flush to disk"""
+        with self._lock:
+            if self._pending:
+                self._flush()
+
+    def _merge(self, hashes, scores):
+        """Add entries to the arrays, keeping existing scores for hashes already present"""
+        new = ~np.isin(hashes, self._hashes)
+        if new.any():
+            self._hashes = np.concatenate([self._hashes, hashes[new]])
+            self._scores = np.concatenate([self._scores, scores[new]])
+
+    def _flush(self):
+        if self._pending:
+            self._merge(
+                np.fromiter(self._pending.keys(), dtype=np.uint64, count=len(self._pending)),
+                np.fromiter(self._pending.values(), dtype=np.float32, count=len(self._pending)),
+            )
+            self._pending = {}
+
+        if self.path:
+            # Pick up entries written by other workers before replacing the file
+            stored = self._read()
+            if stored is not None:
+                self._merge(*stored)
+            self._write()
+        self._build_tables()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path) as data:
+                if str(data['identity']) != self.identity:
+                    logger.info(f"Ignoring perceptual index at {self.path} built for a different model")
+                    return None
+                return data['hashes'].astype(np.uint64), data['scores'].astype(np.float32)
+        except Exception as e:
+            logger.error(f"Error reading perceptual index at {self.path}: {str(e)}")
+            return None
+
+    def _write(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, hashes=self._hashes, scores=self._scores, identity=np.array(self.identity))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error writing perceptual index to {self.path}: {str(e)}")
+
+    def _load(self):
+        stored = self._read()
+        if stored is not None:
+            self._hashes, self._scores = stored
+            logger.info(f"Loaded perceptual index with {len(self._hashes)} entries from {self.path}")
+        self._build_tables()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._hashes) + len(self._pending)
+        stats['hitRate'] = (stats['hits'] / stats['lookups']) if stats['lookups'] else 0.0
+        return stats
+
+
+_perceptual_index = None
+_perceptual_index_lock = threading.Lock()
+
+
+def perceptual_hash_enabled():
+    return settings.PERCEPTUAL_HASH.get('ENABLED', False)
+
+
+def get_perceptual_index(identity):
+    """Return the process-wide perceptual index for the given model identity"""
+    global _perceptual_index
+
+    with _perceptual_index_lock:
+        if _perceptual_index is None or _perceptual_index.identity != identity:
+            if _perceptual_index is not None:
+                _perceptual_index.flush()
+            else:
+                # Entries still waiting for a periodic flush would be lost on shutdown
+                atexit.register(flush_perceptual_index)
+            config = settings.PERCEPTUAL_HASH
+            _perceptual_index = PerceptualIndex(
+                path=config.get('INDEX_PATH'),
+                identity=identity,
+                max_distance=config.get('MAX_DISTANCE', 4),
+                flush_every=config.get('FLUSH_EVERY', 16),
+            )
+        return _perceptual_index
+
+
+def flush_perceptual_index():
+    """Save the entries of the process-wide index that are not on disk yet"""
+    index = _perceptual_index
+    if index is not None:
+        try:
+            index.flush()
+        except Exception as e:
+            logger.error(f"Error flushing perceptual index: {str(e)}")
+
+
+def get_perceptual_index_stats():
+    index = _perceptual_index
+    return index.stats() if index is not None else None
@@ -0,0 +1,285 @@
+import contextlib
+import functools
+import io
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+TOOLS = ('stages', 'cprofile', 'torch')
+
+_active = threading.local()
+
+
+class RequestProfile:
+    """Stage timings and optional profiler output collected for one request
+
+    Stages are recorded by the thread the profile is active in. Nested stages
+    use dotted names (``inference.lstm``); only top-level stages count towards
+    the accounted time in the summary.
+    """
+
+    def __init__(self, media_type, tools, sampled=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.media_type = media_type
+        self.tools = tools
+        self.sampled = sampled
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.annotations = {}
+        self.files = []
+        self.profiler_summaries = {}
+        self._start = time.perf_counter()
+        self._elapsed = None
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def annotate(self, key, value):
+        self.annotations[key] = value
+
+    def finish(self):
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._start
+
+    def summary(self):
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._start
+        with self._lock:
+            stages = [{'stage': stage, 'seconds': total, 'count': count} for stage, (total, count) in self.stages.items()]
+        accounted = sum(stage['seconds'] for stage in stages if '.' not in stage['stage'])
+        return {
+            'id': self.id,
+            'mediaType': self.media_type,
+            'startedAt': self.started_at.isoformat(timespec='milliseconds'),
+            'sampled': self.sampled,
+            'totalSeconds': elapsed,
+            'stages': stages,
+            'unaccountedSeconds': max(0.0, elapsed - accounted),
+            'annotations': dict(self.annotations),
+            'profilers': dict(self.profiler_summaries),
+            'files': list(self.files),
+        }
+
+
+def get_active_profile():
+    return getattr(_active, 'profile', None)
+
+
+@contextlib.contextmanager
+def activate(profile):
+    """Make ``profile`` the one stages are recorded into on this thread"""
+    previous = get_active_profile()
+    _active.profile = profile
+    try:
+        yield profile
+    finally:
+        _active.profile = previous
+
+
+def record_stage(stage, seconds):
+    """Add a stage duration to the active profile, if there is one"""
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        profile.record(stage, seconds)
+
+
+def annotate(key, value):
+    profile = getattr(_active, 'profile', None)
+    if profile is not None:
+        profile.annotate(key, value)
+
+
+@contextlib.contextmanager
+def profile_stage(stage):
+    """Time the enclosed block as ``stage`` when a profile is active"""
+    profile = getattr(_active, 'profile', None)
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(stage, time.perf_counter() - start)
+
+
+def parse_tools(value):
+    """Turn a profiling header value into a tuple of tools, or None to not profile"""
+    value = (value or '').strip().lower()
+    if not value or value in ('0', 'false', 'no', 'off'):
+        return None
+    if value in ('1', 'true', 'yes', 'on'):
+        return ('stages',)
+    tools = tuple(tool for tool in TOOLS if tool in {part.strip() for part in value.split(',')})
+    return tools or ('stages',)
+
+
+def requested_profile(request, media_type):
+    """Return a RequestProfile if this request should be profiled, else None
+
+    A request is profiled when it carries the profiling header (and the token,
+    if one is configured), or when it is picked by SAMPLE_RATE.
+    """
+    config = settings.PROFILING
+    if config.get('HEADER_ENABLED', False):
+        tools = parse_tools(request.headers.get(config.get('HEADER', 'X-Detector-Profile')))
+        token = config.get('TOKEN')
+        if tools and token and request.headers.get(config.get('TOKEN_HEADER', 'X-Detector-Profile-Token')) != token:
+            logger.warning("Ignoring profiling header without a valid token")
+            tools = None
+        if tools:
+            return RequestProfile(media_type, tools)
+
+    sample_rate = config.get('SAMPLE_RATE', 0.0)
+    if sample_rate > 0 and random.random() < sample_rate:
+        return RequestProfile(media_type, tuple(config.get('SAMPLE_TOOLS', ('stages',))), sampled=True)
+    return None
+
+
+def start_profilers(profile, stack):
+    """Enter the cProfile and torch profilers the profile asks for"""
+    if 'cprofile' in profile.tools:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        # Callbacks run last-in first-out: disable, then save
+        stack.callback(save_cprofile, profile, cprofiler)
+        stack.callback(cprofiler.disable)
+        cprofiler.enable()
+
+    if 'torch' in profile.tools:
+        # Only for the PyTorch video model; the profiler would otherwise import torch for nothing
+        from .models.onnx_backend import get_backend
+        from .model_workers import model_workers_enabled
+        if profile.media_type != 'video' or get_backend('video') != 'native' or model_workers_enabled('video'):
+            profile.annotate('torchProfiler', 'only available for the native video model served in-process')
+            return
+        from torch.profiler import profile as torch_profile, ProfilerActivity
+        torch_profiler = torch_profile(activities=[ProfilerActivity.CPU])
+        stack.callback(save_torch_profile, profile, torch_profiler)
+        stack.enter_context(torch_profiler)
+
+
+def profile_path(profile, suffix):
+    directory = settings.PROFILING.get('DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{profile.started_at.strftime('%Y%m%d-%H%M%S')}-{profile.media_type}-{profile.id}{suffix}")
+
+
+def save_cprofile(profile, profiler):
+    import pstats
+
+    top = settings.PROFILING.get('TOP_FUNCTIONS', 25)
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top)
+    profile.profiler_summaries['cprofile'] = output.getvalue().strip().splitlines()
+    path = profile_path(profile, '.prof')
+    if path:
+        profiler.dump_stats(path)
+        profile.files.append(path)
+
+
+def save_torch_profile(profile, profiler):
+    top = settings.PROFILING.get('TOP_FUNCTIONS', 25)
+    table = profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=top)
+    profile.profiler_summaries['torch'] = table.strip().splitlines()
+    path = profile_path(profile, '.trace.json')
+    if path:
+        profiler.export_chrome_trace(path)
+        profile.files.append(path)
+
+
+def prune_profiles(directory, max_files):
+    """Delete the oldest profile files beyond ``max_files``"""
+    try:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+    except OSError:
+        return
+    paths = sorted((path for path in paths if os.path.isfile(path)), key=os.path.getmtime)
+    for path in paths[:max(0, len(paths) - max_files)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def write_profile(profile):
+    """Write the profile summary to the profile directory and return its path"""
+    path = profile_path(profile, '.json')
+    if not path:
+        return None
+    profile.files.append(path)
+    with open(path, 'w') as f:
+        json.dump(profile.summary(), f, indent=2, default=str)
+    prune_profiles(os.path.dirname(path), settings.PROFILING.get('MAX_FILES', 500))
+    return path
+
+
+def profile_job(fn, parent):
+    """Wrap a background job so it is profiled when the request that submitted it was
+
+    The job runs on another thread after the response has been sent, so it gets
+    its own profile, written to the profile directory and attached to the job result.
+    """
+    if parent is None:
+        return fn
+
+    def run():
+        profile = RequestProfile(parent.media_type, ('stages',), sampled=parent.sampled)
+        profile.annotate('requestProfile', parent.id)
+        with activate(profile):
+            response_data = fn()
+            profile.finish()
+        try:
+            write_profile(profile)
+        except Exception as e:
+            logger.error(f"Could not write job profile: {str(e)}")
+        if not profile.sampled and isinstance(response_data, dict):
+            response_data = {**response_data, 'profile': profile.summary()}
+        return response_data
+    return run
+
+
+def profile_request(media_type):
+    """Decorate a view method to profile the requests that ask for it (or are sampled)
+
+    The stage breakdown is attached to the response under ``profile`` when the
+    client asked for it, and written to PROFILING['DIR'] in every case.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            profile = requested_profile(request, media_type)
+            if profile is None:
+                return handler(view, request, *args, **kwargs)
+
+            request.detector_profile = profile
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(activate(profile))
+                start_profilers(profile, stack)
+                response = handler(view, request, *args, **kwargs)
+                profile.finish()
+
+            try:
+                write_profile(profile)
+            except Exception as e:
+                logger.error(f"Could not write request profile: {str(e)}")
+            summary = profile.summary()
+            logger.info(f"Profiled {media_type} request {profile.id}: {summary['totalSeconds']:.2f} seconds, "
+                        + ', '.join(f"{stage['stage']} {stage['seconds']:.2f}s" for stage in summary['stages']))
+
+            data = getattr(response, 'data', None)
+            if not profile.sampled and isinstance(data, dict):
+                data['profile'] = summary
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+import importlib
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from .custom_logger import detector_logger as logger
+from .profiling import record_stage
+
+
+class ModelRegistry:
+    """Process-wide registry that loads each model exactly once
+
+    The first caller of ``get`` for a model runs its loader; concurrent callers
+    block on the same future and are woken up when loading finishes, so no one
+    sees a half-initialized model. A failed load is not cached and the next
+    caller retries.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._loading = {}
+        self._load_times = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        """Register the function that builds a model"""
+        with self._lock:
+            self._loaders[name] = loader
+
+    def get(self, name):
+        """Return the model, loading it on first use"""
+        with self._lock:
+            if name in self._models:
+                return self._models[name]
+            future = self._loading.get(name)
+            if future is None:
+                if name not in self._loaders:
+                    raise KeyError(f"No loader registered for model '{name}'")
+                future = Future()
+                self._loading[name] = future
+                loader = self._loaders[name]
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            logger.info(f"Waiting for {name} model to finish loading in another thread")
+            return future.result()
+
+        logger.info(f"Loading {name} model...")
+        start_time = datetime.now()
+        try:
+            model = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[name]
+            future.set_exception(e)
+            raise
+
+        load_time = (datetime.now() - start_time).total_seconds()
+        record_stage('model_load', load_time)
+        with self._lock:
+            self._models[name] = model
+            self._load_times[name] = load_time
+            del self._loading[name]
+        future.set_result(model)
+        logger.info(f"{name.capitalize()} model loaded in {load_time:.2f} seconds")
+        return model
+
+    def peek(self, name):
+        """Return the model if it is already loaded, without triggering a load"""
+        with self._lock:
+            return self._models.get(name)
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._models
+
+    def reset(self, name):
+        """Forget a loaded model so the next ``get`` loads it again"""
+        with self._lock:
+            self._models.pop(name, None)
+            self._load_times.pop(name, None)
+
+    def load_times(self):
+        with self._lock:
+            return dict(self._load_times)
+
+
+def get_model_module(media_type):
+    """Import the model module for a media type on first use
+
+    Each module imports its framework (TensorFlow for images, torch for videos)
+    at import time, so going through here keeps a worker from paying for a
+    framework it never serves.
+    """
+    return importlib.import_module(f'detector.models.{media_type}_model')
+
+
+def _load_image_model():
+    from .models.image_model import build_image_model
+    return build_image_model()
+
+
+def _load_video_model():
+    from .models.video_model import build_video_model
+    return build_video_model()
+
+
+model_registry = ModelRegistry()
+model_registry.register('image', _load_image_model)
+model_registry.register('video', _load_video_model)
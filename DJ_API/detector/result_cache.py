@@ -0,0 +1,167 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+
+def hash_upload(file_obj):
+    """Return the SHA-256 hex digest of an uploaded file and rewind it"""
+    # Computed by HashingUploadHandler while the upload was received
+    content_hash = getattr(file_obj, 'content_hash', None)
+    if content_hash is not None:
+        return content_hash
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def build_cache_key(media_type, content_hash, model_identity, preprocessing):
+    """Combine the content hash with everything that can change the verdict"""
+    params = json.dumps(preprocessing, sort_keys=True, default=str)
+    fingerprint = hashlib.sha256(f"{model_identity}|{params}".encode('utf-8')).hexdigest()[:16]
+    return f"detector:{media_type}:{content_hash}:{fingerprint}"
+
+
+_cache_tables_ready = False
+_cache_tables_lock = threading.Lock()
+
+
+def get_shared_cache(alias):
+    """Return the Django cache for an alias, creating database cache tables on first use
+
+    Returns None if the cache cannot be set up, so callers can degrade to in-process state.
+    """
+    global _cache_tables_ready
+
+    from django.core.cache import caches
+
+    with _cache_tables_lock:
+        if not _cache_tables_ready:
+            try:
+                from django.core.management import call_command
+                # Idempotent: only creates database cache tables that are missing
+                call_command('createcachetable', verbosity=0)
+            except Exception as e:
+                logger.error(f"Could not create database cache tables: {str(e)}")
+            _cache_tables_ready = True
+
+    try:
+        return caches[alias]
+    except Exception as e:
+        logger.error(f"Shared cache '{alias}' unavailable: {str(e)}")
+        return None
+
+
+class ResultCache:
+    """Two-tier detection result cache
+
+    A bounded in-process LRU sits in front of a Django cache alias (by default a
+    database cache in the project's SQLite DB) that is shared by all workers.
+    Entries are dicts holding the result and the stored file URL.
+    """
+
+    def __init__(self, max_entries=1024, persistent_alias=None, timeout=None):
+        self.max_entries = max(1, int(max_entries))
+        self.persistent_alias = persistent_alias
+        self.timeout = timeout
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._persistent = None
+        self._persistent_ready = False
+        self._stats = {'memoryHits': 0, 'persistentHits': 0, 'misses': 0, 'stores': 0}
+
+    def _get_persistent(self):
+        """Return the shared cache backend, creating its table on first use"""
+        if not self.persistent_alias:
+            return None
+        if not self._persistent_ready:
+            self._persistent = get_shared_cache(self.persistent_alias)
+            self._persistent_ready = True
+        return self._persistent
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['memoryHits'] += 1
+                return entry
+
+        persistent = self._get_persistent()
+        if persistent is not None:
+            try:
+                entry = persistent.get(key)
+            except Exception as e:
+                logger.error(f"Error reading persistent result cache: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                with self._lock:
+                    self._stats['persistentHits'] += 1
+                return entry
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key, entry):
+        self._remember(key, entry)
+
+        persistent = self._get_persistent()
+        if persistent is not None:
+            try:
+                persistent.set(key, entry, timeout=self.timeout)
+            except Exception as e:
+                logger.error(f"Error writing persistent result cache: {str(e)}")
+
+        with self._lock:
+            self._stats['stores'] += 1
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memoryEntries'] = len(self._entries)
+        lookups = stats['memoryHits'] + stats['persistentHits'] + stats['misses']
+        stats['hitRate'] = ((stats['memoryHits'] + stats['persistentHits']) / lookups) if lookups else 0.0
+        return stats
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def result_cache_enabled():
+    return settings.RESULT_CACHE.get('ENABLED', False)
+
+
+def get_result_cache():
+    """Return the process-wide result cache"""
+    global _result_cache
+
+    with _result_cache_lock:
+        if _result_cache is None:
+            config = settings.RESULT_CACHE
+            _result_cache = ResultCache(
+                max_entries=config.get('MAX_ENTRIES', 1024),
+                persistent_alias=config.get('PERSISTENT_CACHE'),
+                timeout=config.get('TIMEOUT'),
+            )
+        return _result_cache
+
+
+def get_result_cache_stats():
+    """Return stats for the result cache, or None if it has not been used"""
+    cache = _result_cache
+    return cache.stats() if cache is not None else None
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+# Media types served by each worker role
+ROLE_MEDIA_TYPES = {
+    'image': ('image',),
+    'video': ('video',),
+    'both': ('image', 'video'),
+}
+
+
+def get_worker_role():
+    """Return the configured worker role, falling back to 'both' for unknown values"""
+    role = str(settings.DETECTOR_ROLE).lower()
+    return role if role in ROLE_MEDIA_TYPES else 'both'
+
+
+def served_media_types():
+    return ROLE_MEDIA_TYPES[get_worker_role()]
+
+
+def serves(media_type):
+    return media_type in served_media_types()
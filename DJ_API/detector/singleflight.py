@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from django.conf import settings
+from .custom_logger import detector_logger as logger
+
+
+class SingleFlightTimeoutError(Exception):
+    """Raised when a duplicate request gives up waiting for the in-flight one"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution
+
+    The first caller for a key runs the function. Callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    The key is forgotten as soon as the call finishes, so later calls run again.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'coalesced': 0, 'timedOut': 0}
+
+    def do(self, key, fn):
+        """Run ``fn`` once per in-flight key and return ``(result, shared)``"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                self._stats['leaders'] += 1
+                leader = True
+
+        if not leader:
+            logger.info(f"Waiting on in-flight request for {key}")
+            try:
+                return future.result(timeout=self.timeout), True
+            except FutureTimeoutError:
+                with self._lock:
+                    self._stats['timedOut'] += 1
+                raise SingleFlightTimeoutError(f"In-flight request for {key} did not finish within {self.timeout} seconds")
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'inFlight': len(self._calls)}
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def single_flight_enabled():
+    return settings.SINGLE_FLIGHT.get('ENABLED', False)
+
+
+def get_single_flight():
+    """Return the process-wide single-flight group used by the detection views"""
+    global _single_flight
+
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight(timeout=settings.SINGLE_FLIGHT.get('TIMEOUT'))
+        return _single_flight
+
+
+def get_single_flight_stats():
+    group = _single_flight
+    return group.stats() if group is not None else None
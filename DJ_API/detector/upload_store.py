@@ -0,0 +1,383 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.urls import Resolver404, resolve
+from .custom_logger import detector_logger as logger
+
+TEMP_PREFIX = '.upload-'
+
+
+class StoredUpload:
+    """An upload saved for one request, kept on disk until the request releases it"""
+
+    def __init__(self, store, path, content_hash, persisted, created, temporary=False):
+        self.store = store
+        self.path = path
+        self.content_hash = content_hash
+        self.persisted = persisted
+        self.created = created
+        self.temporary = temporary
+        self._released = False
+
+    @property
+    def url(self):
+        """URL of the stored file, or None when the upload was not persisted"""
+        return self.store.url_for(self.path) if self.persisted else None
+
+    def release(self, failed=False):
+        """Give the file back to the store; ``failed`` deletes it if this request created it"""
+        if not self._released:
+            self._released = True
+            self.store.release(self, failed)
+
+
+class UploadStore:
+    """Content-addressed upload storage with a size and age budget
+
+    Persisted uploads are stored once per content as ``<sha256><ext>``. Their
+    modification time is refreshed on every use, so deleting the oldest files
+    first is least-recently-used eviction across all processes sharing the
+    directory. Uploads that are not persisted are used from the request's own
+    temporary file, or copied to a temporary file deleted on release.
+    ``incoming_dir`` holds the request temporary files (FILE_UPLOAD_TEMP_DIR);
+    stale ones left there by crashed processes are swept too.
+    """
+
+    def __init__(self, directory, url, max_bytes=None, max_age=None, sweep_interval=60, temp_max_age=3600, incoming_dir=None):
+        self.directory = directory
+        self.incoming_dir = incoming_dir
+        self.base_url = url
+        self.max_bytes = max_bytes or None
+        self.max_age = max_age or None
+        self.sweep_interval = sweep_interval
+        self.temp_max_age = temp_max_age
+        os.makedirs(directory, exist_ok=True)
+
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self._bytes_estimate = None
+        self._last_sweep = 0.0
+        self._sweeping = False
+        self._stats = {'stored': 0, 'deduplicated': 0, 'temporary': 0, 'discarded': 0, 'evicted': 0, 'evictedBytes': 0}
+
+    def path_for(self, content_hash, extension):
+        return os.path.join(self.directory, f'{content_hash}{extension}')
+
+    def url_for(self, path):
+        return f'{self.base_url}{os.path.basename(path)}'
+
+    def save(self, file_obj, content_hash=None, persist=True, request_scoped=True):
+        """Store an uploaded file and return a StoredUpload for it
+
+        When the content hash is already known and the file is stored, nothing is
+        written. An upload Django streamed to a temporary file is hard-linked into
+        the store when both are on one filesystem; otherwise it is copied in
+        chunks, hashed in the same pass if the upload handler did not hash it.
+        Without ``persist`` and with ``request_scoped``, the request's temporary
+        file is used as is; it is deleted with the request.
+        """
+        extension = os.path.splitext(file_obj.name)[1].lower()
+        content_hash = content_hash or getattr(file_obj, 'content_hash', None)
+        if persist and content_hash is not None:
+            path = self.path_for(content_hash, extension)
+            if self._claim(path):
+                return StoredUpload(self, path, content_hash, persisted=True, created=False)
+
+        source = file_obj.temporary_file_path() if hasattr(file_obj, 'temporary_file_path') else None
+        if source is not None and not persist and request_scoped:
+            return self._acquire(source, content_hash, persisted=False, created=False)
+
+        temp_path = os.path.join(self.directory, f'{TEMP_PREFIX}{uuid.uuid4().hex}{extension}')
+        try:
+            if source is not None and content_hash is not None:
+                try:
+                    os.link(source, temp_path)
+                except OSError:
+                    shutil.copyfile(source, temp_path)
+            else:
+                content_hash = self._copy_chunks(file_obj, temp_path)
+        except Exception:
+            self._remove(temp_path)
+            raise
+
+        if not persist:
+            with self._lock:
+                self._stats['temporary'] += 1
+            return self._acquire(temp_path, content_hash, persisted=False, created=True, temporary=True)
+
+        path = self.path_for(content_hash, extension)
+        if self._claim(path):
+            # Stored meanwhile by another request or process
+            self._remove(temp_path)
+            return StoredUpload(self, path, content_hash, persisted=True, created=False)
+
+        # Request temporary files are private to the worker; stored uploads are served from media
+        os.chmod(temp_path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        with self._lock:
+            # Moved into place and marked in use together, so a sweep cannot evict it in between
+            os.replace(temp_path, path)
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+            self._stats['stored'] += 1
+            if self._bytes_estimate is not None:
+                self._bytes_estimate += file_obj.size
+        upload = StoredUpload(self, path, content_hash, persisted=True, created=True)
+        self.maybe_sweep()
+        return upload
+
+    def _copy_chunks(self, file_obj, path):
+        """Write the upload to ``path`` chunk by chunk and return its SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            for chunk in file_obj.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        file_obj.seek(0)
+        return digest.hexdigest()
+
+    def _claim(self, path):
+        """Mark a stored file as recently used and in use; False if it is not stored
+
+        Runs under the lock the sweep removes files under, so a file found here
+        cannot be evicted before the caller releases it.
+        """
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return False
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+            self._stats['deduplicated'] += 1
+        return True
+
+    def _acquire(self, path, content_hash, persisted, created, temporary=False):
+        with self._lock:
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+        return StoredUpload(self, path, content_hash, persisted, created, temporary)
+
+    def release(self, upload, failed=False):
+        with self._lock:
+            count = self._in_use.get(upload.path, 0) - 1
+            if count > 0:
+                self._in_use[upload.path] = count
+                return
+            self._in_use.pop(upload.path, None)
+
+        if upload.temporary or (failed and upload.created):
+            if self._remove_unused(upload.path) and upload.persisted:
+                logger.info(f"Removed upload {os.path.basename(upload.path)} of a failed request")
+                with self._lock:
+                    self._stats['discarded'] += 1
+
+    def _remove_unused(self, path):
+        """Remove a file unless a request has picked it up meanwhile"""
+        with self._lock:
+            if path in self._in_use:
+                return False
+            return self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.error(f"Could not remove upload {path}: {str(e)}")
+            return False
+
+    def maybe_sweep(self):
+        """Start a background sweep when the budget may be exceeded or the interval has passed"""
+        now = time.monotonic()
+        with self._lock:
+            over_budget = self.max_bytes is not None and self._bytes_estimate is not None and self._bytes_estimate > self.max_bytes
+            if self._sweeping or not (over_budget or now - self._last_sweep >= self.sweep_interval):
+                return
+            self._sweeping = True
+            self._last_sweep = now
+        threading.Thread(target=self._run_sweep, name='upload-sweep', daemon=True).start()
+
+    def _run_sweep(self):
+        try:
+            self.sweep()
+        except Exception as e:
+            logger.error(f"Error sweeping uploads: {str(e)}")
+        finally:
+            with self._lock:
+                self._sweeping = False
+
+    def sweep(self):
+        """Delete stale temporary files, uploads older than max_age, then the least recently used uploads beyond max_bytes"""
+        start_time = time.perf_counter()
+        now = time.time()
+        files = list(scan_files(self.directory))
+        discarded = 0
+        if self.incoming_dir:
+            for path, name, size, mtime in scan_files(self.incoming_dir):
+                # Request temporary files are deleted with the request; old ones belong to dead processes
+                if now - mtime > self.temp_max_age and self._remove(path):
+                    discarded += 1
+
+        # Snapshot for the budget; each removal checks again under the lock
+        with self._lock:
+            in_use = set(self._in_use)
+
+        kept = []
+        evicted = evicted_bytes = 0
+        for path, name, size, mtime in files:
+            if path in in_use:
+                kept.append((path, size, mtime))
+            elif name.startswith(TEMP_PREFIX):
+                # Left behind by a request or process that died while saving or analyzing
+                if now - mtime > self.temp_max_age and self._remove_unused(path):
+                    discarded += 1
+            elif self.max_age is not None and now - mtime > self.max_age:
+                if self._remove_unused(path):
+                    evicted += 1
+                    evicted_bytes += size
+            else:
+                kept.append((path, size, mtime))
+
+        total = sum(size for _, size, _ in kept)
+        if self.max_bytes is not None and total > self.max_bytes:
+            for path, size, mtime in sorted(kept, key=lambda item: item[2]):
+                if total <= self.max_bytes:
+                    break
+                if path in in_use:
+                    continue
+                if self._remove_unused(path):
+                    evicted += 1
+                    evicted_bytes += size
+                total -= size
+
+        with self._lock:
+            self._bytes_estimate = total
+            self._stats['discarded'] += discarded
+            self._stats['evicted'] += evicted
+            self._stats['evictedBytes'] += evicted_bytes
+
+        if evicted or discarded:
+            logger.info(f"Upload sweep evicted {evicted} files ({evicted_bytes / (1024 * 1024):.1f} MB) and removed "
+                        f"{discarded} stale temporary files in {time.perf_counter() - start_time:.2f} seconds, {total / (1024 * 1024):.1f} MB stored")
+        return total
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['inUse'] = len(self._in_use)
+            stats['storedBytes'] = self._bytes_estimate
+        stats['maxBytes'] = self.max_bytes
+        return stats
+
+
+def scan_files(directory):
+    """Yield ``(path, name, size, mtime)`` for the files directly in ``directory``"""
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+                yield entry.path, entry.name, stat.st_size, stat.st_mtime
+        except FileNotFoundError:
+            continue
+
+
+_upload_store = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_store():
+    """Return the process-wide upload store"""
+    global _upload_store
+
+    with _upload_store_lock:
+        if _upload_store is None:
+            config = settings.UPLOAD_STORAGE
+            _upload_store = UploadStore(
+                directory=os.path.join(settings.MEDIA_ROOT, 'uploads'),
+                url=f"{settings.MEDIA_URL}uploads/",
+                max_bytes=config.get('MAX_BYTES'),
+                max_age=config.get('MAX_AGE'),
+                sweep_interval=config.get('SWEEP_INTERVAL', 60),
+                temp_max_age=config.get('TEMP_MAX_AGE', 3600),
+                incoming_dir=settings.FILE_UPLOAD_TEMP_DIR,
+            )
+            # Apply the budget to what earlier runs left behind
+            _upload_store.maybe_sweep()
+        return _upload_store
+
+
+def get_upload_store_stats():
+    """Return stats for the upload store, or None if it has not been used"""
+    store = _upload_store
+    return store.stats() if store is not None else None
+
+
+def get_memory_limit(request):
+    """Largest request body kept in memory for the endpoint the request is for"""
+    try:
+        url_name = resolve(request.path_info).url_name
+    except Resolver404:
+        url_name = None
+    if url_name == 'detect_video':
+        return settings.UPLOAD_STORAGE.get('VIDEO_MAX_MEMORY_SIZE', settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    return settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Stream uploaded files to memory or a temporary file, computing their SHA-256 as the chunks arrive
+
+    Replaces Django's memory and temporary file handlers. Requests up to the
+    endpoint's memory limit are kept in memory (so images can be decoded from
+    the buffer); video requests get a much lower limit so a worker does not hold
+    whole videos in memory. The hex digest is set on each file as ``content_hash``.
+    """
+
+    chunk_size = 256 * 1024
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.in_memory = content_length is not None and content_length <= get_memory_limit(self.request)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+        if self.in_memory:
+            self.file = io.BytesIO()
+        else:
+            os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+            self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        if self.in_memory:
+            upload = InMemoryUploadedFile(
+                file=self.file, field_name=self.field_name, name=self.file_name, content_type=self.content_type,
+                size=file_size, charset=self.charset, content_type_extra=self.content_type_extra,
+            )
+        else:
+            upload = self.file
+            upload.size = file_size
+        upload.content_hash = self.digest.hexdigest()
+        return upload
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file') and not self.in_memory:
+            temp_location = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
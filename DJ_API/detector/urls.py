@@ -1,8 +1,22 @@
 from django.urls import path
-from .views import ImageDetectionView, VideoDetectionView, HealthCheckView
+from .views import ImageDetectionView, VideoDetectionView, HealthCheckView, CachedResultView, ImageBatchDetectionView, JobStatusView, MetricsView
+from .roles import serves
 
 urlpatterns = [
-    path('detect/image/', ImageDetectionView.as_view(), name='detect_image'),
-    path('detect/video/', VideoDetectionView.as_view(), name='detect_video'),
+    path('detect/cached/<str:content_hash>/', CachedResultView.as_view(), name='cached_result'),
     path('health/', HealthCheckView.as_view(), name='health_check'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
+
+# Only expose the detection endpoints for the media types this worker serves
+if serves('image'):
+    urlpatterns += [
+        path('detect/image/', ImageDetectionView.as_view(), name='detect_image'),
+        path('detect/image/batch/', ImageBatchDetectionView.as_view(), name='detect_image_batch'),
+    ]
+
+if serves('video'):
+    urlpatterns += [
+        path('detect/video/', VideoDetectionView.as_view(), name='detect_video'),
+        path('jobs/<str:job_id>/', JobStatusView.as_view(), name='job_status'),
+    ]
@@ -6,17 +6,25 @@ import sys
 import time
 from datetime import datetime
 from django.conf import settings
-from django.http import JsonResponse
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.http import JsonResponse, HttpResponse
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import status
-from .models.image_model import predict_image, load_image_model, force_real_models as force_real_image_models
-from .models.video_model import predict_video, load_video_model, force_real_models as force_real_video_models
-from .apps import DetectorConfig
+from .registry import model_registry, get_model_module
+from .roles import get_worker_role, served_media_types, serves
+from .batching import BatchQueueFullError, BatchTimeoutError, image_batching_enabled, predict_image_batched, get_image_batching_stats
+from .result_cache import hash_upload, build_cache_key, result_cache_enabled, get_result_cache, get_result_cache_stats
+from .upload_store import get_upload_store, get_upload_store_stats
+from .embedding_cache import get_frame_embedding_cache_stats
+from .model_workers import ModelWorkerError, get_model_worker_stats
+from .singleflight import SingleFlightTimeoutError, single_flight_enabled, get_single_flight, get_single_flight_stats
+from .perceptual_index import get_perceptual_index_stats
+from .jobs import Job, JobQueueFullError, get_video_job_queue, get_video_job_stats
+from .batch_detection import BatchRequestError, IMAGE_EXTENSIONS, is_archive, iter_archive_entries, iter_uploaded_files, detect_image_batch
 from .custom_logger import detector_logger as logger, log_analysis
+from .metrics import metrics_enabled, observe_stage, track_request, render_metrics
+from .profiling import get_active_profile, profile_job, profile_request
 
 # Set environment variable to suppress TensorFlow warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -25,52 +33,66 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 FORCE_REAL_MODELS = os.environ.get('FORCE_REAL_MODELS', '').lower() in ('true', '1', 'yes')
 FORCE_MODEL_PERSISTENCE = os.environ.get('FORCE_MODEL_PERSISTENCE', '').lower() in ('true', '1', 'yes')
 
+# Model modules (and their frameworks) are imported lazily, only for the media types this worker serves
 if FORCE_REAL_MODELS:
     logger.info("Forcing real models based on environment variable")
-    force_real_image_models()
-    force_real_video_models()
+    for media_type in served_media_types():
+        get_model_module(media_type).force_real_models()
 
 # Load models at module level if persistence is enabled
 if FORCE_MODEL_PERSISTENCE:
     logger.info("Pre-loading models for persistence")
     try:
-        # Load image model
-        if DetectorConfig.image_model is None:
-            logger.info("Pre-loading image model for persistence")
-            DetectorConfig.image_model = load_image_model()
-            
-        # Load video model
-        if DetectorConfig.video_model is None:
-            logger.info("Pre-loading video model for persistence")
-            DetectorConfig.video_model = load_video_model()
+        for media_type in served_media_types():
+            model_registry.get(media_type)
     except Exception as e:
         logger.error(f"Error pre-loading models: {str(e)}")
 
+def get_result_cache_key(media_type, content_hash, mode=None):
+    """Build the result cache key for content scored by the current model in the given analysis mode"""
+    module = get_model_module(media_type)
+    params = module.PREPROCESSING_PARAMS if mode is None else module.get_analysis_params(mode)
+    return build_cache_key(media_type, content_hash, module.get_model_identity(), params)
+
+def is_truthy(value):
+    return str(value).lower() in ('true', '1', 'yes')
+
+def should_persist_upload(request):
+    """Whether the client wants the upload kept in media storage and its file_url returned"""
+    value = request.query_params.get('persist', request.data.get('persist'))
+    if value is None:
+        return settings.UPLOAD_STORAGE.get('PERSIST', True)
+    return is_truthy(value)
+
+def with_file_url(response_data, file_obj, content_hash, persist):
+    """Point a cached response at the stored upload, storing it again if it was evicted"""
+    response_data = {key: value for key, value in response_data.items() if key != 'file_url'}
+    if persist:
+        upload = get_upload_store().save(file_obj, content_hash)
+        upload.release()
+        response_data['file_url'] = upload.url
+    return response_data
+
+def is_valid_content_hash(content_hash):
+    return len(content_hash) == 64 and all(c in '0123456789abcdef' for c in content_hash)
+
 class HealthCheckView(APIView):
     """Simple health check endpoint to verify API is running"""
     
     def get(self, request):
-        # Check if models are loaded
-        image_model_loaded = DetectorConfig.image_model is not None
-        video_model_loaded = DetectorConfig.video_model is not None
-        
         # If models should be loaded but aren't, try loading them now
         if FORCE_MODEL_PERSISTENCE:
-            if not image_model_loaded:
-                try:
-                    logger.info("Loading image model during health check")
-                    DetectorConfig.image_model = load_image_model()
-                    image_model_loaded = DetectorConfig.image_model is not None
-                except Exception as e:
-                    logger.error(f"Failed to load image model during health check: {str(e)}")
-            
-            if not video_model_loaded:
-                try:
-                    logger.info("Loading video model during health check")
-                    DetectorConfig.video_model = load_video_model()
-                    video_model_loaded = DetectorConfig.video_model is not None
-                except Exception as e:
-                    logger.error(f"Failed to load video model during health check: {str(e)}")
+            for name in served_media_types():
+                if not model_registry.is_loaded(name):
+                    try:
+                        logger.info(f"Loading {name} model during health check")
+                        model_registry.get(name)
+                    except Exception as e:
+                        logger.error(f"Failed to load {name} model during health check: {str(e)}")
+        
+        # Check if models are loaded
+        image_model_loaded = model_registry.is_loaded('image')
+        video_model_loaded = model_registry.is_loaded('video')
         
         # Check if we're using mock models
         using_mock_models = settings.AI_MODELS.get('USE_MOCK_MODELS', False)
@@ -90,17 +112,29 @@ class HealthCheckView(APIView):
         
         return Response({
             'status': 'ok',
+            'role': get_worker_role(),
             'image_model_loaded': image_model_loaded,
             'video_model_loaded': video_model_loaded,
             'using_mock_models': using_mock_models,
             'image_model_file_exists': image_model_exists,
-            'video_model_file_exists': video_model_exists
+            'video_model_file_exists': video_model_exists,
+            'model_load_times': model_registry.load_times(),
+            'model_workers': get_model_worker_stats(),
+            'image_batching': get_image_batching_stats(),
+            'result_cache': get_result_cache_stats(),
+            'upload_storage': get_upload_store_stats(),
+            'frame_embedding_cache': get_frame_embedding_cache_stats(),
+            'single_flight': get_single_flight_stats(),
+            'perceptual_index': get_perceptual_index_stats(),
+            'video_jobs': get_video_job_stats()
         })
 
 class ImageDetectionView(APIView):
     """API endpoint for image deepfake detection"""
     parser_classes = (MultiPartParser, FormParser)
     
+    @track_request('image', 'detect')
+    @profile_request('image')
     def post(self, request):
         start_time = datetime.now()
         logger.info(f"Received image detection request")
@@ -108,26 +142,18 @@ class ImageDetectionView(APIView):
         try:
             # Check if we should force real models
             if FORCE_REAL_MODELS:
-                force_real_image_models()
+                get_model_module('image').force_real_models()
                 logger.info("Forced real image model for this request")
             
-            # Get the model - try to use the pre-loaded model first
-            model = DetectorConfig.image_model
-            
-            # If model is not available, try to load it on demand
-            if model is None:
-                logger.warning("Image model is not loaded, attempting to load it now")
-                try:
-                    model = load_image_model()
-                    # Update the shared model reference for future use
-                    DetectorConfig.image_model = model
-                    logger.info("Successfully loaded image model on-demand")
-                except Exception as e:
-                    logger.error(f"Failed to load image model on-demand: {str(e)}")
-                    return Response(
-                        {'error': 'Image detection model could not be loaded. Please check server logs.'},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
+            # Get the shared model, loaded once per process on first use
+            try:
+                model = model_registry.get('image')
+            except Exception as e:
+                logger.error(f"Failed to load image model: {str(e)}")
+                return Response(
+                    {'error': 'Image detection model could not be loaded. Please check server logs.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             
             # Get the uploaded file
             file_obj = request.FILES.get('file')
@@ -148,30 +174,54 @@ class ImageDetectionView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Save the file temporarily
-            file_path = default_storage.save(f'uploads/{file_obj.name}', ContentFile(file_obj.read()))
-            file_path = os.path.join(settings.MEDIA_ROOT, file_path)
-            
-            logger.info(f"File saved at: {file_path}")
-            
-            # Make prediction
-            prediction_start = datetime.now()
-            logger.info(f"Starting image prediction")
-            
-            result = predict_image(model, file_path)
-            
-            prediction_end = datetime.now()
-            prediction_time = (prediction_end - prediction_start).total_seconds()
-            logger.info(f"Image prediction completed in {prediction_time:.2f} seconds")
+            persist = should_persist_upload(request)
+            
+            # Return a previous verdict for identical content without scoring it again
+            content_hash = None
+            cache_key = None
+            if result_cache_enabled() or single_flight_enabled():
+                content_hash = hash_upload(file_obj)
+                cache_key = get_result_cache_key('image', content_hash)
+            
+            if cache_key is not None and result_cache_enabled():
+                cached = get_result_cache().get(cache_key)
+                if cached is not None:
+                    logger.info(f"Result cache hit for image {file_obj.name} ({content_hash})")
+                    log_analysis(logger, 'image', file_obj.name, cached['result'])
+                    cached = with_file_url(cached, file_obj, content_hash, persist)
+                    return Response({**cached, 'content_hash': content_hash, 'cached': True}, status=status.HTTP_200_OK)
+            
+            # Identical uploads that arrive while this one is being analyzed share its result
+            shared = False
+            try:
+                if cache_key is not None and single_flight_enabled():
+                    response_data, shared = get_single_flight().do(cache_key, lambda: self.analyze(model, file_obj, content_hash, persist))
+                else:
+                    response_data = self.analyze(model, file_obj, content_hash, persist)
+            except (BatchQueueFullError, BatchTimeoutError, SingleFlightTimeoutError) as e:
+                logger.warning(f"Rejecting image request: {str(e)}")
+                return Response(
+                    {'error': 'Image detection is overloaded. Please retry shortly.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            except ModelWorkerError as e:
+                logger.error(f"Image model worker failed: {str(e)}")
+                return Response(
+                    {'error': 'Image detection model is temporarily unavailable. Please retry shortly.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             
-            # Log analysis result with our custom logger
-            log_analysis(logger, 'image', file_obj.name, result)
+            if shared:
+                logger.info(f"Shared in-flight image result for {file_obj.name} ({content_hash})")
+                # The first request stored the upload according to its own persist choice
+                response_data = with_file_url(response_data, file_obj, content_hash, persist)
+            elif cache_key is not None and result_cache_enabled():
+                # Fallback results produced by an error are not worth remembering
+                if 'error' not in response_data['result']:
+                    get_result_cache().set(cache_key, response_data)
             
-            # Create response
-            response_data = {
-                'result': result,
-                'file_url': f'/media/uploads/{os.path.basename(file_path)}'
-            }
+            if content_hash is not None:
+                response_data = {**response_data, 'content_hash': content_hash, 'cached': False, 'coalesced': shared}
             
             end_time = datetime.now()
             total_time = (end_time - start_time).total_seconds()
@@ -186,11 +236,140 @@ class ImageDetectionView(APIView):
                 {'error': 'An error occurred during image analysis', 'details': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    def analyze(self, model, file_obj, content_hash=None, persist=True):
+        """Save the upload if it is persisted and run the image model on it"""
+        # Save the file, once per content
+        upload = None
+        if persist:
+            save_start = datetime.now()
+            upload = get_upload_store().save(file_obj, content_hash)
+            observe_stage('image', 'upload_save', (datetime.now() - save_start).total_seconds())
+            
+            logger.info(f"File saved at: {upload.path}")
+        
+        # Make prediction, decoding the upload itself rather than reading the saved copy back
+        prediction_start = datetime.now()
+        logger.info(f"Starting image prediction")
+        
+        file_obj.seek(0)
+        try:
+            if image_batching_enabled():
+                result = predict_image_batched(model, file_obj)
+            else:
+                result = get_model_module('image').predict_image(model, file_obj)
+        except Exception:
+            if upload is not None:
+                upload.release(failed=True)
+            raise
+        if upload is not None:
+            upload.release()
+        
+        prediction_end = datetime.now()
+        prediction_time = (prediction_end - prediction_start).total_seconds()
+        logger.info(f"Image prediction completed in {prediction_time:.2f} seconds")
+        
+        # Log analysis result with our custom logger
+        log_analysis(logger, 'image', file_obj.name, result)
+        
+        # Create response
+        response_data = {'result': result}
+        if upload is not None:
+            response_data['file_url'] = upload.url
+        return response_data
+
+class ImageBatchDetectionView(APIView):
+    """API endpoint for scoring many images in one request
+    
+    Accepts several ``files`` fields or a single zip/tar ``archive``. Uploads are
+    scored in memory and are not saved to media storage.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    
+    @track_request('image', 'batch')
+    @profile_request('image')
+    def post(self, request):
+        start_time = datetime.now()
+        logger.info(f"Received batch image detection request")
+        
+        try:
+            # Check if we should force real models
+            if FORCE_REAL_MODELS:
+                get_model_module('image').force_real_models()
+                logger.info("Forced real image model for this request")
+            
+            # Get the shared model, loaded once per process on first use
+            try:
+                model = model_registry.get('image')
+            except Exception as e:
+                logger.error(f"Failed to load image model: {str(e)}")
+                return Response(
+                    {'error': 'Image detection model could not be loaded. Please check server logs.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            
+            # Get the uploaded archive or files
+            archive = request.FILES.get('archive')
+            files = request.FILES.getlist('files')
+            
+            if archive is not None:
+                if not is_archive(archive.name):
+                    logger.warning(f"Invalid archive type: {archive.name}")
+                    return Response(
+                        {'error': 'Invalid archive type. Only ZIP and TAR (optionally gzip, bzip2 or xz compressed) are supported'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                logger.info(f"Processing image archive: {archive.name}, Size: {archive.size} bytes")
+                entries = iter_archive_entries(archive)
+            elif files:
+                invalid = [f.name for f in files if not f.name.lower().endswith(IMAGE_EXTENSIONS)]
+                if invalid:
+                    logger.warning(f"Invalid file types in batch: {invalid}")
+                    return Response(
+                        {'error': 'Invalid file type. Only PNG, JPG, JPEG, and GIF are supported', 'files': invalid},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                logger.info(f"Processing {len(files)} uploaded images")
+                entries = iter_uploaded_files(files)
+            else:
+                logger.warning("No files provided in batch request")
+                return Response(
+                    {'error': 'No files provided. Send several "files" fields or one "archive"'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            try:
+                results = detect_image_batch(model, entries)
+            except BatchRequestError as e:
+                logger.warning(f"Rejecting batch request: {str(e)}")
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            failed = sum(1 for entry in results if 'error' in entry)
+            end_time = datetime.now()
+            total_time = (end_time - start_time).total_seconds()
+            logger.info(f"Batch image detection of {len(results)} files ({failed} failed) completed in {total_time:.2f} seconds")
+            
+            return Response({
+                'results': results,
+                'total': len(results),
+                'failed': failed,
+                'processing_time': total_time
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            logger.error(f"Error in batch image detection: {str(e)}")
+            logger.error(traceback.format_exc())
+            return Response(
+                {'error': 'An error occurred during batch image analysis', 'details': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
 class VideoDetectionView(APIView):
     """API endpoint for video deepfake detection"""
     parser_classes = (MultiPartParser, FormParser)
     
+    @track_request('video', 'detect')
+    @profile_request('video')
     def post(self, request):
         start_time = datetime.now()
         logger.info(f"Received video detection request")
@@ -198,26 +377,18 @@ class VideoDetectionView(APIView):
         try:
             # Check if we should force real models
             if FORCE_REAL_MODELS:
-                force_real_video_models()
+                get_model_module('video').force_real_models()
                 logger.info("Forced real video model for this request")
             
-            # Get the model - try to use the pre-loaded model first
-            model = DetectorConfig.video_model
-            
-            # If model is not available, try to load it on demand
-            if model is None:
-                logger.warning("Video model is not loaded, attempting to load it now")
-                try:
-                    model = load_video_model()
-                    # Update the shared model reference for future use
-                    DetectorConfig.video_model = model
-                    logger.info("Successfully loaded video model on-demand")
-                except Exception as e:
-                    logger.error(f"Failed to load video model on-demand: {str(e)}")
-                    return Response(
-                        {'error': 'Video detection model could not be loaded. Please check server logs.'},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
+            # Get the shared model, loaded once per process on first use
+            try:
+                model = model_registry.get('video')
+            except Exception as e:
+                logger.error(f"Failed to load video model: {str(e)}")
+                return Response(
+                    {'error': 'Video detection model could not be loaded. Please check server logs.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             
             # Get the uploaded file
             file_obj = request.FILES.get('file')
@@ -238,30 +409,66 @@ class VideoDetectionView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Save the file temporarily
-            file_path = default_storage.save(f'uploads/{file_obj.name}', ContentFile(file_obj.read()))
-            file_path = os.path.join(settings.MEDIA_ROOT, file_path)
-            
-            logger.info(f"File saved at: {file_path}")
-            
-            # Make prediction
-            prediction_start = datetime.now()
-            logger.info(f"Starting video prediction")
-            
-            result = predict_video(model, file_path)
+            mode = self.get_mode(request)
+            if mode not in get_model_module('video').ANALYSIS_MODES:
+                logger.warning(f"Invalid video analysis mode: {mode}")
+                return Response(
+                    {'error': f"Invalid mode '{mode}'. Supported modes: {', '.join(get_model_module('video').ANALYSIS_MODES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            prediction_end = datetime.now()
-            prediction_time = (prediction_end - prediction_start).total_seconds()
-            logger.info(f"Video prediction completed in {prediction_time:.2f} seconds")
+            persist = should_persist_upload(request)
+            
+            # Return a previous verdict for identical content without scoring it again
+            content_hash = None
+            cache_key = None
+            if result_cache_enabled() or single_flight_enabled():
+                content_hash = hash_upload(file_obj)
+                cache_key = get_result_cache_key('video', content_hash, mode)
+            
+            if cache_key is not None and result_cache_enabled():
+                cached = get_result_cache().get(cache_key)
+                if cached is not None:
+                    logger.info(f"Result cache hit for {mode} video {file_obj.name} ({content_hash})")
+                    log_analysis(logger, 'video', file_obj.name, cached['result'])
+                    cached = with_file_url(cached, file_obj, content_hash, persist)
+                    return Response({**cached, 'content_hash': content_hash, 'cached': True}, status=status.HTTP_200_OK)
+            
+            # In async mode the upload is stored and analyzed by the background job pool
+            if self.is_async(request):
+                return self.submit_job(model, file_obj, content_hash, cache_key, mode, persist)
+            
+            # Identical uploads that arrive while this one is being analyzed share its result
+            shared = False
+            try:
+                if cache_key is not None and single_flight_enabled():
+                    response_data, shared = get_single_flight().do(cache_key, lambda: self.analyze(model, file_obj, mode, content_hash, persist))
+                else:
+                    response_data = self.analyze(model, file_obj, mode, content_hash, persist)
+            except SingleFlightTimeoutError as e:
+                logger.warning(f"Rejecting video request: {str(e)}")
+                return Response(
+                    {'error': 'Video detection is overloaded. Please retry shortly.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            except ModelWorkerError as e:
+                logger.error(f"Video model worker failed: {str(e)}")
+                return Response(
+                    {'error': 'Video detection model is temporarily unavailable. Please retry shortly.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             
-            # Log analysis result with our custom logger
-            log_analysis(logger, 'video', file_obj.name, result)
+            if shared:
+                logger.info(f"Shared in-flight video result for {file_obj.name} ({content_hash})")
+                # The first request stored the upload according to its own persist choice
+                response_data = with_file_url(response_data, file_obj, content_hash, persist)
+            elif cache_key is not None and result_cache_enabled():
+                # Fallback results produced by an error are not worth remembering
+                if 'error' not in response_data['result']:
+                    get_result_cache().set(cache_key, response_data)
             
-            # Create response
-            response_data = {
-                'result': result,
-                'file_url': f'/media/uploads/{os.path.basename(file_path)}'
-            }
+            if content_hash is not None:
+                response_data = {**response_data, 'content_hash': content_hash, 'cached': False, 'coalesced': shared}
             
             end_time = datetime.now()
             total_time = (end_time - start_time).total_seconds()
@@ -276,3 +483,169 @@ class VideoDetectionView(APIView):
                 {'error': 'An error occurred during video analysis', 'details': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    def is_async(self, request):
+        """Whether the client asked for a background job instead of waiting for the result"""
+        value = request.query_params.get('async', request.data.get('async'))
+        if value is None:
+            return settings.VIDEO_JOBS.get('DEFAULT_ASYNC', False)
+        return is_truthy(value)
+    
+    def get_mode(self, request):
+        """Return the requested analysis mode: 'full', 'segmented' or 'progressive'"""
+        value = request.query_params.get('mode', request.data.get('mode'))
+        if value is None:
+            return settings.VIDEO_DEFAULT_MODE
+        return str(value).lower()
+    
+    def submit_job(self, model, file_obj, content_hash, cache_key, mode='full', persist=True):
+        """Store the upload, queue it for analysis and return the job ID"""
+        # The job outlives the request, and with it the request's temporary file
+        upload = self.save_upload(file_obj, content_hash, persist, request_scoped=False)
+        file_name = file_obj.name
+        
+        def run_job():
+            try:
+                response_data = self.predict(model, upload, file_name, mode)
+            except Exception:
+                upload.release(failed=True)
+                raise
+            upload.release()
+            if cache_key is not None and result_cache_enabled() and 'error' not in response_data['result']:
+                get_result_cache().set(cache_key, response_data)
+            return response_data
+        
+        new_job = Job('video', profile_job(run_job, get_active_profile()), file_name)
+        try:
+            job = get_video_job_queue().submit(new_job, key=cache_key)
+        except JobQueueFullError as e:
+            upload.release(failed=True)
+            logger.warning(f"Rejecting video job: {str(e)}")
+            return Response(
+                {'error': 'Video analysis queue is full. Please retry shortly.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        # An active job for the same content was returned instead, so this upload is never analyzed
+        if job is not new_job:
+            upload.release()
+        
+        response_data = {
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}/'
+        }
+        if content_hash is not None:
+            response_data['content_hash'] = content_hash
+        return Response(response_data, status=status.HTTP_202_ACCEPTED)
+    
+    def save_upload(self, file_obj, content_hash=None, persist=True, request_scoped=True):
+        """Save the upload, once per content, and return the StoredUpload"""
+        save_start = datetime.now()
+        upload = get_upload_store().save(file_obj, content_hash, persist, request_scoped)
+        observe_stage('video', 'upload_save', (datetime.now() - save_start).total_seconds())
+        
+        logger.info(f"File saved at: {upload.path}")
+        return upload
+    
+    def predict(self, model, upload, file_name, mode='full'):
+        """Run the video model on a saved upload and build the response data"""
+        # Make prediction
+        prediction_start = datetime.now()
+        logger.info(f"Starting video prediction ({mode} mode)")
+        
+        result = get_model_module('video').ANALYSIS_MODES[mode](model, upload.path, content_hash=upload.content_hash)
+        
+        prediction_end = datetime.now()
+        prediction_time = (prediction_end - prediction_start).total_seconds()
+        logger.info(f"Video prediction completed in {prediction_time:.2f} seconds")
+        
+        # Log analysis result with our custom logger
+        log_analysis(logger, 'video', file_name, result)
+        
+        # Create response
+        response_data = {'result': result}
+        if upload.persisted:
+            response_data['file_url'] = upload.url
+        return response_data
+    
+    def analyze(self, model, file_obj, mode='full', content_hash=None, persist=True):
+        """Save the upload and run the video model on it"""
+        upload = self.save_upload(file_obj, content_hash, persist)
+        try:
+            response_data = self.predict(model, upload, file_obj.name, mode)
+        except Exception:
+            upload.release(failed=True)
+            raise
+        upload.release()
+        return response_data
+
+
+class CachedResultView(APIView):
+    """Return a previously computed verdict by SHA-256 of the file content"""
+    
+    def get(self, request, content_hash):
+        content_hash = content_hash.lower()
+        if not is_valid_content_hash(content_hash):
+            return Response(
+                {'error': 'Invalid content hash. Expected a hex-encoded SHA-256 digest'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        media_type = request.query_params.get('type')
+        if media_type not in (None, 'image', 'video'):
+            return Response(
+                {'error': 'Invalid type. Use image or video'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not result_cache_enabled():
+            return Response(
+                {'error': 'Result cache is disabled'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Video verdicts are cached per analysis mode, defaulting to the mode detection requests use
+        mode = str(request.query_params.get('mode', settings.VIDEO_DEFAULT_MODE)).lower()
+        if serves('video') and mode not in get_model_module('video').ANALYSIS_MODES:
+            return Response(
+                {'error': f"Invalid mode '{mode}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        candidates = [media_type] if media_type else served_media_types()
+        for candidate in (c for c in candidates if serves(c)):
+            cached = get_result_cache().get(get_result_cache_key(candidate, content_hash, mode if candidate == 'video' else None))
+            if cached is not None:
+                logger.info(f"Cached {candidate} result served for {content_hash}")
+                return Response(
+                    {**cached, 'content_hash': content_hash, 'media_type': candidate, 'cached': True},
+                    status=status.HTTP_200_OK
+                )
+        
+        return Response(
+            {'error': 'No cached result for this content', 'content_hash': content_hash},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+
+class JobStatusView(APIView):
+    """Return the status of a background analysis job, with its result once completed"""
+    
+    def get(self, request, job_id):
+        job = get_video_job_queue().get(job_id)
+        if job is None:
+            return Response(
+                {'error': 'Job not found', 'job_id': job_id},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(job, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """Expose request, stage, queue and model metrics in the Prometheus text format"""
+    
+    def get(self, request):
+        if not metrics_enabled():
+            return Response({'error': 'Metrics are disabled'}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
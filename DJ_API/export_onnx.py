@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Export the image and video models to ONNX for the onnxruntime backend
+
+The models are loaded from AI_MODELS (or --model) exactly as the native backend
+loads them, exported to the ONNX_RUNTIME paths (or --output), and the ONNX
+Runtime output is compared with the framework output on a random input. Usage:
+
+    python export_onnx.py [--media image video] [--opset 17]
+    python export_onnx.py --media video --model ai_models/video_model.pth --output /tmp/video_model.onnx
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Export always starts from the native models
+os.environ['IMAGE_BACKEND'] = 'native'
+os.environ['VIDEO_BACKEND'] = 'native'
+os.environ['IMAGE_QUANTIZATION'] = 'none'
+os.environ['VIDEO_QUANTIZATION'] = 'none'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deepfake_api.settings')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import django
+django.setup()
+
+from django.conf import settings
+from detector.models.onnx_backend import OnnxModel, export_image_model, export_video_model
+
+
+def export_image(model_path, output_path, opset):
+    from detector.models import image_model
+
+    if model_path:
+        settings.AI_MODELS['IMAGE_MODEL_PATH'] = model_path
+    # The traced inference path is not needed for export
+    settings.IMAGE_INFERENCE = {**settings.IMAGE_INFERENCE, 'USE_TF_FUNCTION': False}
+    image_model.force_real_models()
+    wrapper = image_model.build_image_model()
+    if image_model.USING_MOCK_MODEL:
+        raise RuntimeError(f"No real image model at {settings.AI_MODELS['IMAGE_MODEL_PATH']}")
+
+    export_image_model(wrapper.model, output_path, opset)
+    x = np.random.rand(2, 224, 224, 3).astype(np.float32)
+    expected = np.asarray(wrapper.model(x, training=False), dtype=np.float32)
+    return OnnxModel(output_path)(x), expected
+
+
+def export_video(model_path, output_path, opset, frames):
+    import torch
+    from detector.models import video_model
+
+    if model_path:
+        settings.AI_MODELS['VIDEO_MODEL_PATH'] = model_path
+    video_model.force_real_models()
+    model = video_model.build_video_model()
+    if video_model.USING_MOCK_MODEL:
+        raise RuntimeError(f"No real video model at {settings.AI_MODELS['VIDEO_MODEL_PATH']}")
+    # Export the fp32 graph
+    model.use_bf16 = False
+
+    export_video_model(model, output_path, opset, frames)
+    x = torch.randn(1, frames, 3, 112, 112)
+    expected = video_model.run_video_model(model, x).numpy()
+    return OnnxModel(output_path)(x.numpy()), expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--media', nargs='+', choices=('image', 'video'), default=['image', 'video'])
+    parser.add_argument('--model', help='Source model file to use instead of the one in AI_MODELS (single media only)')
+    parser.add_argument('--output', help='ONNX file to write instead of the ONNX_RUNTIME path (single media only)')
+    parser.add_argument('--opset', type=int, default=settings.ONNX_RUNTIME.get('OPSET', 17))
+    parser.add_argument('--frames', type=int, default=30, help='Frame count of the example video input')
+    args = parser.parse_args()
+
+    if (args.model or args.output) and len(args.media) > 1:
+        parser.error("--model and --output need a single --media")
+
+    failed = False
+    for media in args.media:
+        output_path = args.output or settings.ONNX_RUNTIME[f'{media.upper()}_MODEL_PATH']
+        start = time.perf_counter()
+        try:
+            if media == 'image':
+                actual, expected = export_image(args.model, output_path, args.opset)
+            else:
+                actual, expected = export_video(args.model, output_path, args.opset, args.frames)
+        except Exception as e:
+            print(f"{media}: export failed: {str(e)}")
+            failed = True
+            continue
+        difference = float(np.abs(actual - expected).max())
+        print(f"{media}: wrote {output_path} ({os.path.getsize(output_path) / (1024 * 1024):.1f} MB, opset {args.opset}) "
+              f"in {time.perf_counter() - start:.1f} seconds, max output diff vs native {difference:.2e}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""Report startup time and resident memory of an API worker for each role
+
+Every role is started in a fresh interpreter so framework imports from one
+role do not leak into the next. Usage:
+
+    python startup_report.py [--roles image video both] [--json report.json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROLES = ('image', 'video', 'both')
+FRAMEWORKS = ('tensorflow', 'torch', 'torchvision', 'cv2')
+
+
+def read_rss_mb():
+    """Return the current and peak resident set size of this process in MB"""
+    current = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    current = int(line.split()[1]) / 1024.0
+                    break
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+    return current if current is not None else peak, peak
+
+
+def measure_role(role):
+    """Start a worker for ``role`` in this process and return its startup report"""
+    os.environ['DETECTOR_ROLE'] = role
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'deepfake_api.settings')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    start_time = time.perf_counter()
+    import django
+    django.setup()
+    setup_time = time.perf_counter() - start_time
+
+    # Importing the URLconf pulls in the views, as the first request would
+    import detector.urls  # noqa: F401
+    from detector.registry import model_registry
+    from detector.roles import served_media_types
+    for media_type in served_media_types():
+        model_registry.get(media_type)
+    total_time = time.perf_counter() - start_time
+
+    rss, peak_rss = read_rss_mb()
+    return {
+        'role': role,
+        'setupTime': setup_time,
+        'startupTime': total_time,
+        'modelLoadTimes': model_registry.load_times(),
+        'rssMb': rss,
+        'peakRssMb': peak_rss,
+        'frameworks': [name for name in FRAMEWORKS if name in sys.modules],
+    }
+
+
+def run_role(role):
+    """Measure a role in a child interpreter and return its report"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', role],
+        capture_output=True, text=True,
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'role': role, 'error': (result.stderr.strip().splitlines() or ['no output'])[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--roles', nargs='+', choices=ROLES, default=list(ROLES))
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--child', choices=ROLES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_role(args.child)))
+        return
+
+    reports = [run_role(role) for role in args.roles]
+
+    print(f"{'role':<8}{'startup (s)':>14}{'RSS (MB)':>12}{'peak RSS (MB)':>16}  frameworks")
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['role']:<8}  failed: {report['error']}")
+            continue
+        print(f"{report['role']:<8}{report['startupTime']:>14.2f}{report['rssMb']:>12.1f}"
+              f"{report['peakRssMb']:>16.1f}  {', '.join(report['frameworks']) or '-'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()